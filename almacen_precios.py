@@ -0,0 +1,190 @@
+"""
+Almacén de cierres de varios años (y velas intradía) para análisis de largo plazo.
+
+    import almacen_precios
+    df = almacen_precios.obtener_cierres(["SAN.MC", "AAPL"], inicio="2015-01-01")
+    df = almacen_precios.obtener_cierres(["AAPL"], inicio="2025-06-01", intervalo="1h")
+
+Por cada intervalo ('1d', '1wk', '1h'...) hay un panel: un índice de fechas común a
+todos los tickers y una matriz float32 (fechas x tickers). Para cada ticker se
+recuerda qué rango se ha pedido ya, así solo se descarga lo que falte por delante
+o por detrás. Se guarda en .cache/almacen/<intervalo>.npz.
+
+Aparte de la caché de 1 año de cache_precios (la que usa descargar_datos).
+"""
+import os
+import threading
+from datetime import datetime, timedelta
+
+import numpy as np
+import pandas as pd
+
+import cache_precios
+import proveedores
+from diagnostico import contar, cronometrado
+
+DIRECTORIO = os.environ.get("CHIVATO_ALMACEN", os.path.join(".cache", "almacen"))
+TAMANO_BLOQUE = 200 # Tickers por descarga
+
+
+class _Panel:
+    """Cierres de un intervalo: fechas (datetime64) + matriz float32 + rango pedido por ticker."""
+
+    def __init__(self, fechas=None, valores=None, tickers=(), pedido=None):
+        self.fechas = np.asarray(fechas if fechas is not None else [], dtype="datetime64[ns]")
+        self.valores = valores if valores is not None else np.empty((len(self.fechas), 0), dtype="float32")
+        self.tickers = list(tickers)
+        self.columnas = {t: i for i, t in enumerate(self.tickers)}
+        self.pedido = dict(pedido or {}) # ticker -> (inicio, fin) ya descargado
+        self.valores.setflags(write=False) # Lo que se entrega son vistas: nadie debe tocarlo
+
+    def fusionar(self, df):
+        """Nuevo panel con las velas de 'df' añadidas (las nuevas mandan)."""
+        viejo = pd.DataFrame(self.valores, index=pd.DatetimeIndex(self.fechas), columns=self.tickers)
+        unido = df.astype("float32").combine_first(viejo)
+        tickers = self.tickers + [t for t in unido.columns if t not in self.columnas]
+        unido = unido.reindex(columns=tickers).sort_index()
+        return _Panel(unido.index.to_numpy(dtype="datetime64[ns]"),
+                      unido.to_numpy(dtype="float32", copy=True), tickers, self.pedido)
+
+
+class AlmacenPrecios:
+    def __init__(self, directorio=DIRECTORIO, proveedor=None):
+        self.directorio = directorio
+        self.proveedor = proveedor # None = el proveedor activo del proceso
+        self._paneles = {}
+        self._lock = threading.Lock()
+
+    # --- DISCO ---
+    def _ruta(self, intervalo):
+        return os.path.join(self.directorio, f"{intervalo}.npz")
+
+    def _panel(self, intervalo):
+        panel = self._paneles.get(intervalo)
+        if panel is None:
+            panel = self._leer(intervalo)
+            self._paneles[intervalo] = panel
+        return panel
+
+    def _leer(self, intervalo):
+        ruta = self._ruta(intervalo) if self.directorio else None
+        if not ruta or not os.path.exists(ruta): return _Panel()
+        try:
+            with np.load(ruta, allow_pickle=False) as f:
+                tickers = f["tickers"].tolist()
+                pedido = {t: (pd.Timestamp(a), pd.Timestamp(b))
+                          for t, a, b in zip(tickers, f["pedido_inicio"], f["pedido_fin"])}
+                return _Panel(f["fechas"], f["valores"], tickers, pedido)
+        except Exception as e:
+            print(f"⚠️ Almacén de precios corrupto ({intervalo}): {e}")
+            return _Panel()
+
+    def _guardar(self, intervalo, panel):
+        if not self.directorio: return
+        os.makedirs(self.directorio, exist_ok=True)
+        ruta = self._ruta(intervalo)
+        temporal = f"{ruta}.{os.getpid()}.tmp.npz"
+        vacio = np.datetime64("NaT", "ns")
+        np.savez(temporal, fechas=panel.fechas, valores=panel.valores, tickers=np.array(panel.tickers, dtype=str),
+                 pedido_inicio=np.array([panel.pedido.get(t, (vacio, vacio))[0] for t in panel.tickers], dtype="datetime64[ns]"),
+                 pedido_fin=np.array([panel.pedido.get(t, (vacio, vacio))[1] for t in panel.tickers], dtype="datetime64[ns]"))
+        os.replace(temporal, ruta)
+
+    # --- HUECOS Y RELLENO ---
+    @staticmethod
+    def _huecos(pedido, inicio, fin, fin_abierto):
+        """Rangos de [inicio, fin] que faltan por pedir para un ticker."""
+        if pedido is None: return [(inicio, fin)]
+        ya_inicio, ya_fin = pedido
+        huecos = []
+        if inicio < ya_inicio: huecos.append((inicio, ya_inicio))
+        # Hasta "ahora": damos por buena la descarga reciente (misma ventana que cache_precios)
+        margen = timedelta(hours=cache_precios.MAX_ANTIGUEDAD_HORAS) if fin_abierto else timedelta(0)
+        if fin - margen > ya_fin: huecos.append((ya_fin, fin))
+        return huecos
+
+    @cronometrado("almacen_precios.rellenar")
+    def rellenar(self, tickers, inicio, fin=None, intervalo="1d"):
+        """Descarga solo los rangos que falten. Agrupa los tickers con el mismo hueco en una descarga."""
+        fin_abierto = fin is None
+        fin = pd.Timestamp(fin) if fin is not None else pd.Timestamp(datetime.now())
+        inicio = pd.Timestamp(inicio)
+        with self._lock:
+            panel = self._panel(intervalo)
+            por_hueco = {}
+            for t in tickers:
+                for hueco in self._huecos(panel.pedido.get(t), inicio, fin, fin_abierto):
+                    por_hueco.setdefault(hueco, []).append(t)
+            if not por_hueco:
+                contar("almacen.acierto")
+                return
+            contar("almacen.relleno", sum(len(v) for v in por_hueco.values()))
+
+            proveedor = self.proveedor or proveedores.obtener_proveedor()
+            for (desde, hasta), lista in por_hueco.items():
+                for i in range(0, len(lista), TAMANO_BLOQUE):
+                    bloque = lista[i:i + TAMANO_BLOQUE]
+                    try:
+                        # 'end' es exclusivo en Yahoo: +1 día para incluir la última sesión
+                        df = proveedor.precios(bloque, start=desde.strftime("%Y-%m-%d"),
+                                               end=(hasta + timedelta(days=1)).strftime("%Y-%m-%d"),
+                                               interval=intervalo)
+                    except Exception as e:
+                        print(f"⚠️ Error rellenando {len(bloque)} tickers ({desde.date()} - {hasta.date()}): {e}")
+                        continue
+                    # Yahoo no lanza error cuando falla: devuelve un DataFrame vacío o sin la
+                    # columna (o toda NaN). Solo damos el rango por pedido a quien trajo algo;
+                    # el resto se vuelve a intentar en la siguiente consulta
+                    recibidos = [t for t in bloque if df is not None and t in df.columns and df[t].notna().any()]
+                    if recibidos:
+                        panel = panel.fusionar(df[recibidos])
+                    for t in recibidos:
+                        previo = panel.pedido.get(t)
+                        panel.pedido[t] = (min(desde, previo[0]), max(hasta, previo[1])) if previo else (desde, hasta)
+            self._paneles[intervalo] = panel
+            self._guardar(intervalo, panel)
+
+    # --- CONSULTA ---
+    def obtener_cierres(self, tickers=None, inicio=None, fin=None, intervalo="1d", descargar=True):
+        """
+        DataFrame float32 de cierres entre 'inicio' y 'fin' (ambos incluidos).
+        Por defecto, el último año. tickers=None = todo lo que haya en el almacén.
+        El recorte de fechas es una vista (no copia); elegir tickers sueltos copia solo esas columnas.
+        El índice es el común a todo el panel: un ticker tiene NaN los días que no cotizó.
+        """
+        fin_ts = pd.Timestamp(fin) if fin is not None else pd.Timestamp(datetime.now())
+        inicio_ts = pd.Timestamp(inicio) if inicio is not None else fin_ts - pd.DateOffset(years=1)
+        if descargar and tickers:
+            self.rellenar(tickers, inicio_ts, fin, intervalo)
+
+        panel = self._panel(intervalo)
+        a = np.searchsorted(panel.fechas, np.datetime64(inicio_ts, "ns"), side="left")
+        b = np.searchsorted(panel.fechas, np.datetime64(fin_ts, "ns"), side="right")
+        indice = pd.DatetimeIndex(panel.fechas[a:b])
+
+        if tickers is None:
+            return pd.DataFrame(panel.valores[a:b], index=indice, columns=panel.tickers, copy=False)
+        presentes = [t for t in tickers if t in panel.columnas]
+        posiciones = [panel.columnas[t] for t in presentes]
+        if posiciones and posiciones == list(range(posiciones[0], posiciones[0] + len(posiciones))):
+            bloque = panel.valores[a:b, posiciones[0]:posiciones[-1] + 1] # Columnas seguidas: vista
+        else:
+            bloque = panel.valores[a:b][:, posiciones]
+        return pd.DataFrame(bloque, index=indice, columns=presentes, copy=False)
+
+
+_almacen = None
+_lock_global = threading.Lock()
+
+
+def obtener_almacen():
+    """El almacén del proceso (compartido por todas las sesiones)."""
+    global _almacen
+    with _lock_global:
+        if _almacen is None:
+            _almacen = AlmacenPrecios()
+        return _almacen
+
+
+def obtener_cierres(tickers, inicio=None, fin=None, intervalo="1d"):
+    return obtener_almacen().obtener_cierres(tickers, inicio, fin, intervalo)
@@ -1,19 +1,160 @@
-import yfinance as yf
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
 
+import numpy as np
+import pandas as pd
+
+import divisas
+import proveedores
+from cache_ttl import CacheTTL
+from diagnostico import contar, cronometrado, en_hilo, medir
+
+# --- CACHÉ DE FICHAS (.info) ---
+# Los ratios (PER, deuda, márgenes...) cambian como mucho una vez al día.
+# Capa en memoria + capa en disco compartida entre sesiones/procesos.
+CACHE_FUNDAMENTALES = CacheTTL(
+    ttl_segundos=float(os.environ.get("CHIVATO_CACHE_FUNDAMENTALES_HORAS", "12")) * 3600,
+    max_elementos=2000,
+    directorio=os.environ.get("CHIVATO_CACHE_FUNDAMENTALES", os.path.join(".cache", "fundamentales")),
+)
+
+# --- UMBRALES DE LA PUNTUACIÓN ---
+# Los usan la versión ficha a ficha (puntuar_fundamentales) y la de tabla (puntuar_tabla).
+UMBRALES = {
+    "per_barato": 25,         # PER < 25  -> +2
+    "per_caro": 50,           # PER > 50  -> -1
+    "deuda_alta": 150,        # Deuda/Equity < 150 -> +2, si no -> -2
+    "margen_alto": 0.10,      # Margen > 10% -> +2
+    "margen_minimo": 0,       # Margen > 0   -> +1, si no -> -3 (pérdidas)
+    "dividendo_rico": 0.02,   # Rentabilidad por dividendo > 2% -> +1
+    "crecimiento_alto": 0.05, # Ventas > +5% -> +1
+    "crecimiento_minimo": 0,  # Ventas < 0   -> "Baja" (sin puntos)
+}
+
+def estadisticas_cache():
+    """Aciertos/fallos de la caché de fundamentales (para diagnóstico)."""
+    return CACHE_FUNDAMENTALES.estadisticas()
+
+@cronometrado("analisis_fundamental.obtener_datos_fundamentales")
 def obtener_datos_fundamentales(ticker):
-    """Descarga la ficha técnica de la empresa."""
+    """Descarga la ficha técnica de la empresa (o la sirve desde la caché)."""
+    info = CACHE_FUNDAMENTALES.obtener(ticker)
+    if info is not None:
+        contar("fundamentales.cache_acierto")
+        return info
+    contar("fundamentales.cache_fallo")
     try:
-        empresa = yf.Ticker(ticker)
-        return empresa.info
+        with medir("analisis_fundamental.descarga_info"):
+            info = proveedores.obtener_proveedor().fundamentales(ticker)
     except:
         return None
+    if info:
+        CACHE_FUNDAMENTALES.guardar(ticker, info)
+        divisas.anotar_moneda(ticker, info)
+    return info
+
+def _obtener_con_reintentos(ticker, reintentos, espera_base):
+    """Pide la ficha a Yahoo reintentando con espera exponencial (0.5s, 1s, 2s...)."""
+    info = CACHE_FUNDAMENTALES.obtener(ticker)
+    if info is not None:
+        contar("fundamentales.cache_acierto")
+        return info
+    contar("fundamentales.cache_fallo")
+    for intento in range(reintentos + 1):
+        try:
+            with medir("analisis_fundamental.descarga_info"):
+                info = proveedores.obtener_proveedor().fundamentales(ticker)
+            if info:
+                CACHE_FUNDAMENTALES.guardar(ticker, info)
+                divisas.anotar_moneda(ticker, info)
+                return info
+        except Exception as e:
+            print(f"⚠️ Fallo en .info de {ticker} (intento {intento + 1}): {e}")
+        if intento < reintentos:
+            time.sleep(espera_base * (2 ** intento))
+    return None
+
+@cronometrado("analisis_fundamental.obtener_datos_fundamentales_lote")
+def obtener_datos_fundamentales_lote(tickers, max_workers=8, timeout=15, reintentos=2, espera_base=0.5, progreso=None):
+    """
+    Descarga las fichas de muchas empresas a la vez con un grupo de hilos.
+    Devuelve una lista en el MISMO orden que 'tickers' (None si falla o se pasa del timeout).
+    'timeout' cuenta para cada ficha desde que un hilo empieza a pedirla (no desde que entra
+    en la cola). Si todos los hilos se quedan colgados, lo que falta se da por perdido.
+    'progreso(hechos, total)' se llama desde el hilo que invoca (seguro para Streamlit).
+    """
+    if not tickers: return []
+    hilos = max(1, min(max_workers, len(tickers)))
+    grupo = ThreadPoolExecutor(max_workers=hilos)
+    comienzos = {} # posición -> instante en que un hilo empezó con esa ficha
 
+    def descargar(i, ticker):
+        comienzos[i] = time.monotonic()
+        return _obtener_con_reintentos(ticker, reintentos, espera_base)
+
+    tarea = en_hilo(descargar) # Los tiempos de cada hilo cuentan en esta petición
+    posiciones = {grupo.submit(tarea, i, t): i for i, t in enumerate(tickers)}
+    resultados = [None] * len(tickers)
+    pendientes, colgados, hechos = set(posiciones), set(), 0
+    try:
+        while pendientes:
+            empezados = [comienzos[posiciones[f]] for f in pendientes if posiciones[f] in comienzos]
+            espera = max(0.0, min(empezados) + timeout - time.monotonic()) if empezados else timeout
+            listos, pendientes = wait(pendientes, timeout=espera, return_when=FIRST_COMPLETED)
+            for futuro in listos:
+                if futuro.exception() is None:
+                    resultados[posiciones[futuro]] = futuro.result()
+            ahora = time.monotonic()
+            vencidos = {f for f in pendientes
+                        if posiciones[f] in comienzos and ahora - comienzos[posiciones[f]] >= timeout}
+            for futuro in vencidos:
+                print(f"⏱️ Timeout descargando {tickers[posiciones[futuro]]}")
+            pendientes -= vencidos
+            colgados = {f for f in colgados | vencidos if not f.done()}
+            if len(colgados) >= hilos and pendientes:
+                # Ningún hilo libre: lo que queda en cola no empezaría nunca
+                print(f"⏱️ Todos los hilos colgados: {len(pendientes)} fichas sin descargar")
+                vencidos |= pendientes
+                pendientes = set()
+            hechos += len(listos) + len(vencidos)
+            if progreso: progreso(hechos, len(tickers))
+    finally:
+        # No esperamos a los hilos colgados: sus resultados ya no se usan
+        grupo.shutdown(wait=False, cancel_futures=True)
+    return resultados
+
+@cronometrado("analisis_fundamental.analizar_calidad_fundamental")
 def analizar_calidad_fundamental(ticker):
     """
     Analiza la empresa y devuelve una NOTA y un DESGLOSE por columnas.
     """
-    info = obtener_datos_fundamentales(ticker)
-    
+    return puntuar_fundamentales(obtener_datos_fundamentales(ticker))
+
+@cronometrado("analisis_fundamental.analizar_calidad_fundamental_lote")
+def analizar_calidad_fundamental_lote(tickers, max_workers=8, timeout=15, reintentos=2, progreso=None):
+    """
+    Versión en lote de analizar_calidad_fundamental: descarga en paralelo y puntúa.
+    Devuelve [(nota, desglose), ...] en el orden de entrada; None si la puntuación falla.
+    """
+    infos = obtener_datos_fundamentales_lote(tickers, max_workers=max_workers, timeout=timeout,
+                                             reintentos=reintentos, progreso=progreso)
+    return puntuar_lote(infos)
+
+@cronometrado("analisis_fundamental.puntuar_lote")
+def puntuar_lote(infos):
+    """
+    Puntúa fichas ya descargadas: [(nota, desglose) o None si la ficha rompe el cálculo].
+    Mismo resultado que puntuar_fundamentales ficha a ficha, pero calculado en tabla.
+    """
+    tabla = tabla_fundamentales(infos)
+    puntuacion = puntuar_tabla(tabla)
+    desgloses = textos_desglose(tabla, puntuacion)
+    return [(int(nota), desglose) if valida else None
+            for nota, desglose, valida in zip(puntuacion["Nota"].fillna(0), desgloses, tabla["valida"])]
+
+def puntuar_fundamentales(info):
+    """Puntúa una ficha de Yahoo (.info) ya descargada: devuelve (nota, desglose)."""
     # Valores por defecto (guiones) por si no hay datos
     desglose = {
         "Valoración (PER)": "⚪ N/A",
@@ -31,10 +172,10 @@ def analizar_calidad_fundamental(ticker):
     # --- 1. VALORACIÓN (PER) ---
     per = info.get('trailingPE', None)
     if per:
-        if per < 25:
+        if per < UMBRALES["per_barato"]:
             nota += 2
             desglose["Valoración (PER)"] = f"✅ Buena ({per:.1f})"
-        elif per > 50:
+        elif per > UMBRALES["per_caro"]:
             nota -= 1
             desglose["Valoración (PER)"] = f"⚠️ Cara ({per:.1f})"
         else:
@@ -43,7 +184,7 @@ def analizar_calidad_fundamental(ticker):
     # --- 2. DEUDA (Debt/Equity) ---
     deuda = info.get('debtToEquity', None)
     if deuda:
-        if deuda < 150: # Menos de 1.5 veces
+        if deuda < UMBRALES["deuda_alta"]: # Menos de 1.5 veces
             nota += 2
             desglose["Deuda"] = "✅ Baja"
         else:
@@ -52,10 +193,10 @@ def analizar_calidad_fundamental(ticker):
 
     # --- 3. RENTABILIDAD (Márgenes) ---
     margen = info.get('profitMargins', 0)
-    if margen > 0.10:
+    if margen > UMBRALES["margen_alto"]:
         nota += 2
         desglose["Rentabilidad"] = f"✅ Alta ({margen*100:.0f}%)"
-    elif margen > 0:
+    elif margen > UMBRALES["margen_minimo"]:
         nota += 1
         desglose["Rentabilidad"] = f"⚖️ Normal ({margen*100:.0f}%)"
     else:
@@ -64,19 +205,116 @@ def analizar_calidad_fundamental(ticker):
 
     # --- 4. DIVIDENDOS ---
     div = info.get('dividendYield', 0)
-    if div and div > 0.02:
+    if div and div > UMBRALES["dividendo_rico"]:
         nota += 1
         desglose["Dividendos"] = f"💰 Rico ({div*100:.1f}%)"
 
     # --- 5. CRECIMIENTO ---
     crec = info.get('revenueGrowth', 0)
-    if crec > 0.05:
+    if crec > UMBRALES["crecimiento_alto"]:
         nota += 1
         desglose["Crecimiento"] = "🚀 Sube"
-    elif crec < 0:
+    elif crec < UMBRALES["crecimiento_minimo"]:
         desglose["Crecimiento"] = "📉 Baja"
 
     # Nota final (0 a 10)
     nota_final = min(10, max(0, nota + 2))
     
-    return nota_final, desglose
\ No newline at end of file
+    return nota_final, desglose
+
+
+# --- PUNTUACIÓN EN TABLA (todo el universo de una pasada) ---
+# Campos de la ficha de Yahoo que usa la puntuación
+CAMPOS = {"per": "trailingPE", "deuda": "debtToEquity", "margen": "profitMargins",
+          "dividendo": "dividendYield", "crecimiento": "revenueGrowth"}
+
+VALORACION = ["⚪ N/A", "✅ Buena", "⚠️ Cara", "⚖️ Normal"]
+DEUDA = ["⚪ N/A", "✅ Baja", "⚠️ Alta"]
+RENTABILIDAD = ["✅ Alta", "⚖️ Normal", "❌ Pérdidas"]
+DIVIDENDOS = ["⚪ No paga", "💰 Rico"]
+CRECIMIENTO = ["⚪ Estancada", "🚀 Sube", "📉 Baja"]
+
+
+def _es_numero(valor):
+    return isinstance(valor, (int, float, np.number))
+
+def tabla_fundamentales(infos, tickers=None):
+    """
+    Fichas .info -> DataFrame numérico con una fila por ficha (columnas de CAMPOS).
+    Igual que puntuar_fundamentales: PER, deuda y dividendo ausentes cuentan como 0,
+    y margen y crecimiento ausentes también. 'con_ficha' = había ficha; 'valida' = False
+    si la ficha rompería el cálculo ficha a ficha (ej: texto o None donde va un número).
+    """
+    filas = []
+    for info in infos:
+        if not info:
+            filas.append((0.0, 0.0, 0.0, 0.0, 0.0, False, True))
+            continue
+        valores, valida = [], True
+        for clave, campo in CAMPOS.items():
+            valor = info.get(campo, 0)
+            # Estos tres solo se miran si son "verdaderos" (None, 0 o "" = no hay dato)
+            if clave in ("per", "deuda", "dividendo") and not valor:
+                valor = 0
+            if not _es_numero(valor):
+                valida, valor = False, 0
+            valores.append(float(valor))
+        filas.append((*valores, True, valida))
+    return pd.DataFrame(filas, columns=list(CAMPOS) + ["con_ficha", "valida"], index=tickers)
+
+@cronometrado("analisis_fundamental.puntuar_tabla")
+def puntuar_tabla(tabla, umbrales=None):
+    """
+    Nota 0-10 y veredicto de cada categoría para toda la tabla con máscaras de NumPy.
+    Devuelve columnas numéricas/categóricas (sin textos): Nota y las cinco categorías.
+    'umbrales' sustituye alguno de UMBRALES (ej: para probar otros cortes al momento).
+    """
+    u = {**UMBRALES, **(umbrales or {})}
+    per, deuda, margen, div, crec = (tabla[c].to_numpy(dtype="float64") for c in CAMPOS)
+
+    # Un NaN cuenta como dato (igual que en la versión ficha a ficha); 0 = sin dato
+    hay_per = per != 0
+    per_barato = hay_per & (per < u["per_barato"])
+    per_caro = hay_per & ~per_barato & (per > u["per_caro"])
+    hay_deuda = deuda != 0
+    deuda_baja = hay_deuda & (deuda < u["deuda_alta"])
+    deuda_alta = hay_deuda & ~deuda_baja
+    margen_alto = margen > u["margen_alto"]
+    margen_normal = ~margen_alto & (margen > u["margen_minimo"])
+    perdidas = ~margen_alto & ~margen_normal
+    rico = div > u["dividendo_rico"]
+    sube = crec > u["crecimiento_alto"]
+    baja = ~sube & (crec < u["crecimiento_minimo"])
+
+    nota = (2 * per_barato - per_caro + 2 * deuda_baja - 2 * deuda_alta
+            + 2 * margen_alto + margen_normal - 3 * perdidas + rico + sube)
+    con_ficha = tabla["con_ficha"].to_numpy()
+    nota = np.where(con_ficha, np.clip(nota + 2, 0, 10), 0)
+
+    def categoria(codigos, etiquetas):
+        # Sin ficha: todas las categorías en su valor por defecto (código 0)
+        return pd.Categorical.from_codes(np.where(con_ficha, codigos, 0), categories=etiquetas)
+
+    return pd.DataFrame({
+        "Nota": pd.Series(nota, index=tabla.index, dtype="Int8").where(tabla["valida"]), # NA = ficha rota
+        "Valoración (PER)": categoria(np.select([per_barato, per_caro, hay_per], [1, 2, 3], 0), VALORACION),
+        "Deuda": categoria(np.select([deuda_baja, deuda_alta], [1, 2], 0), DEUDA),
+        "Rentabilidad": categoria(np.select([margen_alto, margen_normal], [0, 1], 2), RENTABILIDAD),
+        "Dividendos": categoria(rico.astype("int8"), DIVIDENDOS),
+        "Crecimiento": categoria(np.select([sube, baja], [1, 2], 0), CRECIMIENTO),
+    }, index=tabla.index)
+
+def textos_desglose(tabla, puntuacion):
+    """Los textos del desglose ("✅ Buena (12.3)"...) como en puntuar_fundamentales. Solo para mostrar."""
+    desgloses = []
+    columnas = zip(puntuacion["Valoración (PER)"], puntuacion["Deuda"], puntuacion["Rentabilidad"],
+                   puntuacion["Dividendos"], puntuacion["Crecimiento"],
+                   tabla["per"], tabla["margen"], tabla["dividendo"], tabla["con_ficha"])
+    for valoracion, deuda, rentabilidad, dividendos, crecimiento, per, margen, div, con_ficha in columnas:
+        if con_ficha and valoracion != VALORACION[0]: valoracion = f"{valoracion} ({per:.1f})"
+        if con_ficha and rentabilidad != RENTABILIDAD[2]: rentabilidad = f"{rentabilidad} ({margen*100:.0f}%)"
+        if dividendos == DIVIDENDOS[1]: dividendos = f"{dividendos} ({div*100:.1f}%)"
+        if not con_ficha: rentabilidad = "⚪ N/A"
+        desgloses.append({"Valoración (PER)": valoracion, "Deuda": deuda, "Rentabilidad": rentabilidad,
+                          "Dividendos": dividendos, "Crecimiento": crecimiento})
+    return desgloses
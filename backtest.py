@@ -0,0 +1,229 @@
+"""
+Backtest del semáforo (y de los bloques del Robo-Advisor) sobre el histórico.
+
+    python backtest.py                                   # Universo de datos.py, 10 años, mensual
+    python backtest.py --anos 5 --cada 5 --coste 0.002   # Semanal, 0,2% por operación
+    python backtest.py --universo tickers.txt --perfil Dinámico --notas
+
+Las señales (media 50 y volatilidad de 30 sesiones) se calculan para TODAS las fechas y
+todos los tickers de una pasada: en cada fecha dan lo mismo que calculos.analizar_semaforo
+con la serie cortada en ese día. Luego se simula la cartera rebalanceando cada 'cada'
+sesiones, con un coste proporcional a lo que se compra y se vende.
+
+Ojo con --notas: la nota fundamental es la de HOY (no hay histórico de fichas), así que
+filtrar por nota mira al futuro. Sirve para comparar reglas, no como rentabilidad esperada.
+"""
+import argparse
+import time
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+
+import calculos
+import robo
+from diagnostico import cronometrado
+
+DIAS_ANO = 252
+VENTANA_MEDIA = 50
+VENTANA_VOLATILIDAD = 30
+UMBRAL_VOLATILIDAD = 0.015 # El de calculos.clasificar_semaforo
+
+# Códigos de estado en la matriz de señales
+SIN_DATO, VERDE, NARANJA, ROJO = -1, 0, 1, 2
+CODIGOS = {"VERDE": VERDE, "NARANJA": NARANJA, "ROJO": ROJO}
+
+
+# --- SEÑALES ---
+@cronometrado("backtest.calcular_senales")
+def calcular_senales(precios):
+    """
+    Estado del semáforo (códigos VERDE/NARANJA/ROJO) y volatilidad de cada ticker en cada fecha.
+    Igual que analizar_semaforo: cada ticker usa solo sus sesiones (sin huecos); los días que
+    no cotiza arrastra la señal anterior. Devuelve (estados int8, volatilidades), fechas x tickers.
+    """
+    df = calculos.como_dataframe(precios)
+    valores = df.to_numpy(dtype="float64")
+    hay_dato = ~np.isnan(valores)
+
+    # Mismo truco que analizar_semaforo_universo: los NaN arriba, cada columna = su serie.dropna()
+    orden = np.argsort(hay_dato, axis=0, kind="stable")
+    compacto = pd.DataFrame(np.take_along_axis(valores, orden, axis=0))
+    media = compacto.rolling(window=VENTANA_MEDIA).mean().to_numpy()
+    retornos = compacto / compacto.shift(1) - 1
+    volatilidad = retornos.rolling(window=VENTANA_VOLATILIDAD, min_periods=2).std().to_numpy()
+
+    precio = compacto.to_numpy()
+    media = np.where(np.isnan(media), precio, media) # Acción muy nueva: el mismo parche
+    rojo = precio < media
+    naranja = ~rojo & (precio > media) & (volatilidad > UMBRAL_VOLATILIDAD)
+    estado = np.select([np.isnan(precio), rojo, naranja], [np.nan, ROJO, NARANJA], default=VERDE)
+
+    # De vuelta a las fechas originales; los huecos heredan la señal del día anterior
+    estados = np.empty_like(valores)
+    vols = np.empty_like(valores)
+    np.put_along_axis(estados, orden, estado, axis=0)
+    np.put_along_axis(vols, orden, volatilidad, axis=0)
+    estados = pd.DataFrame(np.where(hay_dato, estados, np.nan), index=df.index, columns=df.columns).ffill()
+    vols = pd.DataFrame(np.where(hay_dato, vols, np.nan), index=df.index, columns=df.columns).ffill()
+    return estados.fillna(SIN_DATO).astype("int8"), vols
+
+
+# --- ESTRATEGIAS (pesos objetivo en una fecha) ---
+def pesos_semaforo(estado, volatilidad, grupos=("VERDE",), max_valores=None):
+    """A partes iguales entre los tickers en 'grupos' (los de menos volatilidad si hay tope)."""
+    elegidos = np.isin(estado, [CODIGOS[g] for g in grupos])
+    if max_valores and elegidos.sum() > max_valores:
+        orden = np.argsort(np.where(elegidos, volatilidad, np.inf), kind="stable")[:max_valores]
+        elegidos = np.zeros_like(elegidos)
+        elegidos[orden] = True
+    return elegidos / elegidos.sum() if elegidos.any() else np.zeros(len(estado))
+
+
+def pesos_robo(estado, volatilidad, notas, perfil="Moderado", por_bloque=robo.VALORES_POR_BLOQUE):
+    """
+    Los bloques de robo.asignar con los VERDES del día: Preservación (nota >= 7, vol <= 1%),
+    Crecimiento (nota >= 7, vol 1-1,5%) y Especulativo (vol > 1,5%), los 3 de más nota por
+    bloque a partes iguales. Sin nada en un bloque, su parte se queda en liquidez.
+    """
+    verde = (estado == VERDE) & ~np.isnan(notas)
+    bloques = [
+        verde & (notas >= 7) & (volatilidad <= 0.01),
+        verde & (notas >= 7) & (volatilidad > 0.01) & (volatilidad <= 0.015),
+        verde & (volatilidad > 0.015),
+    ]
+    pesos = np.zeros(len(estado))
+    for elegibles, parte in zip(bloques, robo.REPARTO[perfil]):
+        if parte == 0 or not elegibles.any(): continue
+        candidatos = np.flatnonzero(elegibles)
+        seleccion = candidatos[np.argsort(-notas[candidatos], kind="stable")[:por_bloque]]
+        pesos[seleccion] += parte / len(seleccion)
+    return pesos
+
+
+# --- SIMULACIÓN ---
+@dataclass(frozen=True)
+class ResultadoBacktest:
+    curva: pd.DataFrame     # Capital y Drawdown por fecha
+    pesos: pd.DataFrame     # Pesos objetivo en cada rebalanceo (fechas x tickers)
+    rotacion: pd.Series     # Fracción de la cartera comprada + vendida en cada rebalanceo
+    costes: float           # Total pagado en comisiones
+
+    def resumen(self):
+        capital = self.curva["Capital"]
+        anos = max(len(capital) - 1, 1) / DIAS_ANO
+        retornos = capital.pct_change().dropna()
+        volatilidad = retornos.std() * np.sqrt(DIAS_ANO)
+        return {
+            "Rentabilidad total": capital.iloc[-1] / capital.iloc[0] - 1,
+            "Rentabilidad anual": (capital.iloc[-1] / capital.iloc[0]) ** (1 / anos) - 1,
+            "Volatilidad anual": volatilidad,
+            "Sharpe": retornos.mean() * DIAS_ANO / volatilidad if volatilidad > 0 else float("nan"),
+            "Máximo drawdown": self.curva["Drawdown"].min(),
+            "Rotación media": self.rotacion.mean(),
+            "Costes": self.costes,
+        }
+
+
+@cronometrado("backtest.simular")
+def simular(precios, estrategia, cada=21, coste=0.001, capital=10000.0, inicio=None, senales=None):
+    """
+    Rebalancea cada 'cada' sesiones a los pesos de estrategia(estado, volatilidad) (arrays de la
+    fecha; lo que no sume 1 queda en liquidez al 0%). Entre rebalanceos los pesos derivan con
+    los precios. 'coste' es la fracción de cada compra o venta que se pierde en comisiones.
+    'inicio': primera fecha operable (por defecto, cuando ya hay media de 50 sesiones).
+    'senales': las de calcular_senales(precios) si ya se tienen (varias estrategias, mismo histórico).
+    """
+    df = calculos.como_dataframe(precios)
+    estados, vols = senales if senales is not None else calcular_senales(df)
+    cierres = df.ffill().to_numpy(dtype="float64")
+    fechas = df.index
+
+    primera = VENTANA_MEDIA if inicio is None else int(fechas.searchsorted(pd.Timestamp(inicio)))
+    rebalanceos = list(range(primera, len(fechas), cada))
+    curva = np.full(len(fechas), np.nan)
+    curva[:primera + 1] = capital
+    tenencias = np.zeros(df.shape[1]) # Valor en euros de cada posición
+    liquidez = capital
+    pesos_hist, rotaciones, costes = [], [], 0.0
+
+    for n, i in enumerate(rebalanceos):
+        precio_hoy = cierres[i]
+        cotiza = ~np.isnan(precio_hoy)
+        objetivo = np.where(cotiza, estrategia(estados.iloc[i].to_numpy(), vols.iloc[i].to_numpy()), 0.0)
+        if objetivo.sum() > 1: objetivo = objetivo / objetivo.sum()
+
+        total = liquidez + tenencias.sum()
+        movimiento = np.abs(objetivo * total - tenencias).sum()
+        pagado = coste * movimiento
+        total -= pagado
+        tenencias = objetivo * total
+        liquidez = total - tenencias.sum()
+        pesos_hist.append(objetivo)
+        rotaciones.append(movimiento / (total + pagado) if total + pagado > 0 else 0.0)
+        costes += pagado
+
+        # Evolución hasta el siguiente rebalanceo (incluido): un producto matriz x vector
+        fin = rebalanceos[n + 1] if n + 1 < len(rebalanceos) else len(fechas) - 1
+        with np.errstate(invalid="ignore", divide="ignore"):
+            relativo = np.nan_to_num(cierres[i:fin + 1] / np.where(cotiza, precio_hoy, np.nan), nan=1.0)
+        valores = relativo * tenencias
+        curva[i:fin + 1] = valores.sum(axis=1) + liquidez
+        tenencias = valores[-1]
+
+    curva = pd.Series(curva, index=fechas).ffill()
+    return ResultadoBacktest(
+        curva=pd.DataFrame({"Capital": curva, "Drawdown": curva / curva.cummax() - 1}),
+        pesos=pd.DataFrame(pesos_hist, index=fechas[rebalanceos], columns=df.columns),
+        rotacion=pd.Series(rotaciones, index=fechas[rebalanceos], dtype="float64"),
+        costes=costes,
+    )
+
+
+def comparar(precios, notas=None, perfil="Moderado", cada=21, coste=0.001, capital=10000.0):
+    """Las estrategias habituales sobre el mismo histórico: {nombre: ResultadoBacktest}."""
+    estrategias = {
+        "Todos (referencia)": lambda e, v: np.where(e != SIN_DATO, 1.0, 0.0) / max((e != SIN_DATO).sum(), 1),
+        "Semáforo VERDE": lambda e, v: pesos_semaforo(e, v, ("VERDE",)),
+        "Semáforo VERDE + NARANJA": lambda e, v: pesos_semaforo(e, v, ("VERDE", "NARANJA")),
+    }
+    if notas is not None:
+        n = pd.Series(notas, dtype="float64").reindex(calculos.como_dataframe(precios).columns).to_numpy()
+        estrategias[f"Robo-Advisor {perfil}"] = lambda e, v: pesos_robo(e, v, n, perfil)
+    senales = calcular_senales(precios)
+    return {nombre: simular(precios, f, cada, coste, capital, senales=senales) for nombre, f in estrategias.items()}
+
+
+if __name__ == "__main__":
+    import almacen_precios
+    import analisis_fundamental
+    import datos
+
+    parser = argparse.ArgumentParser(description="Backtest del semáforo de El Chivato Bursátil")
+    parser.add_argument("--universo", help="Fichero con un ticker por línea (por defecto, el universo de datos.py)")
+    parser.add_argument("--anos", type=int, default=10, help="Años de histórico")
+    parser.add_argument("--cada", type=int, default=21, help="Sesiones entre rebalanceos (21 = mensual)")
+    parser.add_argument("--coste", type=float, default=0.001, help="Coste por operación (0.001 = 0,1%%)")
+    parser.add_argument("--perfil", choices=list(robo.REPARTO), default="Moderado")
+    parser.add_argument("--notas", action="store_true", help="Incluye los bloques del Robo-Advisor (con la nota de hoy)")
+    args = parser.parse_args()
+
+    universo = datos.leer_universo(args.universo) if args.universo else list(datos.EMPRESAS_SELECCIONADAS)
+    desde = pd.Timestamp.now().normalize() - pd.DateOffset(years=args.anos)
+    precios = almacen_precios.obtener_cierres(universo, inicio=desde)
+    if precios.empty:
+        raise RuntimeError("No se han podido descargar precios")
+    notas = None
+    if args.notas:
+        fichas = analisis_fundamental.obtener_datos_fundamentales_lote(universo)
+        notas = {t: r[0] for t, r in zip(universo, analisis_fundamental.puntuar_lote(fichas)) if r}
+
+    inicio = time.perf_counter()
+    resultados = comparar(precios, notas, args.perfil, args.cada, args.coste)
+    print(f"📈 {precios.shape[1]} tickers x {precios.shape[0]} sesiones en {time.perf_counter() - inicio:.1f} s")
+    tabla = pd.DataFrame({nombre: r.resumen() for nombre, r in resultados.items()}).T
+    for c in ["Rentabilidad total", "Rentabilidad anual", "Volatilidad anual", "Máximo drawdown", "Rotación media"]:
+        tabla[c] = tabla[c].map(lambda x: f"{x:.1%}")
+    tabla["Sharpe"] = tabla["Sharpe"].map(lambda x: f"{x:.2f}")
+    tabla["Costes"] = tabla["Costes"].map(lambda x: f"{x:,.0f} €")
+    print(tabla.to_string())
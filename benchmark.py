@@ -0,0 +1,249 @@
+"""
+Benchmarks de los puntos calientes del análisis con universos sintéticos (sin red).
+
+    python benchmark.py                       # 50, 500 y 5000 tickers
+    python benchmark.py --tamanos 50 500      # Solo esos tamaños
+    python benchmark.py --repeticiones 5      # Mejor de 5 (por defecto 3)
+
+Cada etapa se cronometra (mejor tiempo de N repeticiones) y se mide su pico de
+memoria con tracemalloc. Los resultados se añaden a .benchmarks/historial.jsonl
+junto al commit actual y se comparan con la ejecución anterior de otro commit.
+"""
+import argparse
+import json
+import os
+import subprocess
+import time
+import tracemalloc
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+import analisis_fundamental
+import backtest
+import calculos
+import datos
+import divisas
+import optimizador
+import proveedores
+import ranking
+import robo
+
+FICHERO_HISTORIAL = os.path.join(".benchmarks", "historial.jsonl")
+TAMANOS = [50, 500, 5000]
+UMBRAL_REGRESION = 1.25 # +25% de tiempo respecto al commit anterior = aviso
+
+
+# --- DATOS SINTÉTICOS ---
+def generar_panel(n_tickers, n_dias=260, semilla=0):
+    """
+    Panel ancho de cierres como el de descargar_datos: mitad '.MC' y mitad EEUU,
+    con calendarios distintos (los festivos dejan NaN al unir) y algunas altas recientes.
+    """
+    rng = np.random.default_rng(semilla)
+    fechas = pd.bdate_range(end="2025-12-31", periods=n_dias)
+    retornos = rng.normal(0.0003, 0.015, size=(n_dias, n_tickers))
+    precios = 50 * np.exp(np.cumsum(retornos, axis=0)) * rng.uniform(0.5, 4, size=n_tickers)
+    tickers = [f"S{i:04d}.MC" if i % 2 == 0 else f"U{i:04d}" for i in range(n_tickers)]
+    df = pd.DataFrame(precios, index=fechas, columns=tickers)
+
+    es = [t for t in tickers if t.endswith(".MC")]
+    us = [t for t in tickers if not t.endswith(".MC")]
+    festivos_es = rng.choice(n_dias, size=n_dias // 30, replace=False)
+    festivos_us = rng.choice(n_dias, size=n_dias // 30, replace=False)
+    df.iloc[festivos_es, [df.columns.get_loc(t) for t in es]] = np.nan
+    df.iloc[festivos_us, [df.columns.get_loc(t) for t in us]] = np.nan
+    # Un 2% de empresas recién salidas a bolsa (menos de 50 sesiones)
+    for i in rng.choice(n_tickers, size=max(1, n_tickers // 50), replace=False):
+        df.iloc[: n_dias - 30, i] = np.nan
+    return df
+
+
+def generar_fundamentales(tickers, semilla=0):
+    """Fichas .info con la misma forma que Yahoo (y algún hueco)."""
+    rng = np.random.default_rng(semilla)
+    fichas = {}
+    for t in tickers:
+        info = {
+            "trailingPE": float(rng.uniform(5, 80)),
+            "debtToEquity": float(rng.uniform(10, 300)),
+            "profitMargins": float(rng.normal(0.1, 0.1)),
+            "dividendYield": float(rng.uniform(0, 0.06)),
+            "revenueGrowth": float(rng.normal(0.05, 0.1)),
+            "currency": "EUR" if t.endswith(".MC") else "USD",
+        }
+        if rng.random() < 0.1: info.pop("trailingPE")
+        if rng.random() < 0.1: info.pop("debtToEquity")
+        fichas[t] = info
+    return fichas
+
+
+class ProveedorSintetico(proveedores.ProveedorDatos):
+    """Proveedor en memoria: sirve el panel y las fichas sintéticas sin tocar la red."""
+
+    def __init__(self, panel, fichas):
+        self.panel = panel
+        self.fichas = fichas
+
+    def precios(self, tickers, period=None, start=None, end=None, interval="1d"):
+        return self.panel[[t for t in tickers if t in self.panel.columns]].dropna(how="all")
+
+    def historial(self, ticker, period="1y"):
+        return self.panel[[ticker]].rename(columns={ticker: "Close"}).dropna()
+
+    def fundamentales(self, ticker):
+        return self.fichas.get(ticker)
+
+    def tipo_cambio(self, par):
+        return 1.08
+
+    def noticias(self, ticker):
+        return []
+
+
+# --- ETAPAS ---
+def etapa_descargar_datos(ctx):
+    return datos.descargar_datos(ctx["tickers"], usar_cache=False)
+
+def etapa_semaforo_bucle(ctx):
+    return [calculos.analizar_semaforo(ctx["panel"], t) for t in ctx["tickers"]]
+
+def etapa_semaforo_universo(ctx):
+    return calculos.analizar_semaforo_universo(ctx["panel"])
+
+def etapa_calidad_fundamental(ctx):
+    analisis_fundamental.CACHE_FUNDAMENTALES.limpiar()
+    return analisis_fundamental.analizar_calidad_fundamental_lote(ctx["tickers"])
+
+def etapa_ranking(ctx):
+    """Las dos fases del ranking del Analizador Técnico (ranking.py, sin Streamlit)."""
+    return ranking.calcular_ranking(ctx["panel"], {"USD": 1 / 1.08}, obtener_ficha=ctx["fichas"].get)
+
+def etapa_puntuar_tabla(ctx):
+    """Nota fundamental de todo el universo en tabla (sin textos del desglose)."""
+    tabla = analisis_fundamental.tabla_fundamentales([ctx["fichas"].get(t) for t in ctx["tickers"]], ctx["tickers"])
+    return analisis_fundamental.puntuar_tabla(tabla)
+
+def etapa_optimizador(ctx):
+    """Los tres perfiles del optimizador de cartera (hasta 500 candidatos, lo que ve el Robo-Advisor)."""
+    candidatos = ctx["tickers"][:500]
+    return [optimizador.optimizar(ctx["panel"], candidatos, perfil) for perfil in optimizador.PERFILES]
+
+def etapa_backtest(ctx):
+    """Señales de todas las fechas + rebalanceo mensual del semáforo VERDE."""
+    return backtest.simular(ctx["panel"], lambda e, v: backtest.pesos_semaforo(e, v))
+
+def etapa_robo_asignar(ctx):
+    """Universo puntuado del Robo-Advisor + reparto (perfil Dinámico, que usa los tres bloques)."""
+    universo = robo.puntuar_universo(ctx["panel"], ctx["tickers"], obtener_ficha=ctx["fichas"].get)
+    return robo.asignar(universo, 10000.0, "Dinámico")
+
+def etapa_robo_reasignar(ctx):
+    """Solo el reparto, con el universo ya puntuado (lo que cuesta cambiar capital o perfil)."""
+    if "universo_robo" not in ctx:
+        ctx["universo_robo"] = robo.puntuar_universo(ctx["panel"], ctx["tickers"], obtener_ficha=ctx["fichas"].get)
+    return [robo.asignar(ctx["universo_robo"], capital, perfil)
+            for perfil in robo.REPARTO for capital in (5000.0, 10000.0, 50000.0)]
+
+ETAPAS = {
+    "descargar_datos": etapa_descargar_datos,
+    "semaforo_bucle": etapa_semaforo_bucle,
+    "semaforo_universo": etapa_semaforo_universo,
+    "calidad_fundamental": etapa_calidad_fundamental,
+    "ranking": etapa_ranking,
+    "puntuar_tabla": etapa_puntuar_tabla,
+    "optimizador": etapa_optimizador,
+    "backtest": etapa_backtest,
+    "robo_asignar": etapa_robo_asignar,
+    "robo_reasignar": etapa_robo_reasignar,
+}
+
+
+# --- MEDICIÓN ---
+def medir(funcion, ctx, repeticiones):
+    """Mejor tiempo de 'repeticiones' ejecuciones + pico de memoria de una de ellas."""
+    tiempos = []
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        funcion(ctx)
+        tiempos.append(time.perf_counter() - inicio)
+    tracemalloc.start()
+    funcion(ctx)
+    _, pico = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {"segundos": min(tiempos), "mediana": float(np.median(tiempos)), "pico_mb": pico / 2**20}
+
+
+def commit_actual():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except Exception:
+        return "desconocido"
+
+
+def ejecutar(tamanos=TAMANOS, etapas=None, repeticiones=3):
+    etapas = etapas or list(ETAPAS)
+    proveedor_anterior = proveedores.obtener_proveedor()
+    directorio_cache = analisis_fundamental.CACHE_FUNDAMENTALES.directorio
+    directorio_monedas = divisas.CACHE_MONEDAS.directorio
+    analisis_fundamental.CACHE_FUNDAMENTALES.directorio = None # Nada de disco durante la medición
+    divisas.CACHE_MONEDAS.directorio = None
+    filas = []
+    try:
+        for n in tamanos:
+            panel = generar_panel(n)
+            fichas = generar_fundamentales(panel.columns)
+            proveedores.establecer_proveedor(ProveedorSintetico(panel, fichas))
+            ctx = {"panel": panel, "fichas": fichas, "tickers": list(panel.columns)}
+            for nombre in etapas:
+                # El bucle ticker a ticker con 5000 es muy lento: basta con una pasada
+                rep = 1 if (nombre == "semaforo_bucle" and n > 500) else repeticiones
+                r = medir(ETAPAS[nombre], ctx, rep)
+                filas.append({"etapa": nombre, "tickers": n, **r})
+                print(f"{nombre:<22} {n:>6} tickers  {r['segundos'] * 1000:>10.1f} ms  {r['pico_mb']:>8.1f} MB")
+    finally:
+        proveedores.establecer_proveedor(proveedor_anterior)
+        analisis_fundamental.CACHE_FUNDAMENTALES.directorio = directorio_cache
+        divisas.CACHE_MONEDAS.directorio = directorio_monedas
+    return filas
+
+
+def guardar(filas, fichero=FICHERO_HISTORIAL):
+    os.makedirs(os.path.dirname(fichero), exist_ok=True)
+    registro = {"commit": commit_actual(), "fecha": datetime.now().isoformat(timespec="seconds"), "resultados": filas}
+    with open(fichero, "a", encoding="utf-8") as f:
+        f.write(json.dumps(registro) + "\n")
+    return registro
+
+
+def comparar(registro, fichero=FICHERO_HISTORIAL):
+    """Compara con la última ejecución de OTRO commit y avisa de las regresiones."""
+    if not os.path.exists(fichero): return []
+    with open(fichero, encoding="utf-8") as f:
+        anteriores = [json.loads(l) for l in f if l.strip()]
+    anteriores = [r for r in anteriores if r["commit"] != registro["commit"]]
+    if not anteriores: return []
+    base = {(r["etapa"], r["tickers"]): r for r in anteriores[-1]["resultados"]}
+    regresiones = []
+    for r in registro["resultados"]:
+        previo = base.get((r["etapa"], r["tickers"]))
+        if previo and r["segundos"] > previo["segundos"] * UMBRAL_REGRESION:
+            regresiones.append((r["etapa"], r["tickers"], previo["segundos"], r["segundos"]))
+            print(f"⚠️ Regresión en {r['etapa']} ({r['tickers']}): "
+                  f"{previo['segundos'] * 1000:.1f} ms -> {r['segundos'] * 1000:.1f} ms (vs {anteriores[-1]['commit']})")
+    return regresiones
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmarks de El Chivato Bursátil")
+    parser.add_argument("--tamanos", type=int, nargs="+", default=TAMANOS)
+    parser.add_argument("--etapas", nargs="+", choices=list(ETAPAS), default=None)
+    parser.add_argument("--repeticiones", type=int, default=3)
+    parser.add_argument("--no-guardar", action="store_true", help="No añade el resultado al historial")
+    args = parser.parse_args()
+
+    filas = ejecutar(args.tamanos, args.etapas, args.repeticiones)
+    if not args.no_guardar:
+        comparar(guardar(filas))
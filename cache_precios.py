@@ -0,0 +1,61 @@
+import os
+import pickle
+from datetime import datetime, timedelta
+
+import pandas as pd
+
+# --- CONFIGURACIÓN DE LA CACHÉ ---
+# Carpeta donde guardamos un fichero por ticker con su histórico de cierres.
+DIRECTORIO_CACHE = os.environ.get("CHIVATO_CACHE_PRECIOS", os.path.join(".cache", "precios"))
+
+# Cuántas horas damos por bueno un histórico antes de pedir las velas nuevas a Yahoo.
+MAX_ANTIGUEDAD_HORAS = float(os.environ.get("CHIVATO_CACHE_HORAS", "6"))
+
+
+def _ruta(ticker):
+    # Algunos tickers llevan caracteres raros (ej: ^IBEX, EURUSD=X)
+    nombre = "".join(c if c.isalnum() or c in "-_." else "_" for c in ticker)
+    return os.path.join(DIRECTORIO_CACHE, f"{nombre}.pkl")
+
+
+def leer(ticker):
+    """Devuelve (serie, fecha_guardado) o (None, None) si no hay caché."""
+    ruta = _ruta(ticker)
+    if not os.path.exists(ruta):
+        return None, None
+    try:
+        with open(ruta, "rb") as f:
+            paquete = pickle.load(f)
+        return paquete["serie"], paquete["guardado"]
+    except Exception as e:
+        print(f"⚠️ Caché corrupta para {ticker}: {e}")
+        return None, None
+
+
+def guardar(ticker, serie):
+    """Guarda la serie de cierres de un ticker (escritura atómica)."""
+    os.makedirs(DIRECTORIO_CACHE, exist_ok=True)
+    ruta = _ruta(ticker)
+    temporal = f"{ruta}.{os.getpid()}.tmp"
+    with open(temporal, "wb") as f:
+        pickle.dump({"serie": serie, "guardado": datetime.now()}, f)
+    os.replace(temporal, ruta)
+
+
+def fusionar(vieja, nueva):
+    """Une el histórico cacheado con las velas nuevas (las nuevas mandan)."""
+    if vieja is None or vieja.empty:
+        return nueva
+    if nueva is None or nueva.empty:
+        return vieja
+    unida = pd.concat([vieja, nueva])
+    unida = unida[~unida.index.duplicated(keep="last")]
+    return unida.sort_index()
+
+
+def esta_fresca(guardado, max_horas=None):
+    if guardado is None:
+        return False
+    if max_horas is None:
+        max_horas = MAX_ANTIGUEDAD_HORAS
+    return datetime.now() - guardado < timedelta(hours=max_horas)
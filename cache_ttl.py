@@ -0,0 +1,176 @@
+import hashlib
+import os
+import pickle
+import threading
+import time
+from collections import OrderedDict
+
+
+class CacheTTL:
+    """
+    Caché clave -> valor con caducidad (TTL) y expulsión LRU por tamaño.
+    Tiene una capa en memoria (por proceso) y, si se indica 'directorio',
+    una capa en disco compartida entre sesiones de Streamlit y procesos.
+    En disco caben como mucho 'max_disco' ficheros (por defecto 10 x max_elementos):
+    al escribir se barre de vez en cuando lo caducado y, si aún sobran, lo que antes caduca.
+    """
+
+    BARRIDO_SEGUNDOS = 600 # Cada cuánto (como mucho) se barre el disco al escribir
+
+    def __init__(self, ttl_segundos, max_elementos=1000, directorio=None, max_disco=None):
+        self.ttl = ttl_segundos
+        self.max_elementos = max_elementos
+        self.directorio = directorio
+        self.max_disco = 10 * max_elementos if max_disco is None else max_disco
+        self._datos = OrderedDict() # clave -> (instante_caducidad, valor)
+        self._lock = threading.Lock()
+        self._ultimo_barrido = 0.0
+        self.aciertos = 0
+        self.aciertos_disco = 0
+        self.fallos = 0
+        self.expulsiones = 0
+        self.expulsiones_disco = 0
+
+    # --- CAPA EN DISCO ---
+    def _ruta(self, clave):
+        resumen = hashlib.sha1(repr(clave).encode("utf-8")).hexdigest()
+        return os.path.join(self.directorio, f"{resumen}.pkl")
+
+    def _leer_disco(self, clave):
+        if not self.directorio: return None
+        ruta = self._ruta(clave)
+        try:
+            with open(ruta, "rb") as f:
+                caduca, clave_guardada, valor = pickle.load(f)
+        except (FileNotFoundError, EOFError):
+            return None
+        except Exception as e:
+            print(f"⚠️ Caché en disco ilegible ({ruta}): {e}")
+            return None
+        if clave_guardada != clave: return None
+        if caduca < time.time():
+            try: os.remove(ruta)
+            except OSError: pass
+            return None
+        return caduca, valor
+
+    def _escribir_disco(self, clave, caduca, valor):
+        if not self.directorio: return
+        try:
+            os.makedirs(self.directorio, exist_ok=True)
+            ruta = self._ruta(clave)
+            temporal = f"{ruta}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(temporal, "wb") as f:
+                pickle.dump((caduca, clave, valor), f)
+            # La fecha de modificación es la de caducidad: el barrido no tiene que abrir el fichero
+            os.utime(temporal, (caduca, caduca))
+            os.replace(temporal, ruta) # Escritura atómica: otros procesos nunca leen a medias
+        except Exception as e:
+            print(f"⚠️ No se pudo escribir la caché en disco: {e}")
+            return
+        self._barrer_disco()
+
+    def _barrer_disco(self, forzar=False):
+        """Borra del disco lo caducado (y temporales huérfanos) y, si sobran ficheros, los que antes caducan."""
+        ahora = time.time()
+        with self._lock:
+            if not forzar and ahora - self._ultimo_barrido < self.BARRIDO_SEGUNDOS: return
+            self._ultimo_barrido = ahora
+        try:
+            nombres = os.listdir(self.directorio)
+        except OSError:
+            return
+        vivos, borrar = [], []
+        for nombre in nombres:
+            ruta = os.path.join(self.directorio, nombre)
+            try: modificado = os.stat(ruta).st_mtime
+            except OSError: continue
+            if nombre.endswith(".tmp"):
+                # Escritura de un proceso que murió a medias (las vivas tardan milisegundos)
+                if modificado < ahora - self.BARRIDO_SEGUNDOS: borrar.append(ruta)
+            elif nombre.endswith(".pkl"):
+                if modificado < ahora: borrar.append(ruta)
+                else: vivos.append((modificado, ruta))
+        vivos.sort()
+        borrar += [ruta for _, ruta in vivos[:max(0, len(vivos) - self.max_disco)]]
+        borrados = 0
+        for ruta in borrar:
+            try: os.remove(ruta)
+            except OSError: continue
+            borrados += ruta.endswith(".pkl")
+        with self._lock:
+            self.expulsiones_disco += borrados
+
+    # --- API PÚBLICA ---
+    def obtener(self, clave, por_defecto=None):
+        ahora = time.time()
+        with self._lock:
+            entrada = self._datos.get(clave)
+            if entrada is not None:
+                if entrada[0] >= ahora:
+                    self._datos.move_to_end(clave)
+                    self.aciertos += 1
+                    return entrada[1]
+                del self._datos[clave]
+
+        en_disco = self._leer_disco(clave)
+        with self._lock:
+            if en_disco is None:
+                self.fallos += 1
+                return por_defecto
+            self.aciertos_disco += 1
+            self._meter(clave, en_disco[0], en_disco[1])
+        return en_disco[1]
+
+    def guardar(self, clave, valor, ttl_segundos=None):
+        caduca = time.time() + (self.ttl if ttl_segundos is None else ttl_segundos)
+        with self._lock:
+            self._meter(clave, caduca, valor)
+        self._escribir_disco(clave, caduca, valor)
+
+    def _meter(self, clave, caduca, valor):
+        self._datos[clave] = (caduca, valor)
+        self._datos.move_to_end(clave)
+        while len(self._datos) > self.max_elementos:
+            self._datos.popitem(last=False)
+            self.expulsiones += 1
+
+    def obtener_o_calcular(self, clave, funcion):
+        """Devuelve el valor cacheado o lo calcula con funcion() (None no se cachea)."""
+        valor = self.obtener(clave)
+        if valor is None:
+            valor = funcion()
+            if valor is not None:
+                self.guardar(clave, valor)
+        return valor
+
+    def borrar(self, clave):
+        with self._lock:
+            self._datos.pop(clave, None)
+        if self.directorio:
+            try: os.remove(self._ruta(clave))
+            except OSError: pass
+
+    def limpiar(self, tambien_disco=False):
+        with self._lock:
+            self._datos.clear()
+        if tambien_disco and self.directorio and os.path.isdir(self.directorio):
+            for nombre in os.listdir(self.directorio):
+                if nombre.endswith(".pkl"):
+                    try: os.remove(os.path.join(self.directorio, nombre))
+                    except OSError: pass
+
+    def __len__(self):
+        return len(self._datos)
+
+    def estadisticas(self):
+        consultas = self.aciertos + self.aciertos_disco + self.fallos
+        return {
+            "aciertos": self.aciertos,
+            "aciertos_disco": self.aciertos_disco,
+            "fallos": self.fallos,
+            "expulsiones": self.expulsiones,
+            "expulsiones_disco": self.expulsiones_disco,
+            "elementos": len(self._datos),
+            "tasa_acierto": (self.aciertos + self.aciertos_disco) / consultas if consultas else 0.0,
+        }
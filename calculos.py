@@ -1,16 +1,24 @@
 import pandas as pd
 import numpy as np
+from diagnostico import cronometrado
 
+def como_dataframe(df):
+    """Acepta DataFrames o el panel compartido (panel_precios.PanelPrecios, vista sin copia)."""
+    return df.a_dataframe() if hasattr(df, "a_dataframe") else df
+
+@cronometrado("calculos.calcular_retornos_diarios")
 def calcular_retornos_diarios(df):
-    return df.pct_change().dropna()
+    return como_dataframe(df).pct_change().dropna()
 
 def calcular_riesgo(retornos):
     return retornos.std()
 
 def calcular_retorno_acumulado(df):
+    df = como_dataframe(df)
     if df.empty: return 0
     return (df.iloc[-1] - df.iloc[0]) / df.iloc[0]
 
+@cronometrado("calculos.analizar_semaforo")
 def analizar_semaforo(df, ticker):
     """Analiza tendencia y volatilidad."""
     if ticker not in df.columns:
@@ -33,6 +41,11 @@ def analizar_semaforo(df, ticker):
     if pd.isna(media_50):
         media_50 = precio_actual # Parche para no romper
     
+    estado, mensaje = clasificar_semaforo(precio_actual, media_50, volatilidad)
+    return estado, mensaje, precio_actual, volatilidad
+
+def clasificar_semaforo(precio_actual, media_50, volatilidad):
+    """Las reglas del juez, separadas para reutilizarlas (ej: semáforo en vivo)."""
     # REGLAS DEL JUEZ
     # Nota: El análisis de tendencia sirve igual en Dólares que en Euros
     if precio_actual < media_50:
@@ -45,4 +58,54 @@ def analizar_semaforo(df, ticker):
         estado = "VERDE"
         mensaje = "Tendencia Alcista"
         
-    return estado, mensaje, precio_actual, volatilidad
\ No newline at end of file
+    return estado, mensaje
+
+@cronometrado("calculos.analizar_semaforo_universo")
+def analizar_semaforo_universo(df):
+    """
+    Versión vectorizada de analizar_semaforo para TODAS las columnas a la vez.
+    Devuelve un DataFrame ordenado (una fila por ticker) con:
+    Ticker, Estado, Mensaje, Precio, Volatilidad, Media50.
+    Da exactamente los mismos resultados que llamar a analizar_semaforo ticker a ticker.
+    También acepta el panel compartido: se recorre por bloques de columnas para no
+    convertir a float64 miles de tickers de golpe.
+    """
+    if hasattr(df, "bloques"):
+        partes = [analizar_semaforo_universo(b) for b in df.bloques()]
+        return pd.concat(partes, ignore_index=True) if partes else analizar_semaforo_universo(pd.DataFrame())
+    columnas = ["Ticker", "Estado", "Mensaje", "Precio", "Volatilidad", "Media50"]
+    if df.empty or df.shape[1] == 0:
+        return pd.DataFrame(columns=columnas)
+
+    valores = df.to_numpy(dtype="float64")
+    hay_dato = ~np.isnan(valores)
+
+    # Empujamos los datos válidos de cada columna hacia abajo (los NaN quedan arriba),
+    # así cada columna equivale a su serie.dropna() alineada por el final.
+    orden = np.argsort(hay_dato, axis=0, kind="stable")
+    compacto = pd.DataFrame(np.take_along_axis(valores, orden, axis=0))
+
+    precio = compacto.iloc[-1].to_numpy()
+    media_50 = compacto.rolling(window=50).mean().iloc[-1].to_numpy()
+    retornos = compacto / compacto.shift(1) - 1 # = pct_change() de la serie sin huecos
+    volatilidad = retornos.tail(30).std().to_numpy()
+
+    vacia = ~hay_dato.any(axis=0)
+    # Si falta la media (acción muy nueva), usamos el precio (mismo parche que analizar_semaforo)
+    media_50 = np.where(np.isnan(media_50), precio, media_50)
+
+    # REGLAS DEL JUEZ
+    rojo = precio < media_50
+    naranja = ~rojo & (precio > media_50) & (volatilidad > 0.015)
+    estado = np.select([vacia, rojo, naranja], ["ERROR", "ROJO", "NARANJA"], default="VERDE")
+    mensaje = np.select([vacia, rojo, naranja], ["Serie vacía", "Tendencia Bajista", "Alta Volatilidad"],
+                        default="Tendencia Alcista")
+
+    return pd.DataFrame({
+        "Ticker": df.columns,
+        "Estado": estado,
+        "Mensaje": mensaje,
+        "Precio": np.where(vacia, 0, precio),
+        "Volatilidad": np.where(vacia, 0, volatilidad),
+        "Media50": np.where(vacia, 0, media_50),
+    })
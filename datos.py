@@ -1,5 +1,9 @@
-import yfinance as yf
 import pandas as pd
+import cache_precios
+import divisas
+import proveedores
+from diagnostico import contar, cronometrado, medir
+from indice_nombres import IndiceNombres
 
 # --- DICCIONARIO DE NOMBRES ---
 NOMBRES = {
@@ -28,63 +32,97 @@ NOMBRES = {
 
 EMPRESAS_SELECCIONADAS = list(NOMBRES.keys())
 
+# Índice de búsqueda (prefijos + trigramas) construido una sola vez al importar
+INDICE = IndiceNombres(NOMBRES)
+
 def encontrar_ticker(texto_busqueda):
     texto = texto_busqueda.strip().upper()
     if texto in EMPRESAS_SELECCIONADAS: return texto
-    for ticker, nombre in NOMBRES.items():
-        if texto in nombre.upper(): return ticker
+    ticker = INDICE.mejor(texto_busqueda)
+    if ticker: return ticker
     return texto
 
-def descargar_datos(tickers):
+def sugerir_tickers(texto_busqueda, k=5):
+    """Sugerencias para autocompletar: [(ticker, nombre, puntuacion), ...]."""
+    return INDICE.buscar(texto_busqueda, k=k)
+
+@cronometrado("datos.descargar_datos")
+def descargar_datos(tickers, usar_cache=True, max_horas=None):
     """
     Descarga robusta que maneja Series, DataFrames y MultiIndex.
+    Con usar_cache=True lee primero el histórico local y solo pide a Yahoo
+    las velas posteriores a la última fecha guardada (ver cache_precios).
     """
     if not tickers: return pd.DataFrame()
     
-    print(f"📡 Descargando: {tickers}")
-    
     # Separamos listas para evitar conflictos de moneda/mercado
     lista_es = [t for t in tickers if ".MC" in t]
     lista_us = [t for t in tickers if ".MC" not in t]
     
     df_final = pd.DataFrame()
 
-    def procesar(lista_tickers):
-        if not lista_tickers: return pd.DataFrame()
+    def descarga_directa(lista_tickers, **kwargs):
+        print(f"📡 Descargando: {lista_tickers}")
         try:
-            # Forzamos descarga como grupo
-            datos = yf.download(lista_tickers, period="1y", auto_adjust=True, progress=False)
-            
-            # Caso 1: Yahoo devuelve MultiIndex (Price, Ticker)
-            if isinstance(datos.columns, pd.MultiIndex):
-                try:
-                    df = datos['Close'] # Intentamos coger solo cierre
-                except KeyError:
-                    # Si falla, a veces la columna se llama diferente o no hay MultiIndex claro
-                    df = datos
-            # Caso 2: Index simple (Open, Close, etc.) - Típico de 1 sola empresa
-            elif 'Close' in datos.columns:
-                df = datos[['Close']] # Lo mantenemos como DataFrame
-            else:
-                df = datos # Fallback
-            
-            # --- LIMPIEZA CRÍTICA ---
-            # Si descargamos 1 sola empresa, Yahoo a veces no pone el nombre del Ticker en la columna.
-            # Aquí lo forzamos manualmente.
-            if len(lista_tickers) == 1:
-                # Si es una Serie, la convertimos
-                if isinstance(df, pd.Series):
-                    df = df.to_frame()
-                
-                # Si tiene 1 columna, le ponemos el nombre del ticker SÍ o SÍ.
-                if df.shape[1] == 1:
-                    df.columns = lista_tickers
-                    
-            return df
+            with medir("datos.descarga_precios"):
+                return proveedores.obtener_proveedor().precios(lista_tickers, **kwargs)
         except Exception as e:
             print(f"⚠️ Error en descarga parcial {lista_tickers}: {e}")
             return pd.DataFrame()
 
+    def procesar(lista_tickers):
+        if not lista_tickers: return pd.DataFrame()
+        if not usar_cache:
+            return descarga_directa(lista_tickers, period="1y")
+
+        # 1. Miramos qué tenemos ya en disco
+        series, caducadas, sin_cache = {}, {}, []
+        for t in lista_tickers:
+            serie, guardado = cache_precios.leer(t)
+            if serie is None or serie.empty:
+                sin_cache.append(t)
+            elif cache_precios.esta_fresca(guardado, max_horas):
+                series[t] = serie
+            else:
+                caducadas[t] = serie
+        contar("precios.cache_fresca", len(series))
+        contar("precios.cache_caducada", len(caducadas))
+        contar("precios.sin_cache", len(sin_cache))
+
+        # 2. Los que no conocemos: año completo
+        if sin_cache:
+            df = descarga_directa(sin_cache, period="1y")
+            for t in sin_cache:
+                if t not in df.columns: continue
+                serie = df[t].dropna()
+                if not serie.empty: cache_precios.guardar(t, serie)
+                series[t] = serie
+
+        # 3. Los caducados: solo desde la última vela guardada (se re-descarga para cerrarla).
+        # Una descarga por fecha de última vela: un ticker atrasado no alarga la de los demás
+        grupos = {}
+        for t, vieja in caducadas.items():
+            grupos.setdefault(vieja.index[-1].normalize(), []).append(t)
+        for desde, grupo in grupos.items():
+            df = descarga_directa(grupo, start=desde.strftime("%Y-%m-%d"))
+            for t in grupo:
+                nueva = df[t].dropna() if t in df.columns else None
+                if nueva is None or nueva.empty:
+                    # Sin velas nuevas (fallo de descarga): servimos lo viejo sin marcarlo
+                    # como fresco, así se vuelve a intentar en la siguiente petición
+                    series[t] = caducadas[t]
+                    continue
+                serie = cache_precios.fusionar(caducadas[t], nueva)
+                cache_precios.guardar(t, serie)
+                series[t] = serie
+
+        if not series: return pd.DataFrame()
+        df = pd.DataFrame({t: series[t] for t in lista_tickers if t in series})
+        # Mantenemos la misma ventana que pedíamos a Yahoo (period="1y"), contada desde la última vela
+        if df.empty: return df
+        inicio = df.index[-1].normalize() - pd.DateOffset(years=1)
+        return df[df.index >= inicio]
+
     # Ejecutamos
     df_es = procesar(lista_es)
     df_us = procesar(lista_us)
@@ -101,11 +139,23 @@ def descargar_datos(tickers):
         
     return df_final
 
-def obtener_precio_dolar():
-    try:
-        tasa = yf.Ticker("EURUSD=X").history(period="1d")['Close'].iloc[-1]
-        return 1 / tasa
-    except:
-        return 1.0
+# Tickers por descarga en los universos grandes (yfinance no admite varias descargas a la vez)
+TAMANO_BLOQUE = 200
+
+def descargar_datos_en_bloques(tickers, tamano_bloque=TAMANO_BLOQUE):
+    """descargar_datos para miles de tickers: por bloques, cada uno aprovechando la caché de cierres."""
+    bloques = [tickers[i:i + tamano_bloque] for i in range(0, len(tickers), tamano_bloque)]
+    partes = [descargar_datos(b) for b in bloques]
+    partes = [p for p in partes if not p.empty]
+    return pd.concat(partes, axis=1).sort_index() if partes else pd.DataFrame()
 
+def leer_universo(ruta):
+    """Un ticker por línea (se ignoran las vacías y las que empiezan por '#'); vale un CSV con el ticker primero."""
+    with open(ruta, encoding="utf-8") as f:
+        lineas = [l.split(",")[0].strip() for l in f if l.strip() and not l.startswith("#")]
+    return [t for t in lineas if t and t.lower() != "ticker"]
 
+@cronometrado("datos.obtener_precio_dolar")
+def obtener_precio_dolar(usar_cache=True):
+    """USD -> EUR. Atajo de divisas.obtener_tasas (que hace lo mismo para cualquier moneda)."""
+    return float(divisas.obtener_tasas(["USD"], usar_cache)["USD"])
@@ -0,0 +1,67 @@
+import os
+
+import datos
+import ia
+from cache_ttl import CacheTTL
+from indice_nombres import normalizar
+
+# --- DETECTIVE DE TICKERS ---
+# Orden de búsqueda (de más barato a más caro):
+#   1. El usuario ya escribió un ticker conocido.
+#   2. Índice local de nombres (datos.INDICE), normalizado y con tolerancia a erratas.
+#   3. Tabla de nombres ya resueltos por la IA en búsquedas anteriores (con caducidad).
+#   4. Solo entonces preguntamos a Gemini.
+
+MODELO_DETECTIVE = "gemini-3-flash-preview"
+
+CACHE_RESUELTOS = CacheTTL(
+    ttl_segundos=float(os.environ.get("CHIVATO_DETECTIVE_DIAS", "30")) * 86400,
+    max_elementos=5000,
+    directorio=os.environ.get("CHIVATO_CACHE_DETECTIVE", os.path.join(".cache", "detective")),
+)
+
+# Puntuación mínima del índice (0-100) para fiarnos sin preguntar a la IA.
+# Solo coincidencias exactas: ticker (100) o nombre normalizado completo (95). Un prefijo
+# ("F", "BA") o un parecido ("Santander Brasil") puede ser otra empresa de fuera del índice:
+# eso lo decide la caché de resueltos o la IA.
+PUNTUACION_MINIMA = 90.0
+
+
+def buscar_local(nombre):
+    """Busca en el índice de datos.NOMBRES sin red (solo aciertos exactos). Devuelve el ticker o None."""
+    texto = nombre.strip().upper()
+    if texto in datos.NOMBRES: return texto
+    return datos.INDICE.mejor(nombre, puntuacion_minima=PUNTUACION_MINIMA)
+
+
+def preguntar_ia(nombre, client, modelo=MODELO_DETECTIVE):
+    """
+    Pregunta a Gemini el ticker. Devuelve el ticker o None si la IA no está segura.
+    Pasa por ia.generar_texto: varias sesiones buscando el mismo nombre a la vez hacen una sola llamada.
+    """
+    prompt_ticker = f"""
+    Responde SOLO con el símbolo (Ticker) de Yahoo Finance para la empresa: "{nombre}".
+    Si no estás seguro, responde "ERROR".
+    """
+    ticker = (ia.generar_texto(client, prompt_ticker, modelo) or "").strip()
+    if not ticker or "ERROR" in ticker: return None
+    return ticker
+
+
+def resolver_ticker(nombre, client=None, modelo=MODELO_DETECTIVE):
+    """
+    Convierte un nombre de empresa en ticker de Yahoo.
+    Devuelve (ticker, origen) con origen en "local", "cache" o "ia"; (None, ...) si no se encuentra.
+    """
+    ticker = buscar_local(nombre)
+    if ticker: return ticker, "local"
+
+    clave = normalizar(nombre)
+    ticker = CACHE_RESUELTOS.obtener(clave)
+    if ticker: return ticker, "cache"
+
+    if client is None: return None, "sin_ia"
+    ticker = preguntar_ia(nombre, client, modelo)
+    if ticker:
+        CACHE_RESUELTOS.guardar(clave, ticker)
+    return ticker, "ia"
@@ -0,0 +1,181 @@
+import contextvars
+import functools
+import json
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+
+# --- INSTRUMENTACIÓN LIGERA ---
+# medir("etapa") / @cronometrado("etapa") apuntan cuánto tarda cada descarga y cada cálculo.
+# Se acumula en dos sitios: el total del proceso y la "petición" actual (una ejecución
+# del script de Streamlit), para saber a dónde se fueron los 40 segundos de un ranking.
+
+class Registro:
+    """Tiempos (llamadas, total, máximo) y contadores por nombre."""
+
+    def __init__(self, nombre=""):
+        self.nombre = nombre
+        self.inicio = time.perf_counter()
+        self.tiempos = defaultdict(lambda: [0, 0.0, 0.0]) # nombre -> [llamadas, total_s, max_s]
+        self.contadores = defaultdict(int)
+        self.medido_raiz = 0.0 # Suma de las etapas de primer nivel (sin contar anidadas)
+        self._lock = threading.Lock()
+
+    def anotar(self, nombre, segundos, es_raiz=False):
+        with self._lock:
+            t = self.tiempos[nombre]
+            t[0] += 1
+            t[1] += segundos
+            t[2] = max(t[2], segundos)
+            if es_raiz: self.medido_raiz += segundos
+
+    def contar(self, nombre, n=1):
+        with self._lock:
+            self.contadores[nombre] += n
+
+    def resumen(self):
+        with self._lock:
+            total = time.perf_counter() - self.inicio
+            return {
+                "peticion": self.nombre,
+                "segundos_totales": total,
+                "segundos_sin_medir": max(0.0, total - self.medido_raiz), # Render de Streamlit, etc.
+                "tiempos": {
+                    n: {"llamadas": c, "total_s": s, "max_s": m, "media_s": s / c if c else 0.0}
+                    for n, (c, s, m) in sorted(self.tiempos.items(), key=lambda x: -x[1][1])
+                },
+                "contadores": dict(self.contadores),
+            }
+
+
+PROCESO = Registro("proceso")
+_peticion = contextvars.ContextVar("chivato_peticion", default=None)
+_profundidad = contextvars.ContextVar("chivato_profundidad", default=0)
+
+
+def iniciar_peticion(nombre=""):
+    """Abre un registro nuevo para esta ejecución del script (llamar al principio de cada página)."""
+    registro = Registro(nombre)
+    _peticion.set(registro)
+    _profundidad.set(0)
+    return registro
+
+
+def peticion_actual():
+    return _peticion.get()
+
+
+@contextmanager
+def medir(nombre):
+    """with medir("datos.descargar_datos"): ..."""
+    profundidad = _profundidad.get()
+    marca = _profundidad.set(profundidad + 1)
+    inicio = time.perf_counter()
+    try:
+        yield
+    finally:
+        segundos = time.perf_counter() - inicio
+        _profundidad.reset(marca)
+        es_raiz = profundidad == 0
+        PROCESO.anotar(nombre, segundos, es_raiz)
+        registro = _peticion.get()
+        if registro is not None:
+            registro.anotar(nombre, segundos, es_raiz)
+
+
+def cronometrado(nombre=None):
+    """Decorador: @cronometrado("calculos.analizar_semaforo")."""
+    def decorador(funcion):
+        etiqueta = nombre or f"{funcion.__module__}.{funcion.__name__}"
+
+        @functools.wraps(funcion)
+        def envoltorio(*args, **kwargs):
+            with medir(etiqueta):
+                return funcion(*args, **kwargs)
+        return envoltorio
+    return decorador
+
+
+def anotar(nombre, segundos):
+    """Apunta un tiempo medido a mano (ej: un stream que se consume poco a poco)."""
+    PROCESO.anotar(nombre, segundos)
+    registro = _peticion.get()
+    if registro is not None:
+        registro.anotar(nombre, segundos)
+
+
+def contar(nombre, n=1):
+    PROCESO.contar(nombre, n)
+    registro = _peticion.get()
+    if registro is not None:
+        registro.contar(nombre, n)
+
+
+def en_hilo(funcion):
+    """
+    Para ThreadPoolExecutor: grupo.submit(en_hilo(f), ...) hace que los tiempos
+    medidos dentro del hilo cuenten en la petición que lo lanzó.
+    """
+    contexto = contextvars.copy_context()
+
+    @functools.wraps(funcion)
+    def envoltorio(*args, **kwargs):
+        # Cada hilo necesita su propia copia (un contexto no se puede usar en dos hilos a la vez)
+        return contexto.copy().run(funcion, *args, **kwargs)
+    return envoltorio
+
+
+# --- EXPORTACIÓN ---
+def exportar_json(registro=None):
+    return json.dumps((registro or PROCESO).resumen(), indent=2, ensure_ascii=False)
+
+
+def _etiqueta(valor):
+    return str(valor).replace("\\", "\\\\").replace('"', '\\"')
+
+
+def exportar_prometheus(registro=None):
+    """Texto en formato de exposición de Prometheus."""
+    r = (registro or PROCESO).resumen()
+    lineas = [
+        "# HELP chivato_etapa_segundos_total Tiempo acumulado por etapa.",
+        "# TYPE chivato_etapa_segundos_total counter",
+    ]
+    lineas += [f'chivato_etapa_segundos_total{{etapa="{_etiqueta(n)}"}} {t["total_s"]:.6f}' for n, t in r["tiempos"].items()]
+    lineas += ["# HELP chivato_etapa_llamadas_total Llamadas por etapa.", "# TYPE chivato_etapa_llamadas_total counter"]
+    lineas += [f'chivato_etapa_llamadas_total{{etapa="{_etiqueta(n)}"}} {t["llamadas"]}' for n, t in r["tiempos"].items()]
+    lineas += ["# HELP chivato_etapa_segundos_max Llamada más lenta por etapa.", "# TYPE chivato_etapa_segundos_max gauge"]
+    lineas += [f'chivato_etapa_segundos_max{{etapa="{_etiqueta(n)}"}} {t["max_s"]:.6f}' for n, t in r["tiempos"].items()]
+    lineas += ["# HELP chivato_eventos_total Contadores (aciertos de caché, descargas...).", "# TYPE chivato_eventos_total counter"]
+    lineas += [f'chivato_eventos_total{{nombre="{_etiqueta(n)}"}} {v}' for n, v in r["contadores"].items()]
+    return "\n".join(lineas) + "\n"
+
+
+# --- PANEL DE STREAMLIT ---
+def mostrar_panel():
+    """Panel opcional "⏱️ Diagnóstico" en la barra lateral (llamar al final de la página)."""
+    import streamlit as st
+    import analisis_fundamental
+    import ia
+
+    with st.sidebar:
+        if not st.toggle("⏱️ Diagnóstico", value=False, key="diagnostico_activo"):
+            return
+        registro = peticion_actual() or PROCESO
+        r = registro.resumen()
+        st.caption(f"Esta ejecución: {r['segundos_totales']:.2f} s "
+                   f"(sin medir / render: {r['segundos_sin_medir']:.2f} s)")
+        if r["tiempos"]:
+            st.dataframe(
+                [{"Etapa": n, "Llamadas": t["llamadas"], "Total (s)": round(t["total_s"], 3),
+                  "Máx (s)": round(t["max_s"], 3)} for n, t in r["tiempos"].items()],
+                hide_index=True, use_container_width=True,
+            )
+        fund = analisis_fundamental.estadisticas_cache()
+        st.caption(f"Caché fundamentales: {fund['tasa_acierto']:.0%} aciertos · "
+                   f"IA: {ia.metricas()['tasa_acierto']:.0%} aciertos")
+        st.download_button("JSON", exportar_json(registro), file_name="diagnostico.json",
+                           mime="application/json", use_container_width=True)
+        st.download_button("Prometheus", exportar_prometheus(PROCESO), file_name="metrics.txt",
+                           mime="text/plain", use_container_width=True)
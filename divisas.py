@@ -0,0 +1,152 @@
+"""
+Conversión de divisas para todo el universo (no solo USD -> EUR).
+
+    tasas = divisas.obtener_tasas(["USD", "GBP", "CHF"])   # EUR por unidad, UNA descarga
+    df_eur = divisas.convertir_columnas(df_precios)         # Cada columna en su moneda -> EUR
+
+La moneda de cada ticker sale de su ficha (campo 'currency', que se apunta al
+descargar fundamentales) y, si no la conocemos, del sufijo de Yahoo (.MC, .L, .SW...).
+Las bolsas que cotizan en céntimos (Londres en GBp, Johannesburgo en ZAc) se
+convierten a su moneda dividiendo entre 100.
+"""
+import os
+
+import numpy as np
+import pandas as pd
+
+import proveedores
+from cache_ttl import CacheTTL
+from diagnostico import contar, cronometrado
+
+MONEDA_BASE = "EUR"
+
+# Las que se precargan aunque nadie las haya pedido aún
+MONEDAS_HABITUALES = ["USD", "GBP", "CHF", "JPY", "CAD", "SEK", "NOK", "DKK", "HKD", "AUD"]
+
+SUFIJOS = {
+    ".MC": "EUR", ".PA": "EUR", ".DE": "EUR", ".F": "EUR", ".MI": "EUR", ".AS": "EUR",
+    ".BR": "EUR", ".LS": "EUR", ".VI": "EUR", ".HE": "EUR", ".IR": "EUR",
+    ".L": "GBp", ".SW": "CHF", ".T": "JPY", ".HK": "HKD", ".TO": "CAD", ".V": "CAD",
+    ".AX": "AUD", ".ST": "SEK", ".OL": "NOK", ".CO": "DKK", ".SA": "BRL", ".MX": "MXN",
+    ".JO": "ZAc", ".NS": "INR", ".KS": "KRW", ".SS": "CNY", ".SZ": "CNY",
+}
+SUBUNIDADES = {"GBp": ("GBP", 0.01), "GBX": ("GBP", 0.01), "ZAc": ("ZAR", 0.01), "ILA": ("ILS", 0.01)}
+
+# Tipos de cambio: un rato (memoria + disco) para no pedirlos en cada ranking
+CACHE_TASAS = CacheTTL(
+    ttl_segundos=float(os.environ.get("CHIVATO_CACHE_DIVISA_MINUTOS", "60")) * 60,
+    max_elementos=200,
+    directorio=os.environ.get("CHIVATO_CACHE_DIVISA", os.path.join(".cache", "divisas")),
+)
+# Moneda de cotización de cada ticker (cambia muy rara vez)
+CACHE_MONEDAS = CacheTTL(
+    ttl_segundos=30 * 24 * 3600,
+    max_elementos=50000,
+    directorio=os.environ.get("CHIVATO_CACHE_MONEDAS", os.path.join(".cache", "monedas")),
+)
+
+
+def par_yahoo(moneda):
+    """'USD' -> 'EURUSD=X' (cuántos USD vale 1 EUR)."""
+    return f"{MONEDA_BASE}{moneda}=X"
+
+
+def _unidad(moneda):
+    """'GBp' -> ('GBP', 0.01); 'USD' -> ('USD', 1.0)."""
+    return SUBUNIDADES.get(moneda, (moneda.upper(), 1.0))
+
+
+# --- TIPOS DE CAMBIO ---
+@cronometrado("divisas.obtener_tasas")
+def obtener_tasas(monedas=None, usar_cache=True):
+    """
+    Serie moneda -> EUR por unidad. Las que no estén en caché se piden todas juntas
+    en una sola descarga de precios (un ticker 'EURxxx=X' por moneda).
+    """
+    monedas = sorted({_unidad(m)[0] for m in (monedas if monedas is not None else MONEDAS_HABITUALES)})
+    tasas = {MONEDA_BASE: 1.0}
+    faltan = []
+    for m in monedas:
+        if m == MONEDA_BASE: continue
+        guardada = CACHE_TASAS.obtener(m) if usar_cache else None
+        if guardada is None: faltan.append(m)
+        else: tasas[m] = guardada
+    contar("divisas.cache_acierto", len(monedas) - len(faltan) - (MONEDA_BASE in monedas))
+    contar("divisas.descargadas", len(faltan))
+
+    if faltan:
+        proveedor = proveedores.obtener_proveedor()
+        ultimos = {}
+        try:
+            df = proveedor.precios([par_yahoo(m) for m in faltan], period="5d")
+            ultimos = {c: df[c].dropna().iloc[-1] for c in df.columns if not df[c].dropna().empty}
+        except Exception as e:
+            print(f"⚠️ Descarga de divisas en bloque fallida: {e}")
+        for m in faltan:
+            try:
+                cotizacion = ultimos.get(par_yahoo(m))
+                if cotizacion is None: # Rezagadas: de una en una
+                    cotizacion = proveedor.tipo_cambio(par_yahoo(m))
+                tasas[m] = 1 / float(cotizacion)
+                CACHE_TASAS.guardar(m, tasas[m])
+            except Exception as e:
+                print(f"⚠️ Sin tipo de cambio para {m}, se deja sin convertir: {e}")
+                tasas[m] = 1.0
+    return pd.Series({m: tasas[m] for m in [MONEDA_BASE] + monedas if m in tasas}, dtype="float64")
+
+
+def matriz_tasas(monedas=None, usar_cache=True):
+    """Matriz origen x destino: cuántas unidades de la columna vale una de la fila."""
+    tasas = obtener_tasas(monedas, usar_cache)
+    valores = tasas.to_numpy()
+    return pd.DataFrame(valores[:, None] / valores[None, :], index=tasas.index, columns=tasas.index)
+
+
+# --- MONEDA DE CADA TICKER ---
+def anotar_moneda(ticker, info):
+    """Apunta la moneda de la ficha (se llama al descargar fundamentales)."""
+    if info and info.get("currency"):
+        CACHE_MONEDAS.guardar(ticker, info["currency"])
+
+
+def moneda_por_sufijo(ticker):
+    punto = ticker.rfind(".")
+    return SUFIJOS.get(ticker[punto:].upper(), "USD") if punto > 0 else "USD"
+
+
+def moneda_de(ticker, info=None):
+    """Moneda de cotización: la ficha si la tenemos, la apuntada antes o, si no, por el sufijo."""
+    if info and info.get("currency"):
+        return info["currency"]
+    return CACHE_MONEDAS.obtener(ticker) or moneda_por_sufijo(ticker)
+
+
+def monedas_de(tickers, obtener_ficha=None):
+    obtener_ficha = obtener_ficha or (lambda ticker: None)
+    return pd.Series([moneda_de(t, obtener_ficha(t)) for t in tickers], index=list(tickers), dtype="object")
+
+
+# --- CONVERSIÓN VECTORIZADA ---
+def factores(tickers, tasas=None, obtener_ficha=None):
+    """Array con los EUR por unidad de precio de cada ticker (incluye céntimos -> unidad)."""
+    monedas = monedas_de(tickers, obtener_ficha)
+    unidades = [_unidad(m) for m in monedas]
+    if tasas is None:
+        tasas = obtener_tasas({u for u, _ in unidades})
+    else:
+        tasas = pd.Series(tasas, dtype="float64")
+        que_faltan = {u for u, _ in unidades} - set(tasas.index) - {MONEDA_BASE}
+        if que_faltan: tasas = pd.concat([tasas, obtener_tasas(que_faltan).drop(MONEDA_BASE)])
+        tasas[MONEDA_BASE] = 1.0
+    return tasas.reindex([u for u, _ in unidades]).to_numpy() * np.array([e for _, e in unidades])
+
+
+def convertir(valores, tickers, tasas=None, obtener_ficha=None):
+    """Precios sueltos (uno por ticker) a EUR de una vez."""
+    return np.asarray(valores, dtype="float64") * factores(tickers, tasas, obtener_ficha)
+
+
+def convertir_columnas(df, tasas=None, obtener_ficha=None):
+    """Cada columna de un DataFrame de cierres a EUR (multiplica por fila, sin bucles)."""
+    if df.empty: return df
+    return df * factores(df.columns, tasas, obtener_ficha)
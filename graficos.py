@@ -1,21 +1,119 @@
-import matplotlib.pyplot as plt
+import hashlib
+import io
+import os
 
-def crear_grafico_lineas(df):
+import numpy as np
+import pandas as pd
+from matplotlib.figure import Figure
+
+from cache_ttl import CacheTTL
+from diagnostico import contar, cronometrado
+
+# Puntos por línea: más de los píxeles de ancho del gráfico no se ven
+PUNTOS_GRAFICO = int(os.environ.get("CHIVATO_PUNTOS_GRAFICO", "1000"))
+
+# Gráficos ya pintados (PNG), por ticker + versión de los datos. Solo en memoria.
+CACHE_GRAFICOS = CacheTTL(ttl_segundos=24 * 3600, max_elementos=64)
+
+
+# --- REDUCCIÓN DE PUNTOS (LTTB) ---
+def lttb(x, y, puntos):
+    """
+    Largest-Triangle-Three-Buckets: posiciones de los 'puntos' que mejor conservan la forma
+    de la línea (picos y valles incluidos). Siempre mantiene el primero y el último.
+    """
+    n = len(x)
+    if puntos >= n or puntos < 3:
+        return np.arange(n)
+    x = np.asarray(x, dtype="float64")
+    y = np.asarray(y, dtype="float64")
+    bordes = np.linspace(1, n - 1, puntos - 1).astype(int) # Cubos entre el primero y el último
+    elegidos = np.empty(puntos, dtype=int)
+    elegidos[0], elegidos[-1] = 0, n - 1
+    anterior = 0
+    for i in range(puntos - 2):
+        desde, hasta = bordes[i], bordes[i + 1]
+        # Vértice de la derecha: la media del cubo siguiente (o el último punto)
+        siguiente = slice(hasta, bordes[i + 2]) if i + 2 < len(bordes) else slice(n - 1, n)
+        xm, ym = x[siguiente].mean(), y[siguiente].mean()
+        # Área del triángulo (anterior, candidato, media siguiente) para todo el cubo a la vez
+        areas = np.abs((x[anterior] - xm) * (y[desde:hasta] - y[anterior])
+                       - (x[anterior] - x[desde:hasta]) * (ym - y[anterior]))
+        anterior = desde + int(np.argmax(areas))
+        elegidos[i + 1] = anterior
+    return elegidos
+
+
+@cronometrado("graficos.reducir")
+def reducir(datos, puntos=PUNTOS_GRAFICO):
+    """
+    Serie o DataFrame de fechas con como mucho 'puntos' filas por columna (LTTB).
+    Con varias columnas se juntan las filas que elige cada una. Sin NaN.
+    """
+    df = datos.to_frame() if isinstance(datos, pd.Series) else datos
+    if len(df) <= puntos:
+        return datos
+    x = df.index.to_numpy(dtype="datetime64[ns]").view("int64") if isinstance(df.index, pd.DatetimeIndex) else np.arange(len(df))
+    filas = set()
+    for c in df.columns:
+        valido = np.flatnonzero(df[c].notna().to_numpy())
+        filas.update(valido[lttb(x[valido], df[c].to_numpy()[valido], puntos)])
+    reducido = df.iloc[sorted(filas)]
+    contar("graficos.puntos_ahorrados", len(df) - len(reducido))
+    return reducido.iloc[:, 0] if isinstance(datos, pd.Series) else reducido
+
+
+def version_datos(df):
+    """Huella barata del contenido (forma, extremos y sumas) para las claves de caché."""
+    valores = df.to_numpy(dtype="float64")
+    partes = (df.shape, str(df.index[0]) if len(df) else "", str(df.index[-1]) if len(df) else "",
+              tuple(df.columns), np.nansum(valores, axis=0).round(8).tolist(), valores[-1:].round(8).tolist())
+    return hashlib.sha1(repr(partes).encode("utf-8")).hexdigest()
+
+
+# --- MATPLOTLIB ---
+def crear_grafico_lineas(df, puntos=PUNTOS_GRAFICO):
     """
     Recibe un DataFrame y pinta una gráfica de líneas usando Matplotlib.
     Esta es la forma clásica que enseñan en la universidad.
+    Se pinta con 'puntos' por línea como mucho (ver reducir) y sobre una Figure suelta,
+    sin pyplot: no queda registrada en ningún sitio y se libera sola (ni fugas entre
+    recargas de Streamlit ni problemas con varias sesiones pintando a la vez).
     """
+    df = reducir(df, puntos)
+
     # Creamos el "Lienzo" (fig) y los "Ejes" (ax)
-    fig, ax = plt.subplots(figsize=(10, 5))
-    
+    fig = Figure(figsize=(10, 5))
+    ax = fig.subplots()
+
     # Pintamos los datos
     ax.plot(df.index, df, label=df.columns)
-    
+
     # Decoración (Título, etiquetas, rejilla...)
     ax.set_title("Evolución del Precio")
     ax.set_xlabel("Fecha")
     ax.set_ylabel("Precio (€/$)")
     ax.legend() # Muestra la leyenda (ej: BBVA.MC)
     ax.grid(True) # Pone la cuadrícula de fondo
-    
-    return fig
\ No newline at end of file
+
+    return fig
+
+
+@cronometrado("graficos.grafico_png")
+def grafico_png(df, clave, version=None, puntos=PUNTOS_GRAFICO):
+    """
+    PNG (bytes) de crear_grafico_lineas, pintado una vez por 'clave' (ej: el ticker) y
+    versión de los datos (ej: la de la instantánea de mercado; por defecto, version_datos).
+    Para st.image: repetir la misma búsqueda no vuelve a pasar por Matplotlib.
+    """
+    if version is None:
+        version = version_datos(df)
+
+    def pintar():
+        fig = crear_grafico_lineas(df, puntos)
+        salida = io.BytesIO()
+        fig.savefig(salida, format="png", bbox_inches="tight")
+        fig.clear()
+        return salida.getvalue()
+
+    return CACHE_GRAFICOS.obtener_o_calcular((clave, version, puntos), pintar)
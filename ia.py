@@ -0,0 +1,157 @@
+import hashlib
+import os
+import threading
+import time
+from concurrent.futures import Future
+
+from cache_ttl import CacheTTL
+from diagnostico import anotar, contar, medir
+
+# --- CACHÉ DE RESPUESTAS DE GEMINI ---
+# Misma pregunta (modelo + prompt normalizado) = misma respuesta durante el TTL.
+CACHE_RESPUESTAS = CacheTTL(
+    ttl_segundos=float(os.environ.get("CHIVATO_CACHE_IA_HORAS", "12")) * 3600,
+    max_elementos=500,
+    directorio=os.environ.get("CHIVATO_CACHE_IA", os.path.join(".cache", "ia")),
+)
+
+# Peticiones que están ahora mismo en camino: clave -> Future compartido
+_en_vuelo = {}
+_lock = threading.Lock()
+
+_metricas = {
+    "llamadas_llm": 0,        # Peticiones que llegaron de verdad a Gemini
+    "aciertos": 0,            # Respuestas servidas desde la caché
+    "agrupadas": 0,           # Sesiones que esperaron a una petición idéntica ya en marcha
+    "segundos_llm": 0.0,      # Tiempo total esperando a Gemini
+    "segundos_ahorrados": 0.0 # Tiempo que habrían costado las respuestas servidas sin llamar
+}
+
+
+def normalizar_prompt(prompt):
+    """Quita sangrías y espacios repetidos (los f-strings de las páginas traen muchos)."""
+    return " ".join(str(prompt).split())
+
+
+def clave_prompt(modelo, prompt):
+    texto = f"{modelo}\n{normalizar_prompt(prompt)}"
+    return hashlib.sha256(texto.encode("utf-8")).hexdigest()
+
+
+def _sumar(metrica, valor=1):
+    with _lock:
+        _metricas[metrica] += valor
+    contar(f"ia.{metrica}", valor)
+
+
+def _servir_guardada(clave):
+    """Respuesta ya cacheada o None."""
+    guardada = CACHE_RESPUESTAS.obtener(clave)
+    if guardada is None: return None
+    _sumar("aciertos")
+    _sumar("segundos_ahorrados", guardada["segundos"])
+    return guardada["texto"]
+
+
+def _reservar(clave):
+    """Devuelve (futuro, propietario). Solo el propietario llama a Gemini; el resto espera."""
+    with _lock:
+        futuro = _en_vuelo.get(clave)
+        propietario = futuro is None
+        if propietario:
+            futuro = Future()
+            _en_vuelo[clave] = futuro
+    return futuro, propietario
+
+
+def _esperar(futuro):
+    _sumar("agrupadas")
+    inicio = time.perf_counter()
+    texto = futuro.result()
+    # Nos ahorramos una llamada entera, no solo lo que quedaba de espera
+    _sumar("segundos_ahorrados", max(0.0, futuro.duracion - (time.perf_counter() - inicio)))
+    return texto
+
+
+def _terminar(clave, futuro, texto=None, duracion=0.0, error=None):
+    futuro.duracion = duracion
+    if error is not None:
+        futuro.set_exception(error)
+    else:
+        _sumar("llamadas_llm")
+        _sumar("segundos_llm", duracion)
+        if texto:
+            CACHE_RESPUESTAS.guardar(clave, {"texto": texto, "segundos": duracion})
+        futuro.set_result(texto)
+    with _lock:
+        _en_vuelo.pop(clave, None)
+
+
+def generar_texto(client, prompt, modelo):
+    """
+    Igual que client.models.generate_content(...).text pero:
+      - Si la misma pregunta ya se respondió (y no ha caducado), no llama a Gemini.
+      - Si otra sesión está haciendo la misma pregunta ahora mismo, espera su respuesta
+        en lugar de lanzar una segunda llamada.
+    """
+    clave = clave_prompt(modelo, prompt)
+    texto = _servir_guardada(clave)
+    if texto is not None: return texto
+
+    futuro, propietario = _reservar(clave)
+    if not propietario: return _esperar(futuro)
+
+    inicio = time.perf_counter()
+    try:
+        with medir("ia.generate_content"):
+            texto = client.models.generate_content(model=modelo, contents=prompt).text
+    except BaseException as e:
+        # También si Streamlit corta la ejecución (rerun/stop) o Ctrl+C: los que esperan no se quedan colgados
+        _terminar(clave, futuro, error=e if isinstance(e, Exception) else RuntimeError("Petición interrumpida"))
+        raise
+    _terminar(clave, futuro, texto, time.perf_counter() - inicio)
+    return texto
+
+
+def generar_texto_stream(client, prompt, modelo):
+    """
+    Versión en streaming de generar_texto: va devolviendo trozos de texto según
+    los escribe Gemini (generate_content_stream). Con caché o petición ya en
+    curso devuelve la respuesta completa de una vez.
+    """
+    clave = clave_prompt(modelo, prompt)
+    texto = _servir_guardada(clave)
+    if texto is not None:
+        yield texto
+        return
+
+    futuro, propietario = _reservar(clave)
+    if not propietario:
+        yield _esperar(futuro)
+        return
+
+    inicio = time.perf_counter()
+    trozos = []
+    try:
+        for trozo in client.models.generate_content_stream(model=modelo, contents=prompt):
+            if trozo.text:
+                trozos.append(trozo.text)
+                yield trozo.text
+    except BaseException as e:
+        # También si el que lee corta el stream a medias (GeneratorExit): no cacheamos texto incompleto
+        _terminar(clave, futuro, error=e if isinstance(e, Exception) else RuntimeError("Stream interrumpido"))
+        raise
+    duracion = time.perf_counter() - inicio
+    anotar("ia.generate_content_stream", duracion)
+    _terminar(clave, futuro, "".join(trozos), duracion)
+
+
+def metricas():
+    """Tasa de acierto, llamadas agrupadas y segundos ahorrados (para el panel de diagnóstico)."""
+    with _lock:
+        datos = dict(_metricas)
+    servidas = datos["aciertos"] + datos["agrupadas"]
+    total = servidas + datos["llamadas_llm"]
+    datos["tasa_acierto"] = servidas / total if total else 0.0
+    datos["cache"] = CACHE_RESPUESTAS.estadisticas()
+    return datos
@@ -0,0 +1,153 @@
+import math
+from collections import deque
+
+import pandas as pd
+
+import calculos
+
+# Mismas ventanas que calculos.analizar_semaforo
+VENTANA_MEDIA = 50
+VENTANA_VOLATILIDAD = 30
+
+# Cada cuántas actualizaciones recalculamos las sumas desde cero (evita deriva numérica)
+RECALCULO_CADA = 5000
+
+
+class SemaforoIncremental:
+    """
+    Estado del semáforo de UN ticker que se actualiza en O(1) por vela nueva:
+      - Media 50: buffer circular + suma acumulada.
+      - Volatilidad 30: varianza móvil de los retornos al estilo Welford (añadir/quitar).
+    Da lo mismo que calculos.analizar_semaforo sobre el histórico completo
+    (salvo el último decimal por redondeo de coma flotante).
+    """
+
+    def __init__(self):
+        self._precios = deque()
+        self._suma = 0.0
+        self._retornos = deque()
+        self._media_r = 0.0
+        self._m2 = 0.0
+        self._cambios = 0
+
+    @classmethod
+    def desde_serie(cls, serie):
+        """Arranca el estado a partir de un histórico (se ignoran los huecos)."""
+        estado = cls()
+        for precio in pd.Series(serie).dropna():
+            estado.actualizar(float(precio))
+        return estado
+
+    # --- WELFORD (AÑADIR / QUITAR UN RETORNO) ---
+    def _meter_retorno(self, r):
+        self._retornos.append(r)
+        n = len(self._retornos)
+        delta = r - self._media_r
+        self._media_r += delta / n
+        self._m2 += delta * (r - self._media_r)
+
+    def _sacar_retorno(self, r):
+        n = len(self._retornos)
+        if n == 0:
+            self._media_r, self._m2 = 0.0, 0.0
+            return
+        delta = r - self._media_r
+        self._media_r -= delta / n
+        self._m2 -= delta * (r - self._media_r)
+
+    def _recalcular(self):
+        self._suma = math.fsum(self._precios)
+        n = len(self._retornos)
+        self._media_r = math.fsum(self._retornos) / n if n else 0.0
+        self._m2 = math.fsum((r - self._media_r) ** 2 for r in self._retornos)
+        self._cambios = 0
+
+    # --- API ---
+    def actualizar(self, precio, nueva_vela=True):
+        """
+        Añade un precio. Con nueva_vela=False sustituye el último (tick intradía
+        que modifica la vela en curso) en lugar de abrir una vela nueva.
+        Un precio NaN (día sin cotizar) se ignora, como el dropna de analizar_semaforo.
+        Devuelve el semáforo actualizado.
+        """
+        if precio is None or math.isnan(precio):
+            return self.semaforo()
+        if not nueva_vela and self._precios:
+            viejo = self._precios.pop()
+            self._suma -= viejo
+            if len(self._precios) > 0 and self._retornos:
+                self._sacar_retorno(self._retornos.pop())
+
+        if self._precios:
+            self._meter_retorno(precio / self._precios[-1] - 1)
+            if len(self._retornos) > VENTANA_VOLATILIDAD:
+                self._sacar_retorno(self._retornos.popleft())
+
+        self._precios.append(precio)
+        self._suma += precio
+        if len(self._precios) > VENTANA_MEDIA:
+            self._suma -= self._precios.popleft()
+
+        self._cambios += 1
+        if self._cambios >= RECALCULO_CADA:
+            self._recalcular()
+        return self.semaforo()
+
+    @property
+    def media_50(self):
+        if len(self._precios) < VENTANA_MEDIA:
+            return float("nan")
+        return self._suma / VENTANA_MEDIA
+
+    @property
+    def volatilidad(self):
+        n = len(self._retornos)
+        if n < 2:
+            return float("nan")
+        return math.sqrt(max(self._m2, 0.0) / (n - 1))
+
+    def semaforo(self):
+        """Devuelve (estado, mensaje, precio_actual, volatilidad) como analizar_semaforo."""
+        if not self._precios:
+            return "ERROR", "Serie vacía", 0, 0
+        precio_actual = self._precios[-1]
+        media_50 = self.media_50
+        if math.isnan(media_50):
+            media_50 = precio_actual # Mismo parche que en calculos
+        volatilidad = self.volatilidad
+        estado, mensaje = calculos.clasificar_semaforo(precio_actual, media_50, volatilidad)
+        return estado, mensaje, precio_actual, volatilidad
+
+
+class SemaforoEnVivo:
+    """
+    Semáforo "en vivo" para muchos tickers: se inicializa con el histórico diario
+    y luego se alimenta con ticks sin volver a trocear DataFrames.
+    """
+
+    def __init__(self):
+        self.estados = {}
+
+    @classmethod
+    def desde_dataframe(cls, df):
+        vivo = cls()
+        for ticker in df.columns:
+            vivo.estados[ticker] = SemaforoIncremental.desde_serie(df[ticker])
+        return vivo
+
+    def procesar_tick(self, ticker, precio, nueva_vela=False):
+        """Por defecto un tick actualiza la vela del día; nueva_vela=True abre la siguiente."""
+        if ticker not in self.estados:
+            self.estados[ticker] = SemaforoIncremental()
+            nueva_vela = True
+        return self.estados[ticker].actualizar(precio, nueva_vela=nueva_vela)
+
+    def resumen(self):
+        """Mismo formato que calculos.analizar_semaforo_universo."""
+        filas = []
+        for ticker, estado in self.estados.items():
+            est, msg, precio, vol = estado.semaforo()
+            media = estado.media_50
+            filas.append({"Ticker": ticker, "Estado": est, "Mensaje": msg, "Precio": precio,
+                          "Volatilidad": vol, "Media50": precio if math.isnan(media) else media})
+        return pd.DataFrame(filas, columns=["Ticker", "Estado", "Mensaje", "Precio", "Volatilidad", "Media50"])
@@ -0,0 +1,132 @@
+import heapq
+import re
+import unicodedata
+from collections import Counter, defaultdict
+
+# Longitud máxima de prefijo que indexamos (más largo = se resuelve con el índice de trigramas)
+MAX_PREFIJO = 12
+
+
+def normalizar(texto):
+    """'Telefónica S.A.' -> 'telefonica s a' (sin tildes, minúsculas, sin símbolos)."""
+    texto = unicodedata.normalize("NFKD", str(texto))
+    texto = "".join(c for c in texto if not unicodedata.combining(c))
+    texto = re.sub(r"[^a-z0-9]+", " ", texto.lower())
+    return texto.strip()
+
+
+def trigramas(texto):
+    texto = f"  {texto} "
+    return {texto[i:i + 3] for i in range(len(texto) - 2)}
+
+
+class IndiceNombres:
+    """
+    Índice de búsqueda de empresas preconstruido a partir de {ticker: nombre}.
+      - Prefijos de cada palabra (para autocompletar mientras se escribe).
+      - Índice invertido de trigramas (para erratas: 'santandr', 'mcdonals').
+    buscar() devuelve los k mejores resultados ordenados por puntuación.
+    """
+
+    def __init__(self, nombres):
+        self.tickers = []
+        self.nombres = []
+        self._normalizados = []
+        self._prefijos = defaultdict(set)   # prefijo -> ids
+        self._trigramas = defaultdict(set)  # trigrama -> unidades (nombre completo o palabra)
+        self._num_trigramas = []            # por unidad
+        self._unidad_a_id = []              # unidad -> id de empresa
+        self._por_ticker = {}
+        for ticker, nombre in nombres.items():
+            self._añadir(ticker, nombre)
+
+    def _añadir(self, ticker, nombre):
+        i = len(self.tickers)
+        self.tickers.append(ticker)
+        self.nombres.append(nombre)
+        self._por_ticker[ticker.upper()] = i
+
+        # El ticker sin sufijo de mercado también cuenta como palabra (ej: 'itx' de ITX.MC)
+        base = normalizar(ticker.split(".")[0])
+        texto = normalizar(nombre)
+        self._normalizados.append(texto)
+
+        for palabra in set(texto.split()) | set(base.split()):
+            for n in range(1, min(len(palabra), MAX_PREFIJO) + 1):
+                self._prefijos[palabra[:n]].add(i)
+
+        # Trigramas del nombre completo y de cada palabra suelta ('santandr' ~ 'santander')
+        unidades = [texto] + (texto.split() if " " in texto else [])
+        for unidad in unidades:
+            u = len(self._num_trigramas)
+            self._unidad_a_id.append(i)
+            tris = trigramas(unidad)
+            self._num_trigramas.append(len(tris))
+            for t in tris:
+                self._trigramas[t].add(u)
+
+    def __len__(self):
+        return len(self.tickers)
+
+    def _candidatos_prefijo(self, palabras):
+        """Ids cuyo nombre tiene, para cada palabra buscada, alguna palabra que empiece igual."""
+        grupos = []
+        for p in palabras:
+            if len(p) <= MAX_PREFIJO:
+                grupos.append(self._prefijos.get(p, set()))
+            else:
+                # Palabra larga: filtramos por su prefijo y comprobamos el resto a mano
+                grupos.append({i for i in self._prefijos.get(p[:MAX_PREFIJO], set())
+                               if any(w.startswith(p) for w in self._normalizados[i].split())})
+        grupos.sort(key=len)
+        return set.intersection(*grupos) if grupos else set()
+
+    def buscar(self, texto, k=5, similitud_minima=0.3):
+        """Devuelve [(ticker, nombre, puntuacion), ...] (puntuación 0-100)."""
+        consulta = normalizar(texto)
+        if not consulta: return []
+        palabras = consulta.split()
+        puntos = {}
+
+        # 1. Ticker exacto
+        exacto = self._por_ticker.get(texto.strip().upper())
+        if exacto is not None:
+            puntos[exacto] = 100.0
+
+        # 2. Todas las palabras como prefijo (autocompletar)
+        for i in self._candidatos_prefijo(palabras):
+            nombre = self._normalizados[i]
+            if nombre == consulta:
+                p = 95.0
+            else:
+                # Mejor cuanto más nombre cubre la consulta y si empieza por ella
+                p = 60.0 + 20.0 * min(1.0, len(consulta) / max(1, len(nombre)))
+                if nombre.startswith(consulta): p += 10.0
+            puntos[i] = max(puntos.get(i, 0.0), p)
+
+        # 3. Parecido por trigramas (erratas). Si ya hay k coincidencias por prefijo, no hace falta.
+        if len(puntos) >= k:
+            return self._ordenar(puntos, k)
+        tris = trigramas(consulta)
+        comunes = Counter()
+        for t in tris:
+            comunes.update(self._trigramas.get(t, ()))
+        for u, n in comunes.items():
+            dice = 2.0 * n / (len(tris) + self._num_trigramas[u])
+            if dice >= similitud_minima:
+                i = self._unidad_a_id[u]
+                puntos[i] = max(puntos.get(i, 0.0), 60.0 * dice)
+
+        return self._ordenar(puntos, k)
+
+    def _ordenar(self, puntos, k):
+        # Empates: primero el nombre más corto (el más parecido a lo escrito)
+        mejores = heapq.nsmallest(k, puntos.items(), key=lambda x: (-x[1], len(self._normalizados[x[0]]), x[0]))
+        return [(self.tickers[i], self.nombres[i], round(p, 1)) for i, p in mejores]
+
+    def mejor(self, texto, puntuacion_minima=40.0):
+        """El ticker más probable, o None si nada supera la puntuación mínima."""
+        resultados = self.buscar(texto, k=1)
+        if resultados and resultados[0][2] >= puntuacion_minima:
+            return resultados[0][0]
+        return None
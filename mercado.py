@@ -0,0 +1,181 @@
+import os
+import threading
+import time
+from dataclasses import dataclass, field
+from datetime import datetime
+from types import MappingProxyType
+
+import pandas as pd
+
+import analisis_fundamental
+import datos
+import divisas
+import panel_precios
+
+# --- INSTANTÁNEA DE MERCADO COMPARTIDA ---
+# Una sola descarga por proceso para TODAS las sesiones y páginas de Streamlit.
+# Cada página recibe una vista de solo lectura; el refresco crea una instantánea nueva
+# y cambia el puntero, así nadie ve datos a medio actualizar.
+
+REFRESCO_SEGUNDOS = float(os.environ.get("CHIVATO_REFRESCO_MINUTOS", "15")) * 60
+
+
+@dataclass(frozen=True)
+class InstantaneaMercado:
+    precios: pd.DataFrame          # Cierres (columnas = tickers), solo lectura
+    factor_eur: float              # USD -> EUR
+    fundamentales: MappingProxyType = field(default_factory=lambda: MappingProxyType({}))
+    tasas: MappingProxyType = field(default_factory=lambda: MappingProxyType({})) # Moneda -> EUR por unidad
+    creada: datetime = field(default_factory=datetime.now)
+    version: int = 0
+
+    @property
+    def edad_segundos(self):
+        return (datetime.now() - self.creada).total_seconds()
+
+    def info(self, ticker):
+        """Ficha fundamental (.info) del ticker o None."""
+        return self.fundamentales.get(ticker)
+
+    def factores_eur(self, tickers):
+        """EUR por unidad de precio de cada ticker, con las tasas de la instantánea."""
+        return divisas.factores(tickers, self.tasas, self.info)
+
+
+def _solo_lectura(df):
+    """Copia del DataFrame respaldada por un array NumPy no modificable."""
+    if df.empty: return df
+    valores = df.to_numpy(dtype="float64", copy=True)
+    valores.setflags(write=False)
+    return pd.DataFrame(valores, index=df.index.copy(), columns=df.columns.copy(), copy=False)
+
+
+def panel_al_dia(publicado, ahora=None):
+    """
+    ¿Sirve un panel escrito en 'publicado' (epoch)? Con alguna bolsa abierta, si tiene menos
+    de REFRESCO_SEGUNDOS; con todo cerrado, si se escribió después del último cierre.
+    Si la precarga no corre (o murió), el panel se queda viejo y hay que descargar.
+    """
+    import prefetch # Aquí y no arriba: prefetch importa mercado
+
+    ahora = ahora or prefetch.ahora_utc()
+    if ahora.timestamp() - publicado < REFRESCO_SEGUNDOS:
+        return True
+    if any(prefetch.mercado_abierto(n, ahora) for n in prefetch.MERCADOS):
+        return False
+    cierre = prefetch.ultimo_cierre(ahora)
+    return cierre is None or publicado >= cierre.timestamp()
+
+
+def _precios_del_panel(tickers):
+    """Vista sobre el panel compartido en disco (ya es de solo lectura) o None si no los tiene todos o está viejo."""
+    panel = panel_precios.abrir_panel()
+    if panel is None or not all(t in panel for t in tickers):
+        return None
+    if panel.publicado is None or not panel_al_dia(panel.publicado):
+        print(f"⚠️ Panel de precios v{panel.version} sin actualizar: descargamos los precios")
+        return None
+    return panel.a_dataframe(tickers)
+
+
+_actual = None
+_lock_refresco = threading.Lock() # Un solo refresco a la vez (puede tardar: descarga el universo)
+_lock_hilo = threading.Lock()     # Solo para arrancar el hilo: nunca se queda esperando a la red
+_hilo = None
+_version = 0
+
+
+def construir_instantanea(tickers=None, con_fundamentales=True):
+    """Descarga precios, tipo de cambio y (opcional) fundamentales del universo."""
+    global _version
+    tickers = list(tickers or datos.EMPRESAS_SELECCIONADAS)
+    precios = _precios_del_panel(tickers) if panel_precios.USAR_PANEL else None
+    if precios is None:
+        precios = _solo_lectura(datos.descargar_datos(tickers))
+
+    fundamentales = {}
+    if con_fundamentales:
+        infos = analisis_fundamental.obtener_datos_fundamentales_lote(tickers)
+        fundamentales = {t: MappingProxyType(dict(i)) for t, i in zip(tickers, infos) if i}
+
+    # Todas las monedas del universo en una sola descarga
+    monedas = divisas.monedas_de(tickers, fundamentales.get)
+    tasas = divisas.obtener_tasas(set(monedas) | {"USD"})
+
+    _version += 1
+    return InstantaneaMercado(
+        precios=precios,
+        factor_eur=float(tasas["USD"]),
+        fundamentales=MappingProxyType(fundamentales),
+        tasas=MappingProxyType(tasas.to_dict()),
+        version=_version,
+    )
+
+
+def refrescar(tickers=None):
+    """
+    Construye una instantánea nueva y la publica para todo el proceso.
+    Hay que llamarla con _lock_refresco (desde fuera: refrescar_si_libre).
+    """
+    global _actual
+    nueva = construir_instantanea(tickers)
+    _actual = nueva
+    return nueva
+
+
+def refrescar_si_libre(tickers=None):
+    """
+    refrescar() con el cerrojo de refresco, para otros hilos (ej: la precarga).
+    Si ya hay un refresco en marcha no se repite la descarga: devuelve None.
+    """
+    if not _lock_refresco.acquire(blocking=False):
+        return None
+    try:
+        return refrescar(tickers)
+    finally:
+        _lock_refresco.release()
+
+
+def instantanea_actual():
+    """La instantánea publicada (aunque esté algo vieja) o None. Nunca descarga."""
+    return _actual
+
+
+def obtener_instantanea(max_edad_segundos=None):
+    """
+    Devuelve la instantánea vigente. Si no hay o está caducada, la refresca UNA sola
+    sesión; las demás esperan y reutilizan el resultado.
+    """
+    if max_edad_segundos is None:
+        max_edad_segundos = REFRESCO_SEGUNDOS
+    actual = _actual
+    if actual is not None and actual.edad_segundos < max_edad_segundos:
+        return actual
+    with _lock_refresco:
+        actual = _actual # Otra sesión pudo refrescar mientras esperábamos
+        if actual is not None and actual.edad_segundos < max_edad_segundos:
+            return actual
+        return refrescar()
+
+
+def iniciar_refresco_en_segundo_plano(intervalo_segundos=None):
+    """Arranca (una vez por proceso) un hilo que mantiene la instantánea al día."""
+    global _hilo
+    if intervalo_segundos is None:
+        intervalo_segundos = REFRESCO_SEGUNDOS
+    with _lock_hilo:
+        if _hilo is not None and _hilo.is_alive():
+            return _hilo
+
+        def bucle():
+            while True:
+                try:
+                    with _lock_refresco:
+                        refrescar()
+                except Exception as e:
+                    print(f"⚠️ Fallo refrescando la instantánea de mercado: {e}")
+                time.sleep(intervalo_segundos)
+
+        _hilo = threading.Thread(target=bucle, name="refresco-mercado", daemon=True)
+        _hilo.start()
+        return _hilo
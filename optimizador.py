@@ -0,0 +1,268 @@
+"""
+Construcción de carteras media-varianza para el Robo-Advisor (solo NumPy).
+
+    import optimizador
+    pesos = optimizador.optimizar(inst.precios, candidatos, "Moderado")   # Serie ticker -> peso
+    resumen = optimizador.metricas(pesos, inst.precios)                   # rentabilidad, volatilidad, sharpe
+
+Cada perfil usa un método:
+    Conservador -> mínima varianza      (lo menos volátil posible, con tope por valor)
+    Moderado    -> paridad de riesgo    (cada valor aporta el mismo riesgo a la cartera)
+    Dinámico    -> máximo Sharpe        (mejor rentabilidad por unidad de riesgo)
+Siempre sin cortos (pesos >= 0, suman 1). La covarianza se "encoge" hacia una matriz
+diagonal (Ledoit-Wolf): con 250 sesiones y cientos de valores la muestral es muy ruidosa.
+"""
+import os
+
+import numpy as np
+import pandas as pd
+
+import calculos
+from diagnostico import cronometrado
+
+DIAS_ANO = 252
+TASA_LIBRE_RIESGO = float(os.environ.get("CHIVATO_TASA_LIBRE_RIESGO", "0.02")) # Anual
+MIN_SESIONES = 60 # Menos historia que esto y el valor no entra en la optimización
+MIN_COBERTURA = 0.9 # Fracción de la ventana con dato que se exige a cada valor
+
+PERFILES = {
+    "Conservador": {"metodo": "min_varianza", "peso_maximo": 0.15, "max_valores": 12, "nota_minima": 7},
+    "Moderado": {"metodo": "paridad_riesgo", "peso_maximo": 0.20, "max_valores": 10, "nota_minima": 6},
+    "Dinámico": {"metodo": "max_sharpe", "peso_maximo": 0.25, "max_valores": 8, "nota_minima": 5},
+}
+
+
+def perfil_de(texto):
+    """'🐢 Conservador (Bajo Riesgo)' -> 'Conservador' (lo que muestra el selector de la página)."""
+    return next((p for p in PERFILES if p in texto), "Moderado")
+
+
+# --- DATOS DE ENTRADA ---
+def retornos_de(precios, tickers=None):
+    """
+    Retornos diarios de los tickers con historia suficiente (calculos.calcular_retornos_diarios).
+    Los festivos de cada bolsa se rellenan con el cierre anterior (retorno 0) para no perder
+    las sesiones en las que cotizan los demás. Los valores con dato en menos del MIN_COBERTURA
+    de la ventana (ej: salidas a bolsa recientes) se quedan fuera ANTES de alinear: si no,
+    el dropna de los retornos recortaría la ventana de todos a la historia del más nuevo.
+    """
+    df = calculos.como_dataframe(precios)
+    if tickers is not None:
+        df = df[[t for t in dict.fromkeys(tickers) if t in df.columns]]
+    df = df.ffill(limit=5)
+    df = df.loc[:, df.notna().sum() >= max(MIN_SESIONES, MIN_COBERTURA * len(df))]
+    return calculos.calcular_retornos_diarios(df.astype("float64"))
+
+
+@cronometrado("optimizador.covarianza_encogida")
+def covarianza_encogida(retornos):
+    """
+    Covarianza anualizada de Ledoit-Wolf: (1 - d) * muestral + d * media_varianzas * I,
+    con la intensidad 'd' óptima calculada de los propios datos. Devuelve (DataFrame, d).
+    """
+    x = retornos.to_numpy(dtype="float64")
+    t, n = x.shape
+    x = x - x.mean(axis=0)
+    muestral = x.T @ x / t
+    mu = np.trace(muestral) / n
+    objetivo = mu * np.eye(n)
+
+    # Distancia de la muestral al objetivo y ruido de estimación (todo con una pasada por x)
+    distancia = ((muestral - objetivo) ** 2).sum()
+    cuadrados = (x ** 2).sum(axis=1)
+    ruido = ((cuadrados ** 2).sum() / t - (muestral ** 2).sum()) / t
+    d = 0.0 if distancia == 0 else float(min(1.0, max(0.0, ruido / distancia)))
+
+    cov = ((1 - d) * muestral + d * objetivo) * DIAS_ANO
+    return pd.DataFrame(cov, index=retornos.columns, columns=retornos.columns), d
+
+
+def rentabilidades_esperadas(retornos, encogimiento=0.5):
+    """
+    Media anualizada de cada valor acercada a la media de todos ('encogimiento' = 0 la deja
+    tal cual, 1 las iguala). Un año de historia dice poco del siguiente: mejor no fiarse del todo.
+    """
+    media = retornos.mean().to_numpy(dtype="float64") * DIAS_ANO
+    return pd.Series((1 - encogimiento) * media + encogimiento * media.mean(), index=retornos.columns)
+
+
+# --- RESTRICCIONES ---
+def proyectar_simplex(v, peso_maximo=1.0):
+    """
+    Punto más cercano a 'v' con pesos entre 0 y peso_maximo que suman 1: clip(v - τ, 0, tope).
+    La suma es lineal a trozos en τ; se evalúa en todos los cortes a la vez y se interpola (exacto).
+    """
+    n = len(v)
+    tope = max(peso_maximo, 1.0 / n) # Con pocos valores el tope no se puede cumplir
+    orden = np.sort(v)
+    acumulado = np.concatenate([[0.0], np.cumsum(orden)])
+    cortes = np.sort(np.concatenate([orden - tope, orden]))
+    llenos = n - np.searchsorted(orden, cortes + tope, side="left")  # v - τ >= tope
+    desde = np.searchsorted(orden, cortes, side="right")             # v - τ > 0
+    hasta = n - llenos
+    sumas = tope * llenos + acumulado[hasta] - acumulado[desde] - cortes * (hasta - desde)
+    k = max(np.searchsorted(-sumas, -1.0, side="right") - 1, 0) # Último corte con suma >= 1
+    tramo = sumas[k] - sumas[k + 1]
+    umbral = cortes[k] + (sumas[k] - 1) / tramo * (cortes[k + 1] - cortes[k]) if tramo > 0 else cortes[k]
+    return np.clip(v - umbral, 0, tope)
+
+
+def _gradiente_proyectado(gradiente, n, paso, peso_maximo, iteraciones=1000, tolerancia=1e-8):
+    """
+    Descenso de gradiente acelerado (FISTA, reiniciando la inercia si empieza a oscilar)
+    sobre los pesos factibles. 'gradiente(w)' es el del objetivo a minimizar.
+    """
+    w = np.full(n, 1.0 / n)
+    y, t = w.copy(), 1.0
+    for _ in range(iteraciones):
+        nuevo = proyectar_simplex(y - paso * gradiente(y), peso_maximo)
+        if (y - nuevo) @ (nuevo - w) > 0: # Nos pasamos de largo: sin inercia
+            t = 1.0
+        t_nuevo = (1 + np.sqrt(1 + 4 * t * t)) / 2
+        y = nuevo + (t - 1) / t_nuevo * (nuevo - w)
+        cambio = np.abs(nuevo - w).max()
+        w, t = nuevo, t_nuevo
+        if cambio < tolerancia: break
+    return w
+
+
+# --- MÉTODOS ---
+def pesos_min_varianza(cov, peso_maximo=1.0):
+    """Mínimo de w'Σw con 0 <= w <= peso_maximo y sum(w) = 1."""
+    s = np.asarray(cov, dtype="float64")
+    paso = 1.0 / (2 * np.linalg.eigvalsh(s)[-1])
+    return _gradiente_proyectado(lambda w: 2 * s @ w, len(s), paso, peso_maximo)
+
+
+def pesos_max_sharpe(cov, esperadas, tasa_libre=TASA_LIBRE_RIESGO, peso_maximo=1.0,
+                     iteraciones=500, tolerancia=1e-9):
+    """
+    Máximo de (μ'w - rf) / sqrt(w'Σw) con las mismas restricciones. El Sharpe es
+    pseudo-cóncavo donde es positivo, así que el gradiente proyectado llega al máximo global.
+    Si ningún valor bate a la tasa libre de riesgo, devuelve la de mínima varianza.
+    """
+    s = np.asarray(cov, dtype="float64")
+    exceso = np.asarray(esperadas, dtype="float64") - tasa_libre
+    if not (exceso > 0).any():
+        return pesos_min_varianza(s, peso_maximo)
+
+    def menos_sharpe(w):
+        return -(exceso @ w) / np.sqrt(w @ s @ w)
+
+    def gradiente(w):
+        varianza = w @ s @ w
+        riesgo = np.sqrt(varianza)
+        return -(exceso / riesgo - (exceso @ w) * (s @ w) / (riesgo * varianza))
+
+    # Gradiente proyectado con paso adaptativo (la curvatura cambia mucho de un punto a otro)
+    w = np.full(len(s), 1.0 / len(s))
+    valor, paso = menos_sharpe(w), 1.0
+    for _ in range(iteraciones):
+        g = gradiente(w)
+        while True:
+            nuevo = proyectar_simplex(w - paso * g, peso_maximo)
+            diferencia = nuevo - w
+            nuevo_valor = menos_sharpe(nuevo)
+            if nuevo_valor <= valor + g @ diferencia + (diferencia @ diferencia) / (2 * paso) or paso < 1e-12:
+                break
+            paso /= 2
+        if np.abs(diferencia).max() < tolerancia:
+            break
+        w, valor, paso = nuevo, nuevo_valor, paso * 2
+    return w
+
+
+def pesos_inverso_volatilidad(cov):
+    """Pesos proporcionales a 1 / volatilidad (plan B si un método no da pesos válidos)."""
+    w = 1 / np.sqrt(np.diag(np.asarray(cov, dtype="float64")))
+    return w / w.sum()
+
+
+def pesos_paridad_riesgo(cov, presupuesto=None, iteraciones=100, tolerancia=1e-12):
+    """
+    Pesos con la misma contribución al riesgo w_i * (Σw)_i para todos (o la de 'presupuesto').
+    Se resuelve la forma convexa equivalente, min ½ y'Σy - Σ b_i log(y_i) con y > 0, por
+    Newton con búsqueda lineal (converge aunque haya valores con correlación negativa y
+    (Σw)_i < 0 en el camino); w = y / sum(y). Sin tope: la paridad de riesgo ya reparte sola.
+    """
+    s = np.asarray(cov, dtype="float64")
+    n = len(s)
+    b = np.full(n, 1.0 / n) if presupuesto is None else np.asarray(presupuesto, dtype="float64") / np.sum(presupuesto)
+
+    def objetivo(y):
+        return 0.5 * y @ s @ y - b @ np.log(y)
+
+    # Punto de partida: inverso de la volatilidad, escalado a y'Σy = sum(b) (lo que cumple el óptimo)
+    y = pesos_inverso_volatilidad(s)
+    y *= np.sqrt(b.sum() / (y @ s @ y))
+    valor = objetivo(y)
+    for _ in range(iteraciones):
+        gradiente = s @ y - b / y
+        paso = np.linalg.solve(s + np.diag(b / y ** 2), gradiente)
+        decremento = gradiente @ paso
+        if decremento < tolerancia:
+            break
+        # El paso más largo que deja todos los y > 0, y luego Armijo
+        crece = paso > 0
+        t = min(1.0, 0.99 * (y[crece] / paso[crece]).min()) if crece.any() else 1.0
+        while True:
+            nuevo_valor = objetivo(y - t * paso)
+            if nuevo_valor <= valor - 0.25 * t * decremento or t < 1e-12:
+                break
+            t /= 2
+        y, valor = y - t * paso, nuevo_valor
+    return y / y.sum()
+
+
+# --- ENTRADA PRINCIPAL ---
+def _pesos(metodo, cov, retornos, peso_maximo):
+    if metodo == "min_varianza":
+        w = pesos_min_varianza(cov, peso_maximo)
+    elif metodo == "max_sharpe":
+        w = pesos_max_sharpe(cov, rentabilidades_esperadas(retornos), peso_maximo=peso_maximo)
+    else:
+        w = pesos_paridad_riesgo(cov)
+    # Nunca elegir valores a partir de pesos rotos (NaN/inf): mejor el inverso de la volatilidad
+    if not np.isfinite(w).all() or w.sum() <= 0:
+        print(f"⚠️ El optimizador ({metodo}) no ha dado pesos válidos; se usa el inverso de la volatilidad")
+        w = pesos_inverso_volatilidad(cov)
+    return w
+
+
+@cronometrado("optimizador.optimizar")
+def optimizar(precios, tickers, perfil="Moderado", peso_minimo=0.01):
+    """
+    Pesos de cartera (Serie ticker -> peso, de mayor a menor, suman 1) para el perfil.
+    Con más candidatos que 'max_valores' se optimiza sobre todos, se quedan los de más
+    peso y se vuelve a optimizar solo con ellos (una cartera de 300 valores no se compra).
+    Los pesos por debajo de 'peso_minimo' se quitan y el resto se reescala.
+    """
+    config = PERFILES[perfil]
+    retornos = retornos_de(precios, tickers)
+    if retornos.shape[1] == 0:
+        return pd.Series(dtype="float64")
+    if retornos.shape[1] == 1:
+        return pd.Series([1.0], index=retornos.columns)
+
+    cov, _ = covarianza_encogida(retornos)
+    w = _pesos(config["metodo"], cov.to_numpy(), retornos, config["peso_maximo"])
+    if len(w) > config["max_valores"]:
+        elegidos = np.sort(np.argsort(-w, kind="stable")[:config["max_valores"]])
+        retornos = retornos.iloc[:, elegidos]
+        cov = cov.iloc[elegidos, elegidos]
+        w = _pesos(config["metodo"], cov.to_numpy(), retornos, config["peso_maximo"])
+
+    pesos = pd.Series(w, index=retornos.columns)
+    pesos = pesos[pesos >= peso_minimo]
+    return (pesos / pesos.sum()).sort_values(ascending=False)
+
+
+def metricas(pesos, precios):
+    """Rentabilidad y volatilidad anuales esperadas de la cartera y su Sharpe."""
+    retornos = retornos_de(precios, pesos.index)
+    pesos = pesos.reindex(retornos.columns).fillna(0).to_numpy()
+    cov, _ = covarianza_encogida(retornos)
+    rentabilidad = float(rentabilidades_esperadas(retornos).to_numpy() @ pesos)
+    volatilidad = float(np.sqrt(pesos @ cov.to_numpy() @ pesos))
+    sharpe = (rentabilidad - TASA_LIBRE_RIESGO) / volatilidad if volatilidad > 0 else float("nan")
+    return {"rentabilidad": rentabilidad, "volatilidad": volatilidad, "sharpe": sharpe}
@@ -1,9 +1,18 @@
 import streamlit as st
 from google import genai
-import yfinance as yf
+import pandas as pd
+import proveedores
+import almacen_precios
+import graficos
+from concurrent.futures import ThreadPoolExecutor
+import radar
+import detective
+import ia
+import diagnostico
 
 # 1. CONFIGURACIÓN VISUAL
 st.set_page_config(page_title="Buscador Universal de Bolsa", page_icon="📈")
+diagnostico.iniciar_peticion("Buscador IA")
 st.title("📈 Buscador Universal de Inversiones")
 st.markdown("Escribe el nombre de **cualquier empresa** y la IA analizará sus datos y su gráfico.")
 
@@ -22,6 +31,9 @@ if api_key:
  
 # 3. EL BUSCADOR
 nombre_empresa = st.text_input("Nombre de la empresa (Ej: Adidas, Ferrari, Inditex...):")
+# Horizonte del gráfico: el almacén guarda años de cierres y solo descarga lo que falte
+HORIZONTES = {"1 año": 1, "3 años": 3, "5 años": 5, "10 años": 10}
+horizonte = st.select_slider("Horizonte del gráfico", options=list(HORIZONTES), value="1 año")
 
 if st.button("🔍 Buscar y Analizar"):
     if nombre_empresa and api_key:
@@ -29,40 +41,41 @@ if st.button("🔍 Buscar y Analizar"):
             # --- FASE 1: DETECTIVE DE TICKERS ---
             with st.status("🤖 Localizando empresa y descargando gráficos...", expanded=True) as status:
                 
-                # Preguntamos a Gemini el código
-                prompt_ticker = f"""
-                Responde SOLO con el símbolo (Ticker) de Yahoo Finance para la empresa: "{nombre_empresa}".
-                Si no estás seguro, responde "ERROR".
-                """
+                # Primero índice local y caché; solo si no lo conocemos preguntamos a Gemini
+                ticker_encontrado, origen = detective.resolver_ticker(nombre_empresa, client)
                 
-                respuesta_ticker = client.models.generate_content(
-                    model="gemini-3-flash-preview",
-                    contents=prompt_ticker,
-                )
-                
-                ticker_encontrado = respuesta_ticker.text.strip()
-                
-                if "ERROR" in ticker_encontrado:
+                if not ticker_encontrado:
                     st.error(f"No encontré el código para '{nombre_empresa}'.")
                     st.stop()
                 
-                status.write(f"✅ Empresa localizada: **{ticker_encontrado}**")
+                fuentes = {"local": "índice local", "cache": "búsquedas anteriores", "ia": "Gemini"}
+                status.write(f"✅ Empresa localizada: **{ticker_encontrado}** (vía {fuentes.get(origen, origen)})")
                 
                 # --- FASE 2: DESCARGA DE DATOS Y GRÁFICOS ---
-                stock = yf.Ticker(ticker_encontrado)
-                info = stock.info
+                # Ficha, historial y noticias no dependen entre sí: las pedimos a la vez
+                proveedor = proveedores.obtener_proveedor()
+                with diagnostico.medir("buscador.descargas"), ThreadPoolExecutor(max_workers=3) as grupo:
+                    f_info = grupo.submit(proveedor.fundamentales, ticker_encontrado)
+                    f_historial = grupo.submit(almacen_precios.obtener_cierres, [ticker_encontrado],
+                                               inicio=pd.Timestamp.now() - pd.DateOffset(years=HORIZONTES[horizonte]))
+                    f_noticias = grupo.submit(proveedor.noticias, ticker_encontrado)
+                info = f_info.result()
                 
                 # A) Datos básicos
                 precio = info.get('currentPrice', info.get('previousClose', 0))
                 per = info.get('trailingPE', 'N/A')
                 moneda = info.get('currency', 'EUR')
                 
-                # B) ¡LA NOVEDAD! Descargamos el historial de 1 año para el gráfico
-                historial = stock.history(period="1y")
+                # B) ¡LA NOVEDAD! Descargamos el historial del horizonte elegido para el gráfico
+                cierres = f_historial.result()
+                historial = (cierres[ticker_encontrado].dropna().rename("Close").to_frame()
+                             if ticker_encontrado in cierres.columns else pd.DataFrame(columns=["Close"]))
+                # La variación anual siempre sobre el último año, sea cual sea el horizonte
+                ultimo_anio = historial[historial.index > historial.index.max() - pd.DateOffset(years=1)] if not historial.empty else historial
                 
                 # C) Noticias
                 try:
-                    noticias = stock.news[:3]
+                    noticias = f_noticias.result()[:3]
                     titulares = [n.get('title') for n in noticias]
                 except:
                     titulares = ["Sin noticias recientes."]
@@ -79,14 +92,14 @@ if st.button("🔍 Buscar y Analizar"):
             
             # Calculamos cuánto ha subido/bajado en el año para mostrarlo en verde/rojo
             if not historial.empty:
-                precio_inicio = historial['Close'].iloc[0]
+                precio_inicio = ultimo_anio['Close'].iloc[0]
                 variacion = ((precio - precio_inicio) / precio_inicio) * 100
                 col3.metric("Variación (1 Año)", f"{variacion:.2f}%")
 
             # 2. EL GRÁFICO (Aquí está la magia visual)
             st.subheader(f"📉 Evolución del precio: {nombre_empresa}")
-            # Pintamos solo la columna 'Close' (Precio de cierre)
-            st.line_chart(historial['Close'], color="#00FF00") 
+            # Pintamos solo la columna 'Close' (Precio de cierre), con los puntos que caben en pantalla
+            st.line_chart(graficos.reducir(historial['Close']), color="#00FF00")
 
             # 3. EL INFORME DE LA IA
             st.subheader("🤖 Análisis de Inteligencia Artificial")
@@ -104,12 +117,13 @@ if st.button("🔍 Buscar y Analizar"):
             3. 🎯 **Veredicto:** ¿Comprar, Vender o Mantener?
             """
             
-            with st.spinner('Gemini está estudiando el gráfico y las noticias...'):
-                analisis = client.models.generate_content(
-                    model="gemini-3-flash-preview",
-                    contents=prompt_analisis,
-                )
-                st.info(analisis.text)
+            # El texto aparece según lo escribe Gemini (y al instante si ya se preguntó hoy)
+            panel = st.empty()
+            panel.caption('Gemini está estudiando el gráfico y las noticias...')
+            analisis = ""
+            for trozo in ia.generar_texto_stream(client, prompt_analisis, modelo="gemini-3-flash-preview"):
+                analisis += trozo
+                panel.info(analisis)
 
         except Exception as e:
             st.error(f"Error: {e}")
@@ -158,48 +172,29 @@ if st.button(f"🔍 Escanear {len(tickers_a_escanear)} empresas ahora"):
     barra_progreso = st.progress(0)
     texto_estado = st.empty() # Texto que cambia dinámicamente
     
-    # --- INICIO DEL BUCLE DE ANÁLISIS ---
-    for i, ticker in enumerate(tickers_a_escanear):
-        try:
-            # Actualizamos mensaje visual
-            texto_estado.text(f"Analizando {i+1}/{len(tickers_a_escanear)}: {ticker}...")
-            
-            # Descarga de datos
-            stock = yf.Ticker(ticker)
-            info = stock.info
-            
-            # Extraemos datos clave
-            precio_actual = info.get('currentPrice', info.get('previousClose', 0))
-            precio_objetivo = info.get('targetMeanPrice', 0)
-            nombre = info.get('shortName', ticker)
-            recomendacion = info.get('recommendationKey', 'none').upper() # buy, hold, sell
-            
-            # FILTRO DE CALIDAD: Solo guardamos si tenemos ambos precios
-            if precio_actual > 0 and precio_objetivo > 0:
-                potencial = ((precio_objetivo - precio_actual) / precio_actual) * 100
-                
-                lista_oportunidades.append({
-                    "Ticker": ticker,
-                    "Empresa": nombre,
-                    "Precio": precio_actual,
-                    "Objetivo": precio_objetivo,
-                    "Potencial %": round(potencial, 2),
-                    "Recomendación": recomendacion
-                })
-            
-        except Exception as e:
+    top_en_vivo = st.empty() # Top 5 provisional que se va actualizando
+    
+    # --- INICIO DEL ESCANEO (EN PARALELO, LOS RESULTADOS LLEGAN SEGÚN TERMINAN) ---
+    for i, (ticker, oportunidad, error) in enumerate(radar.escanear(tickers_a_escanear)):
+        if error is not None:
             errores += 1
+        elif oportunidad:
+            lista_oportunidades.append(oportunidad)
+            provisional = radar.ordenar_por_potencial(lista_oportunidades)[:5]
+            top_en_vivo.dataframe(provisional, hide_index=True, use_container_width=True)
         
-        # Actualizar barra (matemática simple: índice actual / total)
+        # Actualizamos mensaje y barra (matemática simple: terminadas / total)
+        texto_estado.text(f"Analizadas {i+1}/{len(tickers_a_escanear)}: {ticker}...")
         barra_progreso.progress((i + 1) / len(tickers_a_escanear))
 
+    top_en_vivo.empty()
     texto_estado.text("¡Análisis finalizado!")
     st.success(f"Escaneadas {len(tickers_a_escanear)} empresas. Detectadas {len(lista_oportunidades)} con datos válidos.")
 
     # --- RESULTADOS ---
     if lista_oportunidades:
         # Ordenamos: Las de mayor potencial arriba
-        df_resultados = sorted(lista_oportunidades, key=lambda x: x['Potencial %'], reverse=True)
+        df_resultados = radar.ordenar_por_potencial(lista_oportunidades)
         
         # 1. MOSTRAMOS EL TOP 5 GANADOR
         st.subheader("🏆 Top 5: Mayores Oportunidades de Compra")
@@ -254,34 +249,12 @@ if st.button(f"🔍 Escanear {len(tickers_a_escanear)} empresas ahora"):
         """
         
         try:
-            with st.spinner("Gemini está estudiando las 5 empresas..."):
-                analisis = client.models.generate_content(
-                    model="gemini-flash-latest",  # Usamos el modelo que te funcionó
-                    contents=prompt_multi,
-                )
-                # Usamos st.markdown para que se vean las negritas y los títulos bonitos
-                st.markdown(analisis.text)
+            # Usamos write_stream (markdown) para que se vean las negritas y los títulos según llegan
+            st.write_stream(ia.generar_texto_stream(client, prompt_multi, modelo="gemini-flash-latest"))  # Usamos el modelo que te funcionó
                 
         except Exception as e:
             st.error(f"Error al analizar el grupo: {e}")
             st.warning("Prueba a esperar 30 segundos y volver a intentarlo.")
 
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
+# Panel opcional de tiempos (barra lateral)
+diagnostico.mostrar_panel()
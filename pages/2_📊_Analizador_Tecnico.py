@@ -1,12 +1,18 @@
 import streamlit as st
 import pandas as pd
 import datos
+import divisas
 import calculos
 import analisis_fundamental
 import graficos
+import mercado
+import prefetch
+import ranking
+import diagnostico
 
 # --- CONFIGURACIÓN DE PÁGINA ---
 st.set_page_config(page_title="Analizador Pro", page_icon="📊", layout="wide")
+diagnostico.iniciar_peticion("Analizador Técnico")
 
 # ==============================================================================
 # 🎨 ESTILOS CSS (ESTÉTICA APP FINTECH)
@@ -39,9 +45,16 @@ st.markdown("""
 </style>
 """, unsafe_allow_html=True)
 
+# Un solo hilo por proceso mantiene al día precios, divisa y fundamentales
+mercado.iniciar_refresco_en_segundo_plano()
+# Opcional: precarga según el horario de las bolsas (CHIVATO_PRECARGA=1)
+if prefetch.PRECARGA_EN_APP: prefetch.iniciar_en_segundo_plano()
+
 # --- 1. GESTIÓN DE MEMORIA ---
 if 'busqueda_activa' not in st.session_state:
     st.session_state['busqueda_activa'] = None
+if 'ranking' not in st.session_state:
+    st.session_state['ranking'] = None # Tabla del último ranking (sobrevive a los filtros)
 
 def activar_ranking():
     st.session_state['busqueda_activa'] = None
@@ -65,6 +78,12 @@ with st.container():
         st.write("Analiza las 60 empresas vigiladas.")
         # Botón Ranking
         boton_ranking = st.button("🔄 Generar Ranking Completo", type="primary", use_container_width=True, on_click=activar_ranking)
+        # Ranking precalculado (python ranking.py, ej: cada noche): se carga al instante
+        horas = ranking.antiguedad_horas()
+        boton_precalculado = False
+        if horas is not None:
+            boton_precalculado = st.button(f"⚡ Cargar ranking precalculado (hace {horas:.0f} h)",
+                                           use_container_width=True, on_click=activar_ranking)
 
     with col_der:
         st.subheader("🔎 Buscador Específico")
@@ -78,6 +97,16 @@ with st.container():
                 st.session_state['busqueda_activa'] = texto_input
             else:
                 st.warning("Escribe algo primero.")
+
+        # Autocompletado: sugerencias del índice local (sin red, < 1 ms)
+        if texto_input:
+            sugerencias = datos.sugerir_tickers(texto_input, k=5)
+            if sugerencias:
+                st.caption("¿Buscabas...?")
+                cols_sug = st.columns(len(sugerencias))
+                for col, (tic, nom, _) in zip(cols_sug, sugerencias):
+                    if col.button(nom, key=f"sug_{tic}", use_container_width=True):
+                        st.session_state['busqueda_activa'] = tic
     
     st.markdown("</div>", unsafe_allow_html=True)
 
@@ -95,7 +124,12 @@ if st.session_state['busqueda_activa']:
     st.header(f"📑 Informe: {nombre_bonito}")
     
     with st.spinner("Analizando mercado a fondo..."):
-        df_hist = datos.descargar_datos([ticker_encontrado])
+        # Si el ticker está en la instantánea compartida no hace falta descargar nada
+        inst = mercado.instantanea_actual()
+        if inst is not None and ticker_encontrado in inst.precios.columns:
+            df_hist = inst.precios[[ticker_encontrado]].dropna()
+        else:
+            df_hist = datos.descargar_datos([ticker_encontrado])
         
     if df_hist.empty:
         st.error(f"❌ No he encontrado datos para '{ticker_encontrado}'.")
@@ -105,11 +139,11 @@ if st.session_state['busqueda_activa']:
             nota_num, desglose = analisis_fundamental.analizar_calidad_fundamental(ticker_encontrado)
             estado_tec, mensaje_tec, precio, vol = calculos.analizar_semaforo(df_hist, ticker_encontrado)
             
-            moneda = "EUR"
-            if not ticker_encontrado.endswith(".MC"):
-                factor = datos.obtener_precio_dolar()
-                precio = precio * factor
-                moneda = "USD (Conv)"
+            # Cualquier moneda (USD, GBp, CHF...) a EUR; con las tasas de la instantánea si la hay
+            moneda = divisas.moneda_de(ticker_encontrado, inst.info(ticker_encontrado) if inst else None)
+            tasas = inst.tasas if inst is not None else None
+            precio = float(divisas.convertir([precio], [ticker_encontrado], tasas)[0])
+            if moneda != "EUR": moneda = f"{moneda} (Conv)"
 
             # Colores
             color_nota = "red" 
@@ -142,8 +176,8 @@ if st.session_state['busqueda_activa']:
                 st.markdown("<div style='background-color: white; padding: 10px; border-radius: 10px; border: 1px solid #eee;'>", unsafe_allow_html=True)
                 st.subheader("📈 Gráfico de Precios")
                 try:
-                    fig = graficos.crear_grafico_lineas(df_hist)
-                    st.pyplot(fig)
+                    # Pintado una vez por ticker y versión de los datos (ver graficos.grafico_png)
+                    st.image(graficos.grafico_png(df_hist, ticker_encontrado), use_container_width=True)
                 except: st.warning("Gráfico no disponible")
                 st.markdown("</div>", unsafe_allow_html=True)
 
@@ -193,82 +227,63 @@ if st.session_state['busqueda_activa']:
 # ==============================================================================
 # ESCENARIO B: RANKING GENERAL (AHORA CON 3 PESTAÑAS)
 # ==============================================================================
-elif boton_ranking:
-    st.info("📡 Escaneando mercados de España y EEUU...")
-    
-    try:
-        df_todos = datos.descargar_datos(datos.EMPRESAS_SELECCIONADAS)
-        factor_eur = datos.obtener_precio_dolar()
-    except Exception as e:
-        st.error(f"Error grave: {e}"); st.stop()
-    
-    candidatos = []; lista_roja = []
-    
-    # BARRA DE PROGRESO 1
-    barra = st.progress(0)
-    for i, ticker in enumerate(datos.EMPRESAS_SELECCIONADAS):
-        barra.progress((i + 1) / len(datos.EMPRESAS_SELECCIONADAS))
+else:
+    if boton_precalculado:
         try:
-            estado, mensaje, precio, vol = calculos.analizar_semaforo(df_todos, ticker)
-            precio_final = precio * factor_eur if not ticker.endswith(".MC") else precio
-            
-            item = {
-                "Ticker": ticker, "Empresa": datos.NOMBRES.get(ticker, ticker),
-                "Precio": precio_final, "Estado": estado, "Motivo": mensaje
-            }
-            if estado == "ROJO": lista_roja.append(item)
-            elif estado != "ERROR": candidatos.append(item) 
-        except: pass
-    barra.empty()
-    
-    # FASE 2: FUNDAMENTAL
-    if candidatos:
-        st.info(f"🔬 Auditando a {len(candidatos)} empresas candidatas...")
-        verdes, naranjas = [], []
-        
-        barra2 = st.progress(0)
-        for i, item in enumerate(candidatos):
-            barra2.progress((i+1)/len(candidatos))
-            try:
-                # CÁLCULO SEGURO
-                nota, desglose = analisis_fundamental.analizar_calidad_fundamental(item["Ticker"])
-                
-                item["Nota"] = f"{nota}/10"
-                item["Puntuacion"] = nota
-                item["Precio"] = f"{item['Precio']:.2f} €"
-                item.update(desglose)
-                
-                if item["Estado"] == "VERDE":
-                    if nota >= 5: verdes.append(item)
-                    else: item["Motivo"] = "Fundamentales débiles"; naranjas.append(item)
-                else: naranjas.append(item)
-            except: 
-                item["Nota"] = "N/A"; item["Puntuacion"] = 0; naranjas.append(item)
+            st.session_state['ranking'] = ranking.cargar()
+        except Exception as e:
+            st.error(f"No se pudo leer el ranking precalculado: {e}"); st.stop()
+    elif boton_ranking:
+        st.info("📡 Escaneando mercados de España y EEUU...")
+        try:
+            # Misma instantánea para todas las sesiones: N usuarios = 1 descarga
+            inst = mercado.obtener_instantanea()
+        except Exception as e:
+            st.error(f"Error grave: {e}"); st.stop()
 
+        # FASE 1 (semáforo de todo el universo) + FASE 2 (fundamental) en ranking.py.
+        # Las fichas ya vienen en la instantánea; solo se descargan (en paralelo) las que falten
+        barra2 = st.progress(0)
+        st.session_state['ranking'] = ranking.calcular_ranking(
+            inst.precios, inst.tasas, tickers=datos.EMPRESAS_SELECCIONADAS, obtener_ficha=inst.info,
+            progreso=lambda hechos, total: barra2.progress(hechos / total)
+        )
         barra2.empty()
-        
-        # Ordenamos
-        verdes.sort(key=lambda x: x["Puntuacion"], reverse=True)
-        naranjas.sort(key=lambda x: x["Puntuacion"], reverse=True)
-        
-        # FUNCIÓN DE TABLA (ORIGINAL)
-        def mostrar_tabla(lista, limite=None):
-            if not lista: 
+
+    tabla = st.session_state['ranking']
+    if tabla is not None and not tabla.empty:
+        # FILTROS: trabajan sobre la tabla guardada, sin volver a descargar ni calcular
+        f1, f2, f3 = st.columns([2, 1, 1])
+        texto_filtro = f1.text_input("Filtrar", placeholder="Empresa o ticker", key="filtro_texto")
+        nota_minima = f2.slider("Nota mínima", 0, 10, 0, key="filtro_nota")
+        orden = f3.selectbox("Ordenar por", ["Puntuacion", "Precio", "Volatilidad", "Empresa"], key="filtro_orden")
+        vista = ranking.filtrar(tabla, texto_filtro, nota_minima, orden)
+
+        # El formato (€, /10, %) se aplica solo al pintar
+        formato = {
+            "Precio": st.column_config.NumberColumn("Precio", format="%.2f €"),
+            "Puntuacion": st.column_config.NumberColumn("Nota", format="%d/10"),
+            "Volatilidad": st.column_config.NumberColumn("Volatilidad", format="percent"),
+        }
+
+        def mostrar_tabla(df, limite=None):
+            if df.empty:
                 st.write("Sin datos.")
                 return
-            df = pd.DataFrame(lista)
-            if limite: df = df[:limite]
-            
-            cols_ver = ["Empresa", "Precio", "Nota", "Valoración (PER)", "Rentabilidad", "Dividendos", "Deuda"]
-            cols_finales = [c for c in cols_ver if c in df.columns]
-            st.dataframe(df[cols_finales], use_container_width=True, hide_index=True)
+            cols_ver = ["Empresa", "Precio", "Puntuacion", "Valoración (PER)", "Rentabilidad", "Dividendos", "Deuda"]
+            st.dataframe(df.head(limite) if limite else df, column_order=cols_ver, column_config=formato,
+                         use_container_width=True, hide_index=True)
+
+        verdes = ranking.grupo(vista, "VERDE")
+        naranjas = ranking.grupo(vista, "NARANJA")
+        lista_roja = ranking.grupo(vista, "ROJO")
 
         # --- MOSTRAR RESULTADOS (CON 3 TABS) ---
         with st.container():
             st.markdown("<div style='background-color: white; padding: 20px; border-radius: 10px; border: 1px solid #eee;'>", unsafe_allow_html=True)
             
             st.success(f"🟢 OPORTUNIDADES ({len(verdes)})")
-            if verdes:
+            if not verdes.empty:
                 # AQUÍ ESTÁN LAS 3 PESTAÑAS QUE PEDISTE
                 t1, t2, t3 = st.tabs(["Top 5", "Top 10", "Lista Completa"])
                 with t1: mostrar_tabla(verdes, 5)
@@ -276,15 +291,15 @@ elif boton_ranking:
                 with t3: mostrar_tabla(verdes, None) # None = Sin límite
                 
             st.warning(f"🟠 RIESGO / MIXTO ({len(naranjas)})")
-            if naranjas:
+            if not naranjas.empty:
                 t4, t5, t6 = st.tabs(["Top 5", "Top 10", "Lista Completa"])
                 with t4: mostrar_tabla(naranjas, 5)
                 with t5: mostrar_tabla(naranjas, 10)
                 with t6: mostrar_tabla(naranjas, None)
                 
             st.error(f"❌ EVITAR ({len(lista_roja)})")
-            if lista_roja: 
-                st.dataframe(pd.DataFrame(lista_roja)[["Empresa", "Motivo"]], use_container_width=True, hide_index=True)
+            if not lista_roja.empty: 
+                st.dataframe(lista_roja, column_order=["Empresa", "Motivo"], use_container_width=True, hide_index=True)
             
             st.markdown("</div>", unsafe_allow_html=True)
 
@@ -304,3 +319,5 @@ with st.sidebar:
     
     st.caption("v2.5.0 - Stable Release")
 
+# Panel opcional de tiempos (barra lateral)
+diagnostico.mostrar_panel()
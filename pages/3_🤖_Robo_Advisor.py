@@ -1,13 +1,15 @@
 import streamlit as st
-import pandas as pd
 import plotly.express as px
-import datos
-import calculos
-import analisis_fundamental
+import mercado
+import optimizador
+import prefetch
+import robo
+import diagnostico
 
 # --- CONFIGURACIÓN INICIAL ---
 # He cambiado también el título de la pestaña del navegador para que cuadre
 st.set_page_config(page_title="Gestor Patrimonio IA", page_icon="🏦", layout="wide")
+diagnostico.iniciar_peticion("Robo-Advisor")
 
 # ==============================================================================
 # 🎨 ESTILOS CSS "PREMIUM FINTECH"
@@ -60,6 +62,11 @@ st.markdown("""
 </style>
 """, unsafe_allow_html=True)
 
+# Un solo hilo por proceso mantiene al día precios, divisa y fundamentales
+mercado.iniciar_refresco_en_segundo_plano()
+# Opcional: precarga según el horario de las bolsas (CHIVATO_PRECARGA=1)
+if prefetch.PRECARGA_EN_APP: prefetch.iniciar_en_segundo_plano()
+
 # ==============================================================================
 # 🏦 CABECERA TIPO "APP"
 # ==============================================================================
@@ -92,6 +99,10 @@ with st.container():
         st.write(" ")
         boton_generar = st.button("🚀 GENERAR ESTRATEGIA")
         
+    motor = st.radio("Motor de asignación", ["📋 Clásico (3 valores por bloque)", "🧮 Optimizador (media-varianza)"],
+                     horizontal=True, help="El optimizador tiene en cuenta las correlaciones entre valores: "
+                     "mínima varianza (Conservador), paridad de riesgo (Moderado) o máximo Sharpe (Dinámico).")
+
     if "Dinámico" in perfil:
         st.caption("⚠️ **Aviso de Riesgo:** Este perfil prioriza el crecimiento sobre la seguridad. Volatilidad esperada: Alta.")
     else:
@@ -104,58 +115,30 @@ st.write("")
 # ==============================================================================
 # 📊 RESULTADOS (SECCIÓN DASHBOARD)
 # ==============================================================================
-if boton_generar:
+# Tras el primer "Generar", cambiar capital, perfil o motor recalcula solo el reparto
+if boton_generar: st.session_state["robo_generado"] = True
+
+if st.session_state.get("robo_generado"):
     
     with st.spinner("🔄 Conectando con mercados globales (NYSE, NASDAQ, BME)..."):
         try:
-            df_todos = datos.descargar_datos(datos.EMPRESAS_SELECCIONADAS)
-            factor_eur = datos.obtener_precio_dolar()
+            inst = mercado.obtener_instantanea()
+            df_todos = inst.precios
+            # Semáforo + auditoría fundamental: una vez por versión de los datos (ver robo.py)
+            universo = robo.universo_puntuado(inst)
         except: st.error("Error de conexión API."); st.stop()
 
     # --- LÓGICA DE NEGOCIO ---
-    todos = []
-    if "Conservador" in perfil: p_seg, p_mod, p_risk = 0.8, 0.2, 0.0
-    elif "Moderado" in perfil:    p_seg, p_mod, p_risk = 0.6, 0.4, 0.0
-    else:                         p_seg, p_mod, p_risk = 0.2, 0.4, 0.4
-    
-    for t in datos.EMPRESAS_SELECCIONADAS:
-        try:
-            est, _, prec, vol = calculos.analizar_semaforo(df_todos, t)
-            if est == "VERDE":
-                nota, _ = analisis_fundamental.analizar_calidad_fundamental(t)
-                precio_e = prec * factor_eur if not t.endswith(".MC") else prec
-                todos.append({"T": t, "E": datos.NOMBRES.get(t, t), "P": precio_e, "N": nota, "V": vol})
-        except: pass
-
-    c_seg = [x for x in todos if x["N"] >= 7 and x["V"] <= 0.01]
-    c_mod = [x for x in todos if x["N"] >= 7 and 0.01 < x["V"] <= 0.015]
-    c_rsk = [x for x in todos if x["V"] > 0.015]
-
-    cartera = []
-    def asignar(lista, pct, etiqueta):
-        if pct == 0: return
-        dinero = capital * pct
-        if not lista:
-            if etiqueta == "Riesgo" and todos: lista = sorted(todos, key=lambda x: x["V"], reverse=True)[:3]
-            elif etiqueta == "Equilibrio" and c_seg: lista = c_seg
-            else: return
-            
-        seleccion = sorted(lista, key=lambda x: x["N"], reverse=True)[:3] if etiqueta != "Riesgo" else sorted(lista, key=lambda x: x["V"], reverse=True)[:3]
-        if not seleccion: return
-        
-        dinero_acc = dinero / len(seleccion)
-        for a in seleccion:
-            n_acc = max(1, int(dinero_acc / a["P"]))
-            tot = n_acc * a["P"]
-            cartera.append({"Categoría": etiqueta, "Activo": a["E"], "Precio": a["P"], "Cantidad": n_acc, "Total": tot, "Calidad": a["N"]})
-
-    asignar(c_seg, p_seg, "🛡️ Preservación")
-    asignar(c_mod, p_mod, "⚖️ Crecimiento")
-    asignar(c_rsk, p_risk, "🔥 Especulativo")
+    nombre_perfil = optimizador.perfil_de(perfil)
+    resumen_optimizador = None
+    if "Optimizador" in motor:
+        # Pesos según covarianzas (ver optimizador.py); la categoría sale de la volatilidad de cada valor
+        df_c, resumen_optimizador = robo.asignar_optimizado(universo, df_todos, capital, nombre_perfil)
+    else:
+        df_c = robo.asignar(universo, capital, nombre_perfil)
 
     # --- VISUALIZACIÓN ---
-    if cartera:
-        df_c = pd.DataFrame(cartera)
+    if not df_c.empty:
         total_real = df_c["Total"].sum()
         cash = capital - total_real
         
@@ -166,6 +149,9 @@ if boton_generar:
         k2.metric("Liquidez (Cash)", f"{cash:,.2f} €")
         k3.metric("Activos", f"{len(df_c)}")
         k4.metric("Calidad Media", f"{df_c['Calidad'].mean():.1f}/10")
+        if resumen_optimizador:
+            st.caption(f"🧮 Estimación anual (histórico de 1 año): rentabilidad {resumen_optimizador['rentabilidad']:.1%}, "
+                       f"volatilidad {resumen_optimizador['volatilidad']:.1%}, Sharpe {resumen_optimizador['sharpe']:.2f}")
         
         st.markdown("---")
         
@@ -238,3 +224,5 @@ with st.sidebar:
     
     st.caption("v2.5.0 - Stable Release")
 
+# Panel opcional de tiempos (barra lateral)
+diagnostico.mostrar_panel()
@@ -0,0 +1,229 @@
+"""
+Panel ancho de cierres en disco, mapeado en memoria (numpy.memmap).
+
+    python panel_precios.py                          # Universo de datos.py -> .cache/panel
+    python panel_precios.py --universo tickers.txt   # Miles de tickers
+
+Todos los procesos (workers de Streamlit, ranking.py, prefetch.py) abren el MISMO
+fichero: el sistema operativo comparte las páginas y nadie copia los datos.
+    <carpeta>/panel.json            índice: versión, tickers (ticker -> columna), forma
+    <carpeta>/cierres-<v>.npy       matriz fechas x tickers (float32)
+    <carpeta>/fechas-<v>.npy        fechas (int64, ns)
+Cada escritura crea una versión nueva (en ficheros temporales que se renombran al
+acabar) y cambia panel.json al final, así un lector nunca ve un panel a medio escribir.
+Los escritores se turnan con un cerrojo de fichero (panel.lock), también entre procesos. Con CHIVATO_PANEL=1 la instantánea de mercado
+lee de aquí en vez de descargar, y el planificador de precarga lo mantiene al día.
+"""
+import argparse
+import contextlib
+import json
+import os
+import re
+import tempfile
+import threading
+
+try:
+    import fcntl
+except ImportError: # Windows
+    fcntl = None
+    import msvcrt
+
+import numpy as np
+import pandas as pd
+
+import datos
+
+DIRECTORIO = os.environ.get("CHIVATO_PANEL_DIR", os.path.join(".cache", "panel"))
+USAR_PANEL = os.environ.get("CHIVATO_PANEL", "0") == "1"
+COLUMNAS_POR_BLOQUE = 512 # Para recorrer el panel sin convertirlo entero a float64
+
+
+class PanelPrecios:
+    """
+    Panel de solo lectura. Se comporta como el DataFrame de descargar_datos en lo
+    que usa calculos: .columns, .index, .empty, panel[ticker], panel[[t1, t2]].
+    """
+
+    def __init__(self, valores, fechas, tickers, version=0, publicado=None):
+        self.valores = valores # memmap (fechas x tickers), modo "r"
+        self.index = pd.DatetimeIndex(np.asarray(fechas).view("datetime64[ns]"))
+        self.columns = pd.Index(tickers)
+        self.columnas = {t: i for i, t in enumerate(tickers)}
+        self.version = version
+        self.publicado = publicado # Instante (epoch) en que se escribió esta versión
+
+    @property
+    def empty(self):
+        return self.valores.size == 0
+
+    @property
+    def shape(self):
+        return self.valores.shape
+
+    def __contains__(self, ticker):
+        return ticker in self.columnas
+
+    def __getitem__(self, clave):
+        if isinstance(clave, str):
+            return pd.Series(self.valores[:, self.columnas[clave]], index=self.index, name=clave, copy=False)
+        return self.a_dataframe(clave)
+
+    def a_dataframe(self, tickers=None):
+        """
+        DataFrame sobre el memmap: sin copia para todo el panel o columnas seguidas.
+        Si se piden todos los tickers se devuelve el panel entero (en su orden de columnas).
+        """
+        if tickers is None or set(tickers) == self.columnas.keys():
+            return pd.DataFrame(self.valores, index=self.index, columns=self.columns, copy=False)
+        tickers = [t for t in tickers if t in self.columnas]
+        posiciones = [self.columnas[t] for t in tickers]
+        if posiciones and posiciones == list(range(posiciones[0], posiciones[0] + len(posiciones))):
+            bloque = self.valores[:, posiciones[0]:posiciones[-1] + 1]
+        else:
+            bloque = self.valores[:, posiciones] # Columnas sueltas: copia solo esas
+        return pd.DataFrame(bloque, index=self.index, columns=tickers, copy=False)
+
+    def bloques(self, tamano=COLUMNAS_POR_BLOQUE):
+        """Vistas de 'tamano' columnas (para procesar universos enormes por trozos)."""
+        for i in range(0, len(self.columns), tamano):
+            yield pd.DataFrame(self.valores[:, i:i + tamano], index=self.index,
+                               columns=self.columns[i:i + tamano], copy=False)
+
+
+# --- ESCRITURA ---
+FICHEROS_PANEL = re.compile(r"^(cierres|fechas)-\d+\.npy$|\.tmp$") # Lo que la limpieza puede borrar
+
+
+def _ruta_indice(directorio):
+    return os.path.join(directorio, "panel.json")
+
+
+@contextlib.contextmanager
+def _cerrojo(directorio):
+    """Un solo escritor a la vez por carpeta, también entre procesos (fichero panel.lock)."""
+    with open(os.path.join(directorio, "panel.lock"), "a+b") as f:
+        if fcntl is not None:
+            fcntl.flock(f, fcntl.LOCK_EX)
+        else:
+            f.seek(0)
+            while True:
+                try:
+                    msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+                    break
+                except OSError: # LK_LOCK se rinde tras ~10 s: seguimos esperando
+                    pass
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(f, fcntl.LOCK_UN)
+            else:
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+def _temporal(directorio):
+    """Fichero vacío con nombre único en la carpeta (para renombrarlo luego con os.replace)."""
+    descriptor, ruta = tempfile.mkstemp(dir=directorio, suffix=".tmp")
+    os.close(descriptor)
+    return ruta
+
+
+def escribir_panel(df, directorio=DIRECTORIO, dtype="float32"):
+    """Vuelca un DataFrame ancho de cierres al disco como versión nueva y la publica."""
+    os.makedirs(directorio, exist_ok=True)
+    with _cerrojo(directorio):
+        anterior = _leer_indice(directorio)
+        version = (anterior["version"] + 1) if anterior else 1
+        fichero_valores = f"cierres-{version}.npy"
+        fichero_fechas = f"fechas-{version}.npy"
+
+        # Todo se escribe en temporales y se renombra al final: un lector nunca mapea
+        # un fichero que otro está truncando o rellenando
+        temporales = [_temporal(directorio) for _ in range(3)]
+        try:
+            destino = np.lib.format.open_memmap(temporales[0], mode="w+", dtype=dtype, shape=df.shape)
+            destino[:] = df.to_numpy(dtype=dtype)
+            destino.flush()
+            del destino
+            with open(temporales[1], "wb") as f:
+                np.save(f, df.index.to_numpy(dtype="datetime64[ns]").view("int64"))
+
+            indice = {"version": version, "valores": fichero_valores, "fechas": fichero_fechas,
+                      "tickers": [str(t) for t in df.columns], "forma": list(df.shape), "dtype": str(np.dtype(dtype))}
+            with open(temporales[2], "w", encoding="utf-8") as f:
+                json.dump(indice, f)
+            os.replace(temporales[0], os.path.join(directorio, fichero_valores))
+            os.replace(temporales[1], os.path.join(directorio, fichero_fechas))
+            os.replace(temporales[2], _ruta_indice(directorio))
+        except BaseException:
+            for ruta in temporales:
+                try: os.remove(ruta)
+                except OSError: pass
+            raise
+
+        # Borramos versiones anteriores (y temporales de escritores que murieron a medias):
+        # con el cerrojo puesto no hay nadie más escribiendo. Quien las tenga abiertas las
+        # sigue leyendo (en Linux/Mac el fichero vive hasta que se cierra); en Windows el
+        # borrado falla y se reintenta en la siguiente escritura
+        for nombre in os.listdir(directorio):
+            if FICHEROS_PANEL.search(nombre) and nombre not in (fichero_valores, fichero_fechas):
+                try: os.remove(os.path.join(directorio, nombre))
+                except OSError: pass
+    return abrir_panel(directorio)
+
+
+def construir(tickers=None, directorio=DIRECTORIO):
+    """Descarga (vía la caché de precios) el universo y lo escribe como panel."""
+    tickers = list(tickers or datos.EMPRESAS_SELECCIONADAS)
+    df = datos.descargar_datos_en_bloques(tickers)
+    if df.empty:
+        raise RuntimeError("No se han podido descargar precios para el panel")
+    return escribir_panel(df, directorio)
+
+
+# --- LECTURA ---
+def _leer_indice(directorio):
+    ruta = _ruta_indice(directorio)
+    if not os.path.exists(ruta): return None
+    try:
+        with open(ruta, encoding="utf-8") as f:
+            return json.load(f)
+    except Exception as e:
+        print(f"⚠️ Índice del panel ilegible: {e}")
+        return None
+
+
+_abiertos = {} # directorio -> PanelPrecios (uno por proceso y versión)
+_lock = threading.Lock()
+
+
+def abrir_panel(directorio=DIRECTORIO):
+    """El panel publicado (mapeado en memoria) o None si no hay. Se reabre solo si cambia la versión."""
+    indice = _leer_indice(directorio)
+    if indice is None: return None
+    with _lock:
+        panel = _abiertos.get(directorio)
+        if panel is not None and panel.version == indice["version"]:
+            return panel
+        try:
+            valores = np.load(os.path.join(directorio, indice["valores"]), mmap_mode="r")
+            fechas = np.load(os.path.join(directorio, indice["fechas"]))
+            publicado = os.path.getmtime(_ruta_indice(directorio))
+        except FileNotFoundError:
+            return panel # Justo lo están reescribiendo: seguimos con la versión que teníamos
+        panel = PanelPrecios(valores, fechas, indice["tickers"], indice["version"], publicado)
+        _abiertos[directorio] = panel
+        return panel
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Panel de precios compartido de El Chivato Bursátil")
+    parser.add_argument("--universo", help="Fichero con un ticker por línea (por defecto, el universo de datos.py)")
+    parser.add_argument("--directorio", default=DIRECTORIO)
+    args = parser.parse_args()
+
+    universo = datos.leer_universo(args.universo) if args.universo else None
+    panel = construir(universo, args.directorio)
+    print(f"💾 Panel v{panel.version}: {panel.shape[1]} tickers x {panel.shape[0]} sesiones "
+          f"({panel.valores.nbytes / 2**20:.1f} MB) en {args.directorio}")
@@ -0,0 +1,186 @@
+"""
+Planificador de precarga: refresca precios, divisa y fundamentales del universo
+ANTES de que lleguen los usuarios, escribiendo en las cachés locales.
+
+Uso independiente:
+    python prefetch.py            # Bucle infinito según el horario de mercado
+    python prefetch.py --una-vez  # Una sola pasada (ej: desde cron)
+"""
+import argparse
+import os
+import threading
+import time
+from datetime import datetime, timedelta, time as hora
+from zoneinfo import ZoneInfo
+
+import analisis_fundamental
+import datos
+import divisas
+import mercado
+import panel_precios
+
+# --- HORARIOS DE MERCADO (hora local de cada bolsa, lunes a viernes) ---
+MERCADOS = {
+    "ES": {"zona": ZoneInfo("Europe/Madrid"), "apertura": hora(9, 0), "cierre": hora(17, 35)},
+    "US": {"zona": ZoneInfo("America/New_York"), "apertura": hora(9, 30), "cierre": hora(16, 0)},
+}
+
+INTERVALO_ABIERTO = timedelta(minutes=15)   # Con alguna bolsa abierta
+MARGEN_TRAS_CIERRE = timedelta(minutes=20)  # Esperamos a que Yahoo publique el cierre
+MAX_ESPERA_CERRADO = timedelta(hours=6)     # Aunque no pase nada, no dormimos más de esto
+
+ZONA_LOCAL = ZoneInfo("UTC")
+
+# Con CHIVATO_PRECARGA=1 las páginas arrancan el planificador en un hilo de la propia app
+PRECARGA_EN_APP = os.environ.get("CHIVATO_PRECARGA", "0") == "1"
+
+
+def ahora_utc():
+    return datetime.now(tz=ZONA_LOCAL)
+
+
+def mercado_abierto(nombre, ahora):
+    """¿Está abierta la bolsa 'nombre' en el instante 'ahora' (datetime con zona)?"""
+    m = MERCADOS[nombre]
+    local = ahora.astimezone(m["zona"])
+    if local.weekday() >= 5: return False
+    return m["apertura"] <= local.time() < m["cierre"]
+
+
+def _eventos(nombre, ahora, dias=7):
+    """Aperturas y cierres (+margen) de los próximos días, en la zona de 'ahora'."""
+    m = MERCADOS[nombre]
+    local = ahora.astimezone(m["zona"])
+    for d in range(dias + 1):
+        dia = (local + timedelta(days=d)).date()
+        if dia.weekday() >= 5: continue
+        apertura = datetime.combine(dia, m["apertura"], tzinfo=m["zona"])
+        cierre = datetime.combine(dia, m["cierre"], tzinfo=m["zona"]) + MARGEN_TRAS_CIERRE
+        yield apertura.astimezone(ahora.tzinfo)
+        yield cierre.astimezone(ahora.tzinfo)
+
+
+def ultimo_cierre(ahora, dias=7):
+    """Último cierre (+margen) de cualquier bolsa anterior a 'ahora', en su zona; None si no hay."""
+    cierres = []
+    for m in MERCADOS.values():
+        local = ahora.astimezone(m["zona"])
+        for d in range(dias + 1):
+            dia = (local - timedelta(days=d)).date()
+            if dia.weekday() >= 5: continue
+            cierre = (datetime.combine(dia, m["cierre"], tzinfo=m["zona"]) + MARGEN_TRAS_CIERRE).astimezone(ahora.tzinfo)
+            if cierre <= ahora: cierres.append(cierre)
+    return max(cierres, default=None)
+
+
+def proxima_ejecucion(ahora):
+    """
+    Cuándo toca la siguiente precarga:
+      - Con alguna bolsa abierta: cada INTERVALO_ABIERTO.
+      - Con todo cerrado: en la próxima apertura o cierre (+margen), lo que llegue antes.
+    """
+    if any(mercado_abierto(n, ahora) for n in MERCADOS):
+        return ahora + INTERVALO_ABIERTO
+    futuros = [e for n in MERCADOS for e in _eventos(n, ahora) if e > ahora]
+    siguiente = min(futuros) if futuros else ahora + MAX_ESPERA_CERRADO
+    return min(siguiente, ahora + MAX_ESPERA_CERRADO)
+
+
+# --- TAREAS DE PRECARGA ---
+def tareas_por_defecto(tickers=None):
+    """Las tareas reales (Yahoo). Para pruebas se pasa un dict con funciones falsas."""
+    tareas = {
+        # max_horas=0: fuerza pedir las velas nuevas aunque la caché sea reciente
+        "precios": lambda tickers: datos.descargar_datos(tickers, max_horas=0),
+        "divisa": lambda: divisas.obtener_tasas(usar_cache=False), # Todas las habituales de una vez
+        "fundamentales": lambda tickers: analisis_fundamental.obtener_datos_fundamentales_lote(tickers),
+    }
+    if panel_precios.USAR_PANEL:
+        # Tras refrescar la caché de cierres, se republica el panel compartido (sin red)
+        tareas["panel"] = lambda: panel_precios.construir(tickers)
+    return tareas
+
+
+class Planificador:
+    """
+    Ejecuta las tareas de precarga según proxima_ejecucion().
+    'reloj' y 'dormir' se pueden sustituir por un reloj falso para probar sin esperar.
+    """
+
+    def __init__(self, tickers=None, tareas=None, reloj=ahora_utc, dormir=time.sleep):
+        self.tickers = list(tickers or datos.EMPRESAS_SELECCIONADAS)
+        self.tareas = tareas if tareas is not None else tareas_por_defecto(self.tickers)
+        self.reloj = reloj
+        self.dormir = dormir
+        self.historial = [] # (instante, {tarea: segundos o error})
+        self._parar = threading.Event()
+
+    def ejecutar_una_vez(self):
+        resultado = {}
+        for nombre in ("precios", "divisa", "fundamentales"):
+            tarea = self.tareas.get(nombre)
+            if tarea is None: continue
+            inicio = time.perf_counter()
+            try:
+                tarea() if nombre == "divisa" else tarea(self.tickers)
+                resultado[nombre] = round(time.perf_counter() - inicio, 3)
+            except Exception as e:
+                print(f"⚠️ Precarga de {nombre} fallida: {e}")
+                resultado[nombre] = f"error: {e}"
+        # Tareas extra (ej: publicar la instantánea de mercado) sin argumentos
+        for nombre, tarea in self.tareas.items():
+            if nombre in ("precios", "divisa", "fundamentales"): continue
+            try: tarea()
+            except Exception as e: resultado[nombre] = f"error: {e}"
+        self.historial.append((self.reloj(), resultado))
+        return resultado
+
+    def ejecutar(self, max_ciclos=None):
+        """Bucle principal: precarga y duerme hasta la siguiente ventana."""
+        ciclos = 0
+        while not self._parar.is_set():
+            self.ejecutar_una_vez()
+            ciclos += 1
+            if max_ciclos is not None and ciclos >= max_ciclos: break
+            ahora = self.reloj()
+            espera = (proxima_ejecucion(ahora) - ahora).total_seconds()
+            print(f"⏰ Próxima precarga en {espera / 60:.0f} min")
+            self.dormir(max(0.0, espera))
+
+    def parar(self):
+        self._parar.set()
+
+
+_hilo = None
+_lock = threading.Lock() # Varias sesiones de Streamlit pueden llamar a la vez al arrancar
+
+def iniciar_en_segundo_plano(tickers=None, tareas=None, con_instantanea=True):
+    """Opción dentro de la app: lanza el planificador en un hilo (una vez por proceso)."""
+    global _hilo
+    with _lock:
+        if _hilo is not None and _hilo.is_alive():
+            return _hilo
+        tareas = dict(tareas if tareas is not None else tareas_por_defecto(tickers))
+        if con_instantanea:
+            # Tras calentar las cachés, publicamos una instantánea nueva (sale casi gratis);
+            # si el refresco de mercado ya está en marcha, no se repite la descarga
+            tareas["instantanea"] = lambda: mercado.refrescar_si_libre(tickers)
+        planificador = Planificador(tickers=tickers, tareas=tareas)
+        _hilo = threading.Thread(target=planificador.ejecutar, name="precarga", daemon=True)
+        _hilo.start()
+        return _hilo
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Precarga de datos de El Chivato Bursátil")
+    parser.add_argument("--una-vez", action="store_true", help="Ejecuta una sola pasada y sale")
+    parser.add_argument("--tickers", help="Fichero con un ticker por línea (por defecto, el universo de datos.py)")
+    args = parser.parse_args()
+
+    lista = datos.leer_universo(args.tickers) if args.tickers else None
+
+    planificador = Planificador(tickers=lista)
+    if args.una_vez:
+        print(planificador.ejecutar_una_vez())
+    else:
+        planificador.ejecutar()
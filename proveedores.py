@@ -0,0 +1,249 @@
+"""
+Proveedores de datos de mercado. TODO el acceso a Yahoo pasa por aquí.
+
+    ProveedorDatos    -> interfaz (precios, historial, fundamentales, divisa, noticias)
+    ProveedorYahoo    -> Yahoo Finance (yfinance), el de siempre
+    ProveedorGrabado  -> graba/reproduce ficheros del disco (CSV + JSON), sin red
+
+Se elige con la variable de entorno CHIVATO_PROVEEDOR:
+    yahoo (por defecto) | grabado:<carpeta> | grabar:<carpeta>
+"""
+import json
+import os
+import threading
+
+import pandas as pd
+import yfinance as yf
+
+
+class ProveedorDatos:
+    """Interfaz común. Los precios siempre vuelven como cierres sin zona horaria."""
+
+    def precios(self, tickers, period=None, start=None, end=None, interval="1d"):
+        """
+        DataFrame de cierres ajustados (una columna por ticker).
+        Con 'start' (y opcionalmente 'end', exclusivo) se ignora 'period'.
+        'interval' como en Yahoo: '1d', '1wk', '1h', '15m'...
+        """
+        raise NotImplementedError
+
+    def historial(self, ticker, period="1y"):
+        """DataFrame OHLC diario de un ticker (columnas Open, High, Low, Close, Volume)."""
+        raise NotImplementedError
+
+    def fundamentales(self, ticker):
+        """Ficha de la empresa (dict estilo yf.Ticker(...).info) o None."""
+        raise NotImplementedError
+
+    def tipo_cambio(self, par):
+        """Último cierre de un par de divisas de Yahoo (ej: 'EURUSD=X')."""
+        raise NotImplementedError
+
+    def noticias(self, ticker):
+        """Lista de noticias (dicts con al menos 'title')."""
+        raise NotImplementedError
+
+
+def _sin_zona(df):
+    if not df.empty and getattr(df.index, "tz", None) is not None:
+        df.index = df.index.tz_localize(None)
+    return df
+
+
+# yf.download no admite varias descargas a la vez (comparte estado entre llamadas) y la
+# llaman varios hilos: refresco de mercado, precarga, radar, almacén, divisas...
+_lock_descargas = threading.Lock()
+
+
+class ProveedorYahoo(ProveedorDatos):
+
+    def precios(self, tickers, period=None, start=None, end=None, interval="1d"):
+        kwargs = {"start": start, "end": end} if start else {"period": period or "1y"}
+        with _lock_descargas:
+            datos = yf.download(tickers, auto_adjust=True, progress=False, interval=interval, **kwargs)
+        return _sin_zona(self._extraer_cierres(datos, tickers))
+
+    @staticmethod
+    def _extraer_cierres(datos, lista_tickers):
+        """Convierte la respuesta de Yahoo en un DataFrame de cierres (maneja Series, DataFrames y MultiIndex)."""
+        # Caso 1: Yahoo devuelve MultiIndex (Price, Ticker)
+        if isinstance(datos.columns, pd.MultiIndex):
+            try:
+                df = datos['Close'] # Intentamos coger solo cierre
+            except KeyError:
+                # Si falla, a veces la columna se llama diferente o no hay MultiIndex claro
+                df = datos
+        # Caso 2: Index simple (Open, Close, etc.) - Típico de 1 sola empresa
+        elif 'Close' in datos.columns:
+            df = datos[['Close']] # Lo mantenemos como DataFrame
+        else:
+            df = datos # Fallback
+
+        # --- LIMPIEZA CRÍTICA ---
+        # Si descargamos 1 sola empresa, Yahoo a veces no pone el nombre del Ticker en la columna.
+        # Aquí lo forzamos manualmente.
+        if len(lista_tickers) == 1:
+            # Si es una Serie, la convertimos
+            if isinstance(df, pd.Series):
+                df = df.to_frame()
+
+            # Si tiene 1 columna, le ponemos el nombre del ticker SÍ o SÍ.
+            if df.shape[1] == 1:
+                df.columns = lista_tickers
+        return df
+
+    def historial(self, ticker, period="1y"):
+        return _sin_zona(yf.Ticker(ticker).history(period=period))
+
+    def fundamentales(self, ticker):
+        return yf.Ticker(ticker).info
+
+    def tipo_cambio(self, par):
+        return float(yf.Ticker(par).history(period="1d")['Close'].iloc[-1])
+
+    def noticias(self, ticker):
+        return yf.Ticker(ticker).news or []
+
+
+class ProveedorGrabado(ProveedorDatos):
+    """
+    Reproduce (o graba, si se le pasa 'base') datos desde una carpeta:
+        <carpeta>/precios/<ticker>.csv       cierres diarios
+        <carpeta>/precios_<intervalo>/<ticker>.csv  cierres intradía o semanales
+        <carpeta>/historial/<ticker>.csv     OHLC
+        <carpeta>/fundamentales/<ticker>.json
+        <carpeta>/divisas/<par>.json
+        <carpeta>/noticias/<ticker>.json
+    Al reproducir, 'period' se mide desde la última fecha grabada, así las pruebas
+    son deterministas aunque pasen los días.
+    """
+
+    def __init__(self, directorio, base=None):
+        self.directorio = directorio
+        self.base = base # Si hay base: modo GRABAR (pide a la base y guarda en disco)
+        self._lock = threading.Lock()
+
+    # --- FICHEROS ---
+    def _ruta(self, tipo, clave, extension):
+        nombre = "".join(c if c.isalnum() or c in "-_." else "_" for c in clave)
+        return os.path.join(self.directorio, tipo, f"{nombre}.{extension}")
+
+    def _guardar_json(self, tipo, clave, valor):
+        ruta = self._ruta(tipo, clave, "json")
+        os.makedirs(os.path.dirname(ruta), exist_ok=True)
+        with open(ruta, "w", encoding="utf-8") as f:
+            json.dump(valor, f, ensure_ascii=False, default=str)
+
+    def _leer_json(self, tipo, clave):
+        ruta = self._ruta(tipo, clave, "json")
+        if not os.path.exists(ruta): return None
+        with open(ruta, encoding="utf-8") as f:
+            return json.load(f)
+
+    def _guardar_csv(self, tipo, clave, df):
+        ruta = self._ruta(tipo, clave, "csv")
+        os.makedirs(os.path.dirname(ruta), exist_ok=True)
+        df.to_csv(ruta)
+
+    def _leer_csv(self, tipo, clave):
+        ruta = self._ruta(tipo, clave, "csv")
+        if not os.path.exists(ruta): return None
+        return pd.read_csv(ruta, index_col=0, parse_dates=True)
+
+    @staticmethod
+    def _recortar(df, period=None, start=None, end=None):
+        if df is None or df.empty: return df
+        if start:
+            df = df[df.index >= pd.Timestamp(start)]
+            return df[df.index < pd.Timestamp(end)] if end else df
+        if period and period != "max":
+            return df[df.index > df.index[-1] - _periodo(period)]
+        return df
+
+    # --- API ---
+    def precios(self, tickers, period=None, start=None, end=None, interval="1d"):
+        tipo = "precios" if interval == "1d" else f"precios_{interval}"
+        if self.base is not None:
+            df = self.base.precios(tickers, period=period, start=start, end=end, interval=interval)
+            with self._lock:
+                for t in df.columns:
+                    # Al grabar fusionamos con lo que ya hubiera (las descargas incrementales traen poco)
+                    previo = self._leer_csv(tipo, t)
+                    serie = df[t].dropna()
+                    if previo is not None and not previo.empty:
+                        serie = pd.concat([previo.iloc[:, 0], serie])
+                        serie = serie[~serie.index.duplicated(keep="last")].sort_index()
+                    self._guardar_csv(tipo, t, serie.rename(t).to_frame())
+            return df
+        series = {}
+        for t in tickers:
+            df = self._leer_csv(tipo, t)
+            if df is not None and not df.empty:
+                series[t] = self._recortar(df.iloc[:, 0], period or "1y", start, end)
+        return pd.DataFrame(series)
+
+    def historial(self, ticker, period="1y"):
+        if self.base is not None:
+            df = self.base.historial(ticker, period=period)
+            self._guardar_csv("historial", ticker, df)
+            return df
+        df = self._leer_csv("historial", ticker)
+        return self._recortar(df, period) if df is not None else pd.DataFrame()
+
+    def fundamentales(self, ticker):
+        if self.base is not None:
+            info = self.base.fundamentales(ticker)
+            if info: self._guardar_json("fundamentales", ticker, info)
+            return info
+        return self._leer_json("fundamentales", ticker)
+
+    def tipo_cambio(self, par):
+        if self.base is not None:
+            tasa = self.base.tipo_cambio(par)
+            self._guardar_json("divisas", par, {"par": par, "tasa": tasa})
+            return tasa
+        grabado = self._leer_json("divisas", par)
+        if grabado is None: raise KeyError(f"Sin grabación para {par}")
+        return grabado["tasa"]
+
+    def noticias(self, ticker):
+        if self.base is not None:
+            lista = self.base.noticias(ticker)
+            self._guardar_json("noticias", ticker, lista)
+            return lista
+        return self._leer_json("noticias", ticker) or []
+
+
+def _periodo(period):
+    """'1y' -> DateOffset(years=1), '6mo' -> months=6, '5d' -> days=5."""
+    numero = int("".join(c for c in period if c.isdigit()) or 1)
+    if period.endswith("mo"): return pd.DateOffset(months=numero)
+    if period.endswith("y"): return pd.DateOffset(years=numero)
+    if period.endswith("wk"): return pd.DateOffset(weeks=numero)
+    return pd.DateOffset(days=numero)
+
+
+# --- PROVEEDOR ACTIVO (uno por proceso) ---
+_proveedor = None
+
+
+def crear_desde_entorno():
+    config = os.environ.get("CHIVATO_PROVEEDOR", "yahoo")
+    if config.startswith("grabado:"):
+        return ProveedorGrabado(config.split(":", 1)[1])
+    if config.startswith("grabar:"):
+        return ProveedorGrabado(config.split(":", 1)[1], base=ProveedorYahoo())
+    return ProveedorYahoo()
+
+
+def obtener_proveedor():
+    global _proveedor
+    if _proveedor is None:
+        _proveedor = crear_desde_entorno()
+    return _proveedor
+
+
+def establecer_proveedor(proveedor):
+    """Cambia el proveedor de todo el proceso (ej: uno falso en pruebas o benchmarks)."""
+    global _proveedor
+    _proveedor = proveedor
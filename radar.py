@@ -0,0 +1,117 @@
+import os
+from concurrent.futures import ThreadPoolExecutor, as_completed, wait
+
+import analisis_fundamental
+import proveedores
+from cache_ttl import CacheTTL
+from diagnostico import contar, en_hilo
+
+# Cuántas fichas pedimos a Yahoo a la vez (más alto = más rápido, pero más riesgo de bloqueo)
+MAX_CONCURRENCIA = 8
+
+# Lo más que retrasamos el primer resultado esperando a las cotizaciones (segundos)
+ESPERA_COTIZACIONES = 2.0
+
+# La ficha (objetivo, recomendación) puede venir de la caché de fundamentales con horas;
+# el precio no: se pide aparte y solo se reutiliza unos minutos. Solo en memoria.
+CACHE_COTIZACIONES = CacheTTL(
+    ttl_segundos=float(os.environ.get("CHIVATO_RADAR_COTIZACION_MINUTOS", "5")) * 60,
+    max_elementos=1000,
+)
+
+
+def cotizaciones(tickers):
+    """
+    Último precio de cada ticker (dict ticker -> precio), con caché corta.
+    Los que faltan se piden a la vez en una sola descarga; si falla, se quedan fuera.
+    """
+    precios, faltan = {}, []
+    for t in tickers:
+        precio = CACHE_COTIZACIONES.obtener(t)
+        if precio is None: faltan.append(t)
+        else: precios[t] = precio
+    if not faltan: return precios
+    contar("radar.cotizaciones_descargadas", len(faltan))
+    try:
+        df = proveedores.obtener_proveedor().precios(faltan, period="5d")
+    except Exception as e:
+        print(f"⚠️ Sin cotizaciones recientes para el radar: {e}")
+        return precios
+    for t in faltan:
+        serie = df[t].dropna() if t in df.columns else ()
+        if len(serie):
+            precios[t] = float(serie.iloc[-1])
+            CACHE_COTIZACIONES.guardar(t, precios[t])
+    return precios
+
+
+def extraer_oportunidad(ticker, info, precio=None):
+    """
+    Convierte la ficha de Yahoo en una fila del radar.
+    'precio' es la cotización reciente; sin ella se usa la de la ficha.
+    Devuelve None si no hay precio actual y precio objetivo (filtro de calidad).
+    """
+    if not info:
+        raise ValueError(f"Sin datos para {ticker}")
+
+    # Extraemos datos clave
+    precio_actual = precio or info.get('currentPrice', info.get('previousClose', 0))
+    precio_objetivo = info.get('targetMeanPrice', 0)
+    nombre = info.get('shortName', ticker)
+    recomendacion = info.get('recommendationKey', 'none').upper() # buy, hold, sell
+
+    # FILTRO DE CALIDAD: Solo guardamos si tenemos ambos precios
+    if precio_actual > 0 and precio_objetivo > 0:
+        potencial = ((precio_objetivo - precio_actual) / precio_actual) * 100
+        return {
+            "Ticker": ticker,
+            "Empresa": nombre,
+            "Precio": precio_actual,
+            "Objetivo": precio_objetivo,
+            "Potencial %": round(potencial, 2),
+            "Recomendación": recomendacion
+        }
+    return None
+
+
+def escanear(tickers, max_concurrencia=MAX_CONCURRENCIA, obtener_info=None, obtener_cotizaciones=None):
+    """
+    Escanea los tickers en paralelo y va devolviendo resultados según llegan.
+    Es un generador de tuplas (ticker, oportunidad, error):
+      - oportunidad: dict de extraer_oportunidad (o None si no pasa el filtro)
+      - error: la excepción si falló la descarga (o None)
+    'obtener_info' y 'obtener_cotizaciones' permiten inyectar otra fuente (ej: un Yahoo
+    falso para pruebas de velocidad). Las cotizaciones tienen ESPERA_COTIZACIONES segundos
+    de margen: las fichas que lleguen antes de ellas salen con el precio de la ficha.
+    Si se deja de leer antes de acabar, las descargas que no han empezado se cancelan.
+    """
+    if not tickers: return
+    obtener_info = obtener_info or analisis_fundamental.obtener_datos_fundamentales
+    obtener_cotizaciones = obtener_cotizaciones or cotizaciones
+
+    grupo = ThreadPoolExecutor(max_workers=max(1, min(max_concurrencia, len(tickers))))
+    try:
+        # Las cotizaciones van en una sola descarga, en paralelo con las fichas
+        precios = grupo.submit(en_hilo(obtener_cotizaciones), list(tickers))
+        tarea = en_hilo(obtener_info)
+        futuros = {grupo.submit(tarea, t): t for t in tickers}
+        # Con las fichas en caché llegan al instante: damos un margen corto a las cotizaciones
+        # para no pintar el precio viejo de la ficha, pero sin frenar el streaming más de eso
+        wait([precios], timeout=ESPERA_COTIZACIONES)
+        for futuro in as_completed(futuros):
+            ticker = futuros[futuro]
+            try:
+                info = futuro.result()
+                listos = precios.done() and precios.exception() is None
+                precio = precios.result().get(ticker) if listos else None
+                yield ticker, extraer_oportunidad(ticker, info, precio), None
+            except Exception as e:
+                yield ticker, None, e
+    finally:
+        # También si el que lee corta el generador a medias: no seguimos descargando para nadie
+        grupo.shutdown(wait=False, cancel_futures=True)
+
+
+def ordenar_por_potencial(oportunidades):
+    """Las de mayor potencial arriba."""
+    return sorted(oportunidades, key=lambda x: x['Potencial %'], reverse=True)
@@ -0,0 +1,208 @@
+"""
+Ranking técnico + fundamental del Analizador Técnico, sin Streamlit.
+
+    python ranking.py                                  # Universo de datos.py -> .cache/ranking/ultimo.json
+    python ranking.py --universo tickers.txt --salida ranking.parquet ranking.csv
+    python ranking.py --hilos 16 --timeout 20          # Más fichas en paralelo
+    python ranking.py --panel                          # Cierres del panel compartido (sin descargar)
+
+Mismo proceso que el botón "Generar Ranking Completo":
+  FASE 1: semáforo técnico de todo el universo (VERDE / NARANJA / ROJO).
+  FASE 2: auditoría fundamental de los candidatos (VERDE y NARANJA) en paralelo.
+Un VERDE con nota < 5 baja a NARANJA ("Fundamentales débiles").
+
+La página puede cargar el fichero ya calculado (ej: uno nocturno por cron) al instante.
+"""
+import argparse
+import os
+import time
+
+import pandas as pd
+
+import analisis_fundamental
+import calculos
+import datos
+import divisas
+import panel_precios
+from diagnostico import cronometrado
+
+# Donde la página busca el ranking precalculado (y donde escribe la CLI por defecto)
+FICHERO_PRECALCULADO = os.environ.get("CHIVATO_RANKING", os.path.join(".cache", "ranking", "ultimo.json"))
+GRUPOS = ("VERDE", "NARANJA", "ROJO")
+COLUMNAS_DESGLOSE = ["Valoración (PER)", "Rentabilidad", "Dividendos", "Deuda", "Crecimiento"]
+
+
+# --- TABLA DE RESULTADOS ---
+# Una fila por empresa, columnas con tipo:
+#   Grupo, Estado   -> categóricas (VERDE / NARANJA / ROJO). Grupo es la lista donde acaba.
+#   Precio          -> float (EUR), Volatilidad -> float
+#   Puntuacion      -> entero 0-10 (vacío si la auditoría fundamental falló o es ROJO)
+#   Desglose        -> texto, solo para mostrar
+# El formato ("12.34 €", "7/10") se aplica al pintar, nunca en la tabla.
+def tipar(tabla):
+    """Aplica los tipos de la tabla de ranking (también al leerla de CSV o JSON)."""
+    tabla = tabla.copy()
+    for c in COLUMNAS_DESGLOSE:
+        if c not in tabla.columns: tabla[c] = None
+    tabla["Grupo"] = pd.Categorical(tabla["Grupo"], categories=GRUPOS, ordered=True)
+    tabla["Estado"] = pd.Categorical(tabla["Estado"], categories=GRUPOS)
+    tabla["Precio"] = tabla["Precio"].astype("float64")
+    tabla["Volatilidad"] = tabla["Volatilidad"].astype("float64")
+    tabla["Puntuacion"] = pd.to_numeric(tabla["Puntuacion"]).astype("Int8")
+    for c in ["Ticker", "Empresa", "Motivo"] + COLUMNAS_DESGLOSE:
+        tabla[c] = tabla[c].astype("string")
+    columnas = ["Ticker", "Empresa", "Grupo", "Estado", "Motivo", "Precio", "Volatilidad", "Puntuacion"]
+    return tabla[columnas + COLUMNAS_DESGLOSE].reset_index(drop=True)
+
+
+def ordenar(tabla):
+    """Por grupo (VERDE, NARANJA, ROJO) y dentro de cada uno por Puntuacion; empates en el orden del universo."""
+    return tabla.sort_values(["Grupo", "Puntuacion"], ascending=[True, False],
+                             na_position="last", kind="stable").reset_index(drop=True)
+
+
+def grupo(tabla, nombre):
+    return tabla[tabla["Grupo"] == nombre]
+
+
+def filtrar(tabla, texto="", nota_minima=0, orden=None):
+    """Filtros de la página sobre la tabla ya calculada (sin volver a descargar nada)."""
+    vista = tabla
+    if texto:
+        t = texto.strip()
+        vista = vista[vista["Empresa"].str.contains(t, case=False, regex=False)
+                      | vista["Ticker"].str.contains(t, case=False, regex=False)]
+    if nota_minima:
+        vista = vista[vista["Puntuacion"].fillna(-1) >= nota_minima]
+    if orden and orden != "Puntuacion":
+        vista = vista.sort_values(["Grupo", orden], ascending=[True, orden == "Empresa"],
+                                  na_position="last", kind="stable")
+    return vista
+
+
+# --- CÁLCULO ---
+@cronometrado("ranking.calcular_ranking")
+def calcular_ranking(precios, tasas=None, tickers=None, obtener_ficha=None,
+                     max_workers=8, timeout=15, progreso=None):
+    """
+    precios: DataFrame de cierres (una columna por ticker), como el de descargar_datos.
+    tasas: moneda -> EUR por unidad (ej: las de la instantánea); None = divisas.obtener_tasas.
+    obtener_ficha(ticker): ficha ya disponible (ej: la de la instantánea) o None; las que
+        falten se descargan en paralelo con obtener_datos_fundamentales_lote.
+    Devuelve la tabla de ranking (ver tipar) ya ordenada.
+    """
+    tickers = list(precios.columns) if tickers is None else list(dict.fromkeys(tickers))
+    obtener_ficha = obtener_ficha or (lambda ticker: None)
+
+    # FASE 1: SEMÁFORO DE TODO EL UNIVERSO DE UNA SOLA PASADA
+    semaforo = calculos.analizar_semaforo_universo(precios).set_index("Ticker")
+    semaforo = semaforo.loc[[t for t in tickers if t in semaforo.index]] # Sin datos = fuera
+    semaforo = semaforo[semaforo["Estado"] != "ERROR"]
+    tabla = pd.DataFrame({
+        "Ticker": semaforo.index,
+        "Empresa": [datos.NOMBRES.get(t, t) for t in semaforo.index],
+        "Grupo": semaforo["Estado"].to_numpy(),
+        "Estado": semaforo["Estado"].to_numpy(),
+        "Motivo": semaforo["Mensaje"].to_numpy(),
+        "Precio": divisas.convertir(semaforo["Precio"], semaforo.index, tasas, obtener_ficha),
+        "Volatilidad": semaforo["Volatilidad"].to_numpy(),
+        "Puntuacion": pd.NA,
+    })
+
+    # FASE 2: FUNDAMENTAL (solo se descargan las fichas que no nos hayan dado)
+    candidatos = tabla.index[tabla["Estado"] != "ROJO"]
+    fichas = {t: obtener_ficha(t) for t in tabla.loc[candidatos, "Ticker"]}
+    faltan = [t for t, info in fichas.items() if info is None]
+    fichas.update(zip(faltan, analisis_fundamental.obtener_datos_fundamentales_lote(
+        faltan, max_workers=max_workers, timeout=timeout, progreso=progreso
+    )))
+    resultados = analisis_fundamental.puntuar_lote(list(fichas.values()))
+
+    notas = [r[0] if r else pd.NA for r in resultados]
+    desgloses = pd.DataFrame([r[1] if r else {} for r in resultados], index=candidatos)
+    tabla.loc[candidatos, "Puntuacion"] = notas
+    tabla = tabla.join(desgloses.reindex(columns=COLUMNAS_DESGLOSE))
+
+    # Universos de fuera de datos.NOMBRES: nombre de la ficha
+    for i, info in zip(candidatos, fichas.values()):
+        if info and tabla.at[i, "Empresa"] == tabla.at[i, "Ticker"] and info.get("shortName"):
+            tabla.at[i, "Empresa"] = info["shortName"]
+
+    # Un VERDE sin nota pasa a NARANJA; con nota < 5, además, por "Fundamentales débiles"
+    nota = pd.to_numeric(tabla["Puntuacion"])
+    sin_nota = tabla["Estado"].ne("ROJO") & nota.isna()
+    debil = tabla["Estado"].eq("VERDE") & (nota < 5)
+    tabla.loc[sin_nota | debil, "Grupo"] = "NARANJA"
+    tabla.loc[debil, "Motivo"] = "Fundamentales débiles"
+    return ordenar(tipar(tabla))
+
+
+def ejecutar(tickers, max_workers=8, timeout=15, usar_panel=False):
+    """
+    Proceso completo con descarga incluida (lo que hace la CLI).
+    usar_panel=True lee los cierres del panel compartido (panel_precios) si los tiene todos.
+    """
+    precios = None
+    if usar_panel:
+        panel = panel_precios.abrir_panel()
+        if panel is not None and all(t in panel for t in tickers):
+            precios = panel.a_dataframe(tickers)
+    if precios is None:
+        precios = datos.descargar_datos_en_bloques(list(tickers))
+    if precios.empty:
+        raise RuntimeError("No se han podido descargar precios")
+    return calcular_ranking(precios, tickers=tickers,
+                            max_workers=max_workers, timeout=timeout)
+
+
+# --- FICHEROS ---
+def guardar(tabla, ruta=FICHERO_PRECALCULADO):
+    """Formato según la extensión: .json, .csv o .parquet (este último necesita pyarrow)."""
+    carpeta = os.path.dirname(ruta)
+    if carpeta: os.makedirs(carpeta, exist_ok=True)
+    temporal = ruta + ".tmp"
+    if ruta.endswith(".parquet"):
+        tabla.to_parquet(temporal, index=False)
+    elif ruta.endswith(".csv"):
+        tabla.to_csv(temporal, index=False)
+    else:
+        tabla.to_json(temporal, orient="records", force_ascii=False, indent=1)
+    os.replace(temporal, ruta) # La página nunca lee un fichero a medio escribir
+    return ruta
+
+
+def cargar(ruta=FICHERO_PRECALCULADO):
+    """Inversa de guardar: la misma tabla, con sus tipos."""
+    if ruta.endswith(".parquet"): df = pd.read_parquet(ruta)
+    elif ruta.endswith(".csv"): df = pd.read_csv(ruta)
+    else: df = pd.read_json(ruta, orient="records", dtype=False)
+    return tipar(df)
+
+
+def antiguedad_horas(ruta=FICHERO_PRECALCULADO):
+    """Horas desde que se escribió el fichero (None si no existe)."""
+    if not os.path.exists(ruta): return None
+    return (time.time() - os.path.getmtime(ruta)) / 3600
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Ranking técnico + fundamental de El Chivato Bursátil")
+    parser.add_argument("--universo", help="Fichero con un ticker por línea (por defecto, el universo de datos.py)")
+    parser.add_argument("--salida", nargs="+", default=[FICHERO_PRECALCULADO],
+                        help="Uno o varios ficheros .json / .csv / .parquet")
+    parser.add_argument("--hilos", type=int, default=8, help="Fichas fundamentales en paralelo")
+    parser.add_argument("--timeout", type=float, default=15, help="Segundos máximos por ficha")
+    parser.add_argument("--panel", action="store_true", help="Lee los cierres del panel compartido (python panel_precios.py)")
+    args = parser.parse_args()
+
+    universo = datos.leer_universo(args.universo) if args.universo else list(datos.EMPRESAS_SELECCIONADAS)
+    inicio = time.perf_counter()
+    resultado = ejecutar(universo, max_workers=args.hilos, timeout=args.timeout, usar_panel=args.panel)
+    cuenta = resultado["Grupo"].value_counts()
+    print(f"📊 {len(universo)} tickers en {time.perf_counter() - inicio:.1f} s: "
+          f"{cuenta['VERDE']} verdes, {cuenta['NARANJA']} naranjas, {cuenta['ROJO']} rojos")
+    for ruta in args.salida:
+        try:
+            print(f"💾 {guardar(resultado, ruta)}")
+        except ImportError as e:
+            print(f"⚠️ No se pudo escribir {ruta} (¿falta pyarrow?): {e}")
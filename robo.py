@@ -0,0 +1,139 @@
+"""
+Lógica del Robo-Advisor sin Streamlit: universo puntuado + reparto del capital.
+
+    universo = robo.universo_puntuado(inst)                 # Caro: semáforo + auditoría fundamental
+    cartera = robo.asignar(universo, 10000, "Moderado")     # Barato: milisegundos
+
+El universo puntuado (VERDES con Empresa, Precio en EUR, Volatilidad y Nota) solo
+depende de los datos, no del capital ni del perfil, así que se guarda por versión de
+la instantánea de mercado: cambiar el capital o el perfil solo repite el reparto.
+"""
+import threading
+
+import numpy as np
+import pandas as pd
+
+import analisis_fundamental
+import calculos
+import datos
+import optimizador
+from diagnostico import cronometrado
+
+# Reparto del capital por bloques: (Preservación, Crecimiento, Especulativo)
+REPARTO = {
+    "Conservador": (0.8, 0.2, 0.0),
+    "Moderado": (0.6, 0.4, 0.0),
+    "Dinámico": (0.2, 0.4, 0.4),
+}
+BLOQUES = ("🛡️ Preservación", "⚖️ Crecimiento", "🔥 Especulativo")
+VALORES_POR_BLOQUE = 3
+COLUMNAS_CARTERA = ["Categoría", "Activo", "Precio", "Cantidad", "Total", "Calidad"]
+
+
+def categoria(volatilidad):
+    """Bloque al que pertenece un valor por su volatilidad diaria."""
+    return BLOQUES[0] if volatilidad <= 0.01 else BLOQUES[1] if volatilidad <= 0.015 else BLOQUES[2]
+
+
+# --- UNIVERSO PUNTUADO ---
+@cronometrado("robo.puntuar_universo")
+def puntuar_universo(precios, tickers=None, factores_eur=None, obtener_ficha=None):
+    """
+    VERDES del semáforo con nota fundamental: DataFrame (índice Ticker) con Empresa,
+    Precio (EUR), Volatilidad y Nota, en el orden del universo. Los que no se pueden
+    puntuar se quedan fuera.
+    factores_eur(tickers): EUR por unidad de cada precio (None = sin convertir).
+    obtener_ficha(ticker): ficha ya disponible o None; las demás se descargan en paralelo.
+    """
+    tickers = list(datos.EMPRESAS_SELECCIONADAS if tickers is None else tickers)
+    obtener_ficha = obtener_ficha or (lambda ticker: None)
+    semaforo = calculos.analizar_semaforo_universo(precios).set_index("Ticker")
+    verdes = semaforo.loc[[t for t in tickers if t in semaforo.index]]
+    verdes = verdes[verdes["Estado"] == "VERDE"]
+    precio = verdes["Precio"].to_numpy(dtype="float64")
+    if factores_eur is not None and len(verdes):
+        precio = precio * factores_eur(verdes.index)
+
+    # Auditoría fundamental de todos los VERDES a la vez
+    fichas = {t: obtener_ficha(t) for t in verdes.index}
+    faltan = [t for t, info in fichas.items() if info is None]
+    fichas.update(zip(faltan, analisis_fundamental.obtener_datos_fundamentales_lote(faltan)))
+    notas = analisis_fundamental.puntuar_lote(list(fichas.values()))
+
+    universo = pd.DataFrame({
+        "Empresa": [datos.NOMBRES.get(t, t) for t in verdes.index],
+        "Precio": precio,
+        "Volatilidad": verdes["Volatilidad"].to_numpy(dtype="float64"),
+        "Nota": pd.array([r[0] if r else pd.NA for r in notas], dtype="Int8"),
+    }, index=pd.Index(verdes.index, name="Ticker"))
+    return universo[universo["Nota"].notna()]
+
+
+_memo = {} # (versión de la instantánea, tickers) -> universo puntuado
+_lock = threading.Lock()
+
+
+def universo_puntuado(inst, tickers=None):
+    """
+    puntuar_universo sobre una instantánea de mercado, calculado una sola vez por versión.
+    Las sesiones que pidan la misma versión a la vez esperan al primero y reutilizan su resultado.
+    """
+    tickers = tuple(datos.EMPRESAS_SELECCIONADAS if tickers is None else tickers)
+    clave = (inst.version, tickers)
+    with _lock:
+        if clave not in _memo:
+            universo = puntuar_universo(inst.precios, tickers, inst.factores_eur, inst.info)
+            # Solo la última versión: las anteriores ya no las pide nadie
+            for vieja in [k for k in _memo if k[0] != inst.version]: del _memo[vieja]
+            _memo[clave] = universo
+        return _memo[clave]
+
+
+# --- REPARTO ---
+@cronometrado("robo.asignar")
+def asignar(universo, capital, perfil="Moderado"):
+    """
+    Reparto clásico: por cada bloque con peso en el perfil, los 3 de más nota a partes
+    iguales (acciones enteras, mínimo 1). Devuelve la orden de compra (COLUMNAS_CARTERA).
+        Preservación: nota >= 7 y volatilidad <= 1%
+        Crecimiento:  nota >= 7 y volatilidad entre 1% y 1,5%
+        Especulativo: volatilidad > 1,5%
+    """
+    nota, vol = universo["Nota"], universo["Volatilidad"]
+    bloques = [
+        universo[(nota >= 7) & (vol <= 0.01)],
+        universo[(nota >= 7) & (vol > 0.01) & (vol <= 0.015)],
+        universo[vol > 0.015],
+    ]
+    filas = []
+    for etiqueta, lista, pct in zip(BLOQUES, bloques, REPARTO[perfil]):
+        if pct == 0 or lista.empty: continue
+        seleccion = lista.sort_values("Nota", ascending=False, kind="stable").head(VALORES_POR_BLOQUE)
+        dinero_acc = capital * pct / len(seleccion)
+        n_acc = np.maximum(1, (dinero_acc / seleccion["Precio"].to_numpy()).astype(int))
+        filas.append(pd.DataFrame({
+            "Categoría": etiqueta, "Activo": seleccion["Empresa"].to_numpy(), "Precio": seleccion["Precio"].to_numpy(),
+            "Cantidad": n_acc, "Total": n_acc * seleccion["Precio"].to_numpy(), "Calidad": seleccion["Nota"].to_numpy(dtype="int64"),
+        }))
+    return pd.concat(filas, ignore_index=True) if filas else pd.DataFrame(columns=COLUMNAS_CARTERA)
+
+
+@cronometrado("robo.asignar_optimizado")
+def asignar_optimizado(universo, precios, capital, perfil="Moderado"):
+    """
+    Reparto con optimizador.optimizar sobre los valores con la nota mínima del perfil.
+    Devuelve (orden de compra, métricas esperadas o None). La categoría sale de la volatilidad.
+    """
+    config = optimizador.PERFILES[perfil]
+    candidatos = universo[universo["Nota"] >= config["nota_minima"]]
+    pesos = optimizador.optimizar(precios, list(candidatos.index), perfil)
+    if pesos.empty:
+        return pd.DataFrame(columns=COLUMNAS_CARTERA), None
+    elegidos = candidatos.loc[pesos.index]
+    precio = elegidos["Precio"].to_numpy()
+    n_acc = np.maximum(1, (capital * pesos.to_numpy() / precio).astype(int))
+    cartera = pd.DataFrame({
+        "Categoría": [categoria(v) for v in elegidos["Volatilidad"]], "Activo": elegidos["Empresa"].to_numpy(),
+        "Precio": precio, "Cantidad": n_acc, "Total": n_acc * precio, "Calidad": elegidos["Nota"].to_numpy(dtype="int64"),
+    })
+    return cartera, optimizador.metricas(pesos, precios)
@@ -0,0 +1,97 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from almacen_precios import AlmacenPrecios
+
+
+class ProveedorFalso:
+    """Cierre = número de días desde 2000-01-01 (+1000 por ticker); apunta cada descarga."""
+
+    def __init__(self):
+        self.descargas = []
+        self.falla = False
+        self.sin_datos = set() # Como yf.download cuando falla: sin columna, sin error
+
+    def precios(self, tickers, start=None, end=None, interval="1d", **kwargs):
+        self.descargas.append((tuple(tickers), start, end))
+        if self.falla: raise ConnectionError("sin red")
+        if self.sin_datos >= set(tickers): return pd.DataFrame()
+        fechas = pd.bdate_range(start, pd.Timestamp(end) - pd.Timedelta(days=1)) # 'end' exclusivo
+        dias = (fechas - pd.Timestamp("2000-01-01")).days.to_numpy(dtype="float64")
+        return pd.DataFrame({t: dias + 1000 * n for n, t in enumerate(tickers) if t not in self.sin_datos}, index=fechas)
+
+
+@pytest.fixture
+def proveedor():
+    return ProveedorFalso()
+
+
+@pytest.fixture
+def almacen(tmp_path, proveedor):
+    return AlmacenPrecios(str(tmp_path), proveedor=proveedor)
+
+
+def test_rango_ya_pedido_no_se_descarga(almacen, proveedor):
+    df = almacen.obtener_cierres(["AAA", "BBB"], "2020-01-01", "2020-12-31")
+    assert proveedor.descargas == [(("AAA", "BBB"), "2020-01-01", "2021-01-01")]
+    assert df.index[0] == pd.Timestamp("2020-01-01") and df.index[-1] == pd.Timestamp("2020-12-31")
+    assert df.dtypes.eq("float32").all()
+    almacen.obtener_cierres(["AAA"], "2020-03-01", "2020-06-30")
+    assert len(proveedor.descargas) == 1
+
+
+def test_solo_se_piden_los_huecos(almacen, proveedor):
+    almacen.obtener_cierres(["AAA"], "2020-01-01", "2020-12-31")
+    df = almacen.obtener_cierres(["AAA"], "2018-01-01", "2021-06-30")
+    assert proveedor.descargas[1:] == [
+        (("AAA",), "2018-01-01", "2020-01-02"), # Por detrás
+        (("AAA",), "2020-12-31", "2021-07-01"), # Por delante
+    ]
+    esperado = (df.index - pd.Timestamp("2000-01-01")).days
+    assert np.array_equal(df["AAA"].to_numpy(), esperado.to_numpy(dtype="float32"))
+
+
+def test_tickers_con_el_mismo_hueco_van_juntos(almacen, proveedor):
+    almacen.obtener_cierres(["AAA"], "2020-01-01", "2020-12-31")
+    almacen.obtener_cierres(["AAA", "BBB", "CCC"], "2020-01-01", "2020-12-31")
+    assert proveedor.descargas[1:] == [(("BBB", "CCC"), "2020-01-01", "2021-01-01")]
+
+
+def test_se_guarda_en_disco(almacen, proveedor, tmp_path):
+    almacen.obtener_cierres(["AAA", "BBB"], "2020-01-01", "2020-12-31")
+    otro = AlmacenPrecios(str(tmp_path), proveedor=proveedor)
+    df = otro.obtener_cierres(["BBB"], "2020-06-01", "2020-06-30")
+    assert len(proveedor.descargas) == 1
+    assert df["BBB"].iloc[0] == (pd.Timestamp("2020-06-01") - pd.Timestamp("2000-01-01")).days + 1000
+
+
+def test_fallo_no_marca_el_rango(almacen, proveedor):
+    proveedor.falla = True
+    assert almacen.obtener_cierres(["AAA"], "2020-01-01", "2020-12-31").empty
+    proveedor.falla = False
+    assert not almacen.obtener_cierres(["AAA"], "2020-01-01", "2020-12-31").empty
+    assert len(proveedor.descargas) == 2
+
+
+def test_descarga_vacia_no_marca_el_rango(almacen, proveedor):
+    proveedor.sin_datos = {"AAA"}
+    assert almacen.obtener_cierres(["AAA"], "2020-01-01", "2020-12-31").empty
+    proveedor.sin_datos = set()
+    assert not almacen.obtener_cierres(["AAA"], "2020-01-01", "2020-12-31").empty
+    assert len(proveedor.descargas) == 2
+
+
+def test_ticker_que_falta_se_vuelve_a_pedir(almacen, proveedor):
+    proveedor.sin_datos = {"BBB"}
+    almacen.obtener_cierres(["AAA", "BBB"], "2020-01-01", "2020-12-31")
+    proveedor.sin_datos = set()
+    df = almacen.obtener_cierres(["AAA", "BBB"], "2020-01-01", "2020-12-31")
+    assert proveedor.descargas[1:] == [(("BBB",), "2020-01-01", "2021-01-01")] # Solo el que faltó
+    assert df["BBB"].notna().all()
+
+
+def test_entrega_vistas_de_solo_lectura(almacen):
+    df = almacen.obtener_cierres(["AAA", "BBB"], "2020-01-01", "2020-12-31")
+    with pytest.raises(ValueError):
+        df.to_numpy()[0, 0] = -1.0
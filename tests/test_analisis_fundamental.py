@@ -0,0 +1,58 @@
+import threading
+import time
+
+import pytest
+
+import analisis_fundamental
+
+
+class ProveedorFalso:
+    """Fichas al momento, con 'espera' segundos de retraso o colgadas hasta que se suelte."""
+
+    def __init__(self, espera=0.0, colgados=()):
+        self.espera = espera
+        self.colgados = set(colgados)
+        self.suelta = threading.Event()
+
+    def fundamentales(self, ticker):
+        if "*" in self.colgados or ticker in self.colgados:
+            self.suelta.wait(10)
+        time.sleep(self.espera)
+        return {"shortName": ticker}
+
+
+@pytest.fixture
+def proveedor(monkeypatch):
+    falso = ProveedorFalso()
+    monkeypatch.setattr(analisis_fundamental.proveedores, "obtener_proveedor", lambda: falso)
+    monkeypatch.setattr(analisis_fundamental, "CACHE_FUNDAMENTALES", analisis_fundamental.CacheTTL(ttl_segundos=60))
+    monkeypatch.setattr(analisis_fundamental.divisas, "anotar_moneda", lambda ticker, info: None)
+    yield falso
+    falso.suelta.set()
+
+
+TICKERS = [f"T{i}" for i in range(8)]
+
+
+def test_proveedor_colgado_no_suma_esperas(proveedor):
+    proveedor.colgados = {"*"}
+    inicio = time.perf_counter()
+    fichas = analisis_fundamental.obtener_datos_fundamentales_lote(TICKERS, max_workers=2, timeout=0.5)
+    assert fichas == [None] * 8
+    assert time.perf_counter() - inicio < 1.0 # Un solo plazo, no 8 x 0,5 s
+
+
+def test_timeout_cuenta_desde_que_empieza_cada_ficha(proveedor):
+    proveedor.espera = 0.2 # 4 tandas de 0,2 s: el lote dura más que 'timeout', ninguna ficha sí
+    fichas = analisis_fundamental.obtener_datos_fundamentales_lote(TICKERS, max_workers=2, timeout=0.5)
+    assert fichas == [{"shortName": t} for t in TICKERS]
+
+
+def test_una_colgada_no_tapa_a_las_demas(proveedor):
+    proveedor.colgados = {"T3"}
+    avances = []
+    fichas = analisis_fundamental.obtener_datos_fundamentales_lote(
+        TICKERS, max_workers=2, timeout=0.5, progreso=lambda hechos, total: avances.append((hechos, total)))
+    assert fichas[3] is None
+    assert [f["shortName"] for i, f in enumerate(fichas) if i != 3] == [t for t in TICKERS if t != "T3"]
+    assert avances[-1] == (8, 8)
@@ -0,0 +1,76 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import backtest
+import calculos
+import robo
+
+
+def precios_sinteticos(tickers=12, sesiones=220, semilla=3):
+    """Paseos aleatorios con volatilidades distintas, huecos sueltos y salidas a bolsa tardías."""
+    rng = np.random.default_rng(semilla)
+    vol = rng.uniform(0.004, 0.03, tickers)
+    deriva = rng.normal(0, 0.002, tickers)
+    valores = 50 * np.exp(np.cumsum(rng.normal(deriva, vol, (sesiones, tickers)), axis=0))
+    valores[rng.random((sesiones, tickers)) < 0.03] = np.nan # Días sin cotizar
+    valores[:120, 0] = np.nan                                # Sale a bolsa tarde
+    valores[:200, 1] = np.nan                                # Muy nueva: sin media de 50
+    fechas = pd.bdate_range("2023-01-02", periods=sesiones)
+    return pd.DataFrame(valores, index=fechas, columns=[f"T{i}" for i in range(tickers)])
+
+
+def test_senales_iguales_a_analizar_semaforo():
+    precios = precios_sinteticos()
+    estados, vols = backtest.calcular_senales(precios)
+    nombres = {codigo: nombre for nombre, codigo in backtest.CODIGOS.items()}
+    for i in range(0, len(precios), 7):
+        historico = precios.iloc[:i + 1]
+        for t in precios.columns:
+            estado, _, _, volatilidad = calculos.analizar_semaforo(historico, t)
+            codigo = estados[t].iloc[i]
+            if estado == "ERROR":
+                assert codigo == backtest.SIN_DATO
+                continue
+            assert nombres[codigo] == estado, (historico.index[-1], t)
+            if not pd.isna(volatilidad):
+                assert vols[t].iloc[i] == pytest.approx(volatilidad, rel=1e-9)
+
+
+def test_precios_planos_solo_pierden_el_coste():
+    fechas = pd.bdate_range("2024-01-01", periods=120)
+    precios = pd.DataFrame({"AAA": 10.0, "BBB": 20.0}, index=fechas)
+    r = backtest.simular(precios, lambda e, v: backtest.pesos_semaforo(e, v), cada=21, coste=0.001)
+    # Todos VERDES (precio = media): se compra una vez y luego no hay nada que mover
+    assert r.costes == pytest.approx(10.0)
+    assert r.curva["Capital"].iloc[-1] == pytest.approx(9990.0)
+    assert r.rotacion.iloc[0] == pytest.approx(1.0) and (r.rotacion.iloc[1:] < 1e-12).all()
+    assert np.allclose(r.pesos.to_numpy(), 0.5)
+
+
+def test_curva_sigue_a_la_cartera():
+    precios = precios_sinteticos()
+    r = backtest.simular(precios, lambda e, v: np.where(e != backtest.SIN_DATO, 1.0, 0.0) / max((e != backtest.SIN_DATO).sum(), 1),
+                         cada=10, coste=0.0)
+    assert (r.curva["Drawdown"] <= 0).all()
+    assert r.curva["Capital"].iloc[:backtest.VENTANA_MEDIA + 1].eq(10000.0).all()
+    # Sin costes, el capital entre dos rebalanceos es la suma de las posiciones revalorizadas
+    i, j = r.pesos.index[0], r.pesos.index[1]
+    pesos = r.pesos.loc[i].to_numpy()
+    relativo = (precios.ffill().loc[j] / precios.ffill().loc[i]).fillna(1.0).to_numpy()
+    assert r.curva["Capital"].loc[j] == pytest.approx(r.curva["Capital"].loc[i] * (pesos * relativo).sum())
+
+
+@pytest.mark.parametrize("perfil", list(robo.REPARTO))
+def test_pesos_robo_elige_como_robo_asignar(perfil):
+    precios = precios_sinteticos(tickers=30, semilla=7)
+    estados, vols = backtest.calcular_senales(precios)
+    notas = np.random.default_rng(1).integers(0, 11, precios.shape[1]).astype("float64")
+    e, v = estados.iloc[-1].to_numpy(), vols.iloc[-1].to_numpy()
+    pesos = backtest.pesos_robo(e, v, notas, perfil)
+
+    verdes = e == backtest.VERDE
+    universo = pd.DataFrame({"Empresa": precios.columns[verdes], "Precio": 1.0, "Volatilidad": v[verdes],
+                             "Nota": notas[verdes]}, index=precios.columns[verdes])
+    cartera = robo.asignar(universo, 1e9, perfil)
+    assert set(cartera["Activo"]) == set(precios.columns[pesos > 0])
@@ -0,0 +1,54 @@
+import os
+import time
+
+from cache_ttl import CacheTTL
+
+
+def ficheros(directorio, extension=".pkl"):
+    return sorted(n for n in os.listdir(directorio) if n.endswith(extension))
+
+
+def test_lee_del_disco_entre_instancias(tmp_path):
+    CacheTTL(ttl_segundos=60, directorio=str(tmp_path)).guardar("clave", {"a": 1})
+    otra = CacheTTL(ttl_segundos=60, directorio=str(tmp_path))
+    assert otra.obtener("clave") == {"a": 1} and otra.estadisticas()["aciertos_disco"] == 1
+
+
+def test_barrido_borra_caducados_sin_leerlos(tmp_path):
+    cache = CacheTTL(ttl_segundos=60, directorio=str(tmp_path))
+    for i in range(5):
+        cache.guardar(("vieja", i), i, ttl_segundos=-1) # Ya caducadas y nunca leídas
+    cache.guardar("viva", 1)
+    cache._barrer_disco(forzar=True)
+    assert ficheros(tmp_path) == [os.path.basename(cache._ruta("viva"))]
+    assert cache.estadisticas()["expulsiones_disco"] == 5
+    assert cache.obtener("viva") == 1
+
+
+def test_escribir_barre_como_mucho_cada_cierto_tiempo(tmp_path, monkeypatch):
+    cache = CacheTTL(ttl_segundos=60, directorio=str(tmp_path))
+    cache.guardar("a", 1, ttl_segundos=-1) # Primera escritura: barre (y se lleva a sí misma)
+    assert ficheros(tmp_path) == []
+    cache.guardar("b", 1, ttl_segundos=-1) # Dentro del intervalo: no se barre
+    assert len(ficheros(tmp_path)) == 1
+    monkeypatch.setattr(CacheTTL, "BARRIDO_SEGUNDOS", 0)
+    cache.guardar("c", 1)
+    assert ficheros(tmp_path) == [os.path.basename(cache._ruta("c"))]
+
+
+def test_tope_de_ficheros_borra_los_que_antes_caducan(tmp_path):
+    cache = CacheTTL(ttl_segundos=60, max_elementos=2, directorio=str(tmp_path), max_disco=3)
+    for i in range(6):
+        cache.guardar(i, i, ttl_segundos=100 + i)
+    cache._barrer_disco(forzar=True)
+    assert ficheros(tmp_path) == sorted(os.path.basename(cache._ruta(i)) for i in (3, 4, 5))
+
+
+def test_barrido_borra_temporales_huerfanos(tmp_path):
+    cache = CacheTTL(ttl_segundos=60, directorio=str(tmp_path))
+    huerfano = tmp_path / "x.pkl.123.456.tmp"
+    huerfano.write_bytes(b"")
+    antiguo = time.time() - 2 * CacheTTL.BARRIDO_SEGUNDOS
+    os.utime(huerfano, (antiguo, antiguo))
+    cache.guardar("a", 1)
+    assert ficheros(tmp_path, ".tmp") == []
@@ -0,0 +1,61 @@
+from datetime import datetime, timedelta
+
+import pandas as pd
+import pytest
+
+import cache_precios
+import datos
+
+
+class ProveedorFalso:
+    """Cierres constantes hasta 'hoy'; apunta cada descarga (tickers, inicio)."""
+
+    def __init__(self, hoy, falla=()):
+        self.hoy = pd.Timestamp(hoy)
+        self.falla = set(falla)
+        self.descargas = []
+
+    def precios(self, tickers, period=None, start=None, **kwargs):
+        self.descargas.append((tuple(tickers), start))
+        inicio = pd.Timestamp(start) if start else self.hoy - pd.DateOffset(years=1)
+        fechas = pd.bdate_range(inicio, self.hoy)
+        return pd.DataFrame({t: 2.0 for t in tickers if t not in self.falla}, index=fechas)
+
+
+@pytest.fixture
+def proveedor(tmp_path, monkeypatch):
+    monkeypatch.setattr(cache_precios, "DIRECTORIO_CACHE", str(tmp_path))
+    falso = ProveedorFalso("2024-06-28")
+    monkeypatch.setattr(datos.proveedores, "obtener_proveedor", lambda: falso)
+    return falso
+
+
+def guardar_caducada(ticker, ultima):
+    """Histórico en caché que termina en 'ultima' y se guardó hace un día."""
+    serie = pd.Series(1.0, index=pd.bdate_range(pd.Timestamp(ultima) - pd.DateOffset(months=6), ultima))
+    cache_precios.guardar(ticker, serie)
+    ruta = cache_precios._ruta(ticker)
+    paquete = pd.read_pickle(ruta)
+    paquete["guardado"] = datetime.now() - timedelta(days=1)
+    pd.to_pickle(paquete, ruta)
+
+
+def test_caducadas_se_agrupan_por_ultima_vela(proveedor):
+    guardar_caducada("AAPL", "2024-06-27")
+    guardar_caducada("MSFT", "2024-06-27")
+    guardar_caducada("KO", "2021-01-04") # Muy atrasado: va en su propia descarga
+    df = datos.descargar_datos(["AAPL", "MSFT", "KO"], max_horas=6)
+    assert sorted(proveedor.descargas) == [(("AAPL", "MSFT"), "2024-06-27"), (("KO",), "2021-01-04")]
+    assert df.index[-1] == pd.Timestamp("2024-06-28") and df.loc["2024-06-28"].eq(2.0).all()
+
+
+def test_fallo_incremental_no_marca_como_fresca(proveedor):
+    guardar_caducada("AAPL", "2024-06-27")
+    antes = cache_precios.leer("AAPL")[1]
+    proveedor.falla = {"AAPL"}
+    df = datos.descargar_datos(["AAPL"], max_horas=6)
+    assert df["AAPL"].index[-1] == pd.Timestamp("2024-06-27") # Servimos lo viejo...
+    assert cache_precios.leer("AAPL")[1] == antes                # ...sin tocar la fecha de guardado
+    proveedor.falla = set()
+    datos.descargar_datos(["AAPL"], max_horas=6)
+    assert len(proveedor.descargas) == 2                         # Y se reintenta
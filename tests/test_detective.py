@@ -0,0 +1,43 @@
+import pytest
+
+import detective
+import ia
+
+
+class ClienteFalso:
+    """Hace de Gemini: responde siempre el mismo ticker y cuenta las llamadas."""
+
+    def __init__(self, ticker):
+        self.ticker = ticker
+        self.llamadas = 0
+        self.models = self
+
+    def generate_content(self, model, contents):
+        self.llamadas += 1
+        return type("Respuesta", (), {"text": self.ticker})()
+
+
+@pytest.fixture(autouse=True)
+def cache_vacia(monkeypatch):
+    monkeypatch.setattr(detective, "CACHE_RESUELTOS", detective.CacheTTL(ttl_segundos=60))
+    monkeypatch.setattr(ia, "CACHE_RESPUESTAS", ia.CacheTTL(ttl_segundos=60))
+
+
+@pytest.mark.parametrize("consulta", ["SAN.MC", "Banco Santander", "banco  santander", "Apple", "tesla"])
+def test_aciertos_exactos_sin_ia(consulta):
+    cliente = ClienteFalso("ERROR")
+    ticker, origen = detective.resolver_ticker(consulta, cliente)
+    assert origen == "local" and ticker is not None
+    assert cliente.llamadas == 0
+
+
+@pytest.mark.parametrize("consulta, esperado", [
+    ("F", "F"), ("BA", "BA"), ("T", "T"), ("Santander Brasil", "BSBR"),
+])
+def test_prefijos_y_parecidos_van_a_la_ia(consulta, esperado):
+    assert detective.buscar_local(consulta) is None
+    cliente = ClienteFalso(esperado)
+    assert detective.resolver_ticker(consulta, cliente) == (esperado, "ia")
+    # La segunda vez sale de la caché de resueltos
+    assert detective.resolver_ticker(consulta, cliente) == (esperado, "cache")
+    assert cliente.llamadas == 1
@@ -0,0 +1,64 @@
+import threading
+
+import pytest
+
+import ia
+
+
+class ClienteFalso:
+    """Hace de Gemini: 'respuesta' es el texto o la excepción a lanzar; cuenta las llamadas."""
+
+    def __init__(self, respuesta, espera=None):
+        self.respuesta = respuesta
+        self.espera = espera
+        self.llamadas = 0
+        self.models = self
+
+    def generate_content(self, model, contents):
+        self.llamadas += 1
+        if self.espera is not None:
+            self.espera.wait(5)
+        if isinstance(self.respuesta, BaseException):
+            raise self.respuesta
+        return type("Respuesta", (), {"text": self.respuesta})()
+
+
+class Interrupcion(BaseException):
+    """Como StopException / RerunException de Streamlit: no hereda de Exception."""
+
+
+@pytest.fixture(autouse=True)
+def cache_vacia(monkeypatch):
+    monkeypatch.setattr(ia, "CACHE_RESPUESTAS", ia.CacheTTL(ttl_segundos=60))
+    monkeypatch.setattr(ia, "_en_vuelo", {})
+
+
+def test_misma_pregunta_sale_de_la_cache():
+    cliente = ClienteFalso("SAN.MC")
+    assert ia.generar_texto(cliente, "  ¿Ticker   de Santander? ", "m") == "SAN.MC"
+    assert ia.generar_texto(cliente, "¿Ticker de Santander?", "m") == "SAN.MC"
+    assert cliente.llamadas == 1
+
+
+@pytest.mark.parametrize("error", [KeyboardInterrupt(), Interrupcion(), ValueError("fallo")])
+def test_interrupcion_libera_la_peticion_en_vuelo(error):
+    with pytest.raises(type(error)):
+        ia.generar_texto(ClienteFalso(error), "pregunta", "m")
+    assert ia._en_vuelo == {}
+    # La siguiente llamada idéntica no se queda esperando a un Future sin resolver
+    assert ia.generar_texto(ClienteFalso("OK"), "pregunta", "m") == "OK"
+
+
+def test_quien_espera_recibe_el_error_del_propietario():
+    suelta = threading.Event()
+    propietario = ClienteFalso(Interrupcion(), espera=suelta)
+    hilo = threading.Thread(target=lambda: pytest.raises(Interrupcion, ia.generar_texto, propietario, "p", "m"))
+    hilo.start()
+    while not ia._en_vuelo:
+        threading.Event().wait(0.01)
+    futuro = ia._en_vuelo[ia.clave_prompt("m", "p")]
+    suelta.set()
+    hilo.join(5)
+    with pytest.raises(RuntimeError):
+        futuro.result(timeout=5)
+    assert ia._en_vuelo == {}
@@ -0,0 +1,74 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import calculos
+import indicadores
+
+
+def precios_sinteticos(tickers=6, sesiones=160, semilla=5):
+    """Paseos aleatorios con volatilidades distintas, huecos sueltos y una salida a bolsa tardía."""
+    rng = np.random.default_rng(semilla)
+    vol = rng.uniform(0.004, 0.03, tickers)
+    valores = 50 * np.exp(np.cumsum(rng.normal(0, vol, (sesiones, tickers)), axis=0))
+    valores[rng.random((sesiones, tickers)) < 0.05] = np.nan # Días sin cotizar
+    valores[:90, 0] = np.nan                                 # Sale a bolsa tarde
+    fechas = pd.bdate_range("2024-01-01", periods=sesiones)
+    return pd.DataFrame(valores, index=fechas, columns=[f"T{i}" for i in range(tickers)])
+
+
+def comprobar_igual(resultado, historico, ticker):
+    estado, mensaje, precio, volatilidad = calculos.analizar_semaforo(historico, ticker)
+    assert resultado[:2] == (estado, mensaje), (historico.index[-1], ticker)
+    assert resultado[2] == pytest.approx(precio)
+    if pd.isna(volatilidad):
+        assert np.isnan(resultado[3])
+    else:
+        assert resultado[3] == pytest.approx(volatilidad, rel=1e-7)
+
+
+def test_velas_nuevas_con_huecos():
+    precios = precios_sinteticos()
+    vivo = indicadores.SemaforoEnVivo()
+    for i in range(len(precios)):
+        for t in precios.columns:
+            resultado = vivo.procesar_tick(t, precios[t].iloc[i], nueva_vela=True)
+            comprobar_igual(resultado, precios.iloc[:i + 1], t)
+
+
+def test_ticks_que_cambian_la_vela_en_curso():
+    precios = precios_sinteticos(tickers=3)
+    rng = np.random.default_rng(9)
+    vivo = indicadores.SemaforoEnVivo.desde_dataframe(precios.iloc[:60])
+    for i in range(60, len(precios)):
+        for t in precios.columns:
+            cierre = precios[t].iloc[i]
+            if np.isnan(cierre): continue
+            historico = precios.iloc[:i + 1].copy()
+            # Apertura de la vela y dos ticks que la van cambiando; el último es el cierre
+            for n, tick in enumerate([cierre * (1 + rng.normal(0, 0.01)), cierre * (1 + rng.normal(0, 0.01)), cierre]):
+                historico.iloc[-1, historico.columns.get_loc(t)] = tick
+                resultado = vivo.procesar_tick(t, tick, nueva_vela=(n == 0))
+                comprobar_igual(resultado, historico, t)
+
+
+def test_recalculo_periodico_no_cambia_el_resultado(monkeypatch):
+    monkeypatch.setattr(indicadores, "RECALCULO_CADA", 7)
+    precios = precios_sinteticos(tickers=3)
+    estados = {t: indicadores.SemaforoIncremental() for t in precios.columns}
+    for i in range(len(precios)):
+        for t in precios.columns:
+            resultado = estados[t].actualizar(precios[t].iloc[i])
+            comprobar_igual(resultado, precios.iloc[:i + 1], t)
+
+
+def test_resumen_igual_que_el_universo():
+    precios = precios_sinteticos()
+    resumen = indicadores.SemaforoEnVivo.desde_dataframe(precios).resumen()
+    universo = calculos.analizar_semaforo_universo(precios)
+    pd.testing.assert_frame_equal(resumen.set_index("Ticker").sort_index(), universo.set_index("Ticker").sort_index(),
+                                  check_dtype=False, rtol=1e-7)
+
+
+def test_sin_datos():
+    assert indicadores.SemaforoIncremental().semaforo() == calculos.analizar_semaforo(pd.DataFrame({"X": [np.nan]}), "X")
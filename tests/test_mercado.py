@@ -0,0 +1,66 @@
+import threading
+import time
+from datetime import datetime, timezone
+
+import pandas as pd
+import pytest
+
+import mercado
+import panel_precios
+
+
+@pytest.fixture
+def refresco_lento(monkeypatch):
+    """refrescar() que tarda hasta que se suelta 'fin' (como una descarga del universo)."""
+    empezado, fin = threading.Event(), threading.Event()
+
+    def refrescar(tickers=None):
+        empezado.set()
+        fin.wait(5)
+
+    monkeypatch.setattr(mercado, "refrescar", refrescar)
+    monkeypatch.setattr(mercado, "_hilo", None)
+    yield empezado
+    fin.set()
+
+
+def test_arrancar_el_hilo_no_espera_al_refresco(refresco_lento):
+    hilo = mercado.iniciar_refresco_en_segundo_plano(intervalo_segundos=3600)
+    assert refresco_lento.wait(5) # El bucle ya está dentro de refrescar() con el cerrojo puesto
+    inicio = time.perf_counter()
+    assert mercado.iniciar_refresco_en_segundo_plano(intervalo_segundos=3600) is hilo
+    assert time.perf_counter() - inicio < 0.5
+
+
+def test_refrescar_si_libre_no_repite_un_refresco_en_marcha(monkeypatch):
+    llamadas = []
+    monkeypatch.setattr(mercado, "refrescar", lambda tickers=None: llamadas.append(tickers) or "nueva")
+    with mercado._lock_refresco: # Otro hilo refrescando
+        assert mercado.refrescar_si_libre(["AAA"]) is None
+    assert mercado.refrescar_si_libre(["AAA"]) == "nueva"
+    assert llamadas == [["AAA"]] and not mercado._lock_refresco.locked()
+
+
+def utc(texto):
+    return datetime.fromisoformat(texto).replace(tzinfo=timezone.utc)
+
+
+@pytest.mark.parametrize("publicado, ahora, al_dia", [
+    ("2024-06-12T08:00", "2024-06-12T08:10", True),  # Reciente
+    ("2024-06-12T07:00", "2024-06-12T08:10", False), # Madrid abierta y más de 15 min
+    ("2024-06-12T20:30", "2024-06-13T03:00", True),  # De noche: escrito tras el cierre de Nueva York
+    ("2024-06-12T19:00", "2024-06-13T03:00", False), # De noche, pero de antes del cierre
+    ("2024-06-14T21:00", "2024-06-16T12:00", True),  # Fin de semana con el cierre del viernes
+    ("2024-06-10T21:00", "2024-06-16T12:00", False), # Fin de semana con uno del lunes
+])
+def test_panel_al_dia(publicado, ahora, al_dia):
+    assert mercado.panel_al_dia(utc(publicado).timestamp(), utc(ahora)) is al_dia
+
+
+def test_panel_viejo_no_se_usa(monkeypatch, tmp_path):
+    precios = pd.DataFrame({"AAA": [1.0, 2.0]}, index=pd.bdate_range("2024-06-10", periods=2))
+    panel = panel_precios.escribir_panel(precios, str(tmp_path))
+    monkeypatch.setattr(panel_precios, "abrir_panel", lambda: panel)
+    assert mercado._precios_del_panel(["AAA"])["AAA"].tolist() == [1.0, 2.0]
+    monkeypatch.setattr(panel, "publicado", time.time() - 7 * 86400) # La precarga murió hace una semana
+    assert mercado._precios_del_panel(["AAA"]) is None
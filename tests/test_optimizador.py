@@ -0,0 +1,86 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import optimizador
+
+
+def panel_factores(n=200, t=260, semilla=1):
+    """Universo con factores de signo mixto: hay pares con correlación negativa."""
+    rng = np.random.default_rng(semilla)
+    factores = rng.normal(0, 0.012, (t, 3))
+    cargas = rng.normal(0, 1.2, (3, n))
+    retornos = factores @ cargas + rng.normal(0.0003, 0.01, (t, n))
+    return pd.DataFrame(100 * np.cumprod(1 + retornos, axis=0),
+                        index=pd.bdate_range("2025-01-01", periods=t),
+                        columns=[f"T{i}" for i in range(n)])
+
+
+def covarianza(precios):
+    cov, _ = optimizador.covarianza_encogida(optimizador.retornos_de(precios))
+    return cov.to_numpy()
+
+
+def test_paridad_riesgo_con_correlaciones_negativas():
+    s = covarianza(panel_factores())
+    assert (s < 0).any()
+    w = optimizador.pesos_paridad_riesgo(s)
+    assert np.isfinite(w).all() and (w > 0).all()
+    assert w.sum() == pytest.approx(1.0)
+    contribucion = w * (s @ w)
+    assert contribucion.max() / contribucion.min() == pytest.approx(1.0, abs=1e-5)
+
+
+def test_moderado_no_elige_por_orden_del_universo():
+    precios = panel_factores()
+    pesos = optimizador.optimizar(precios, precios.columns, "Moderado")
+    assert np.isfinite(pesos).all()
+    assert pesos.sum() == pytest.approx(1.0)
+    assert list(pesos.index) != [f"T{i}" for i in range(len(pesos))]
+    # La selección es la de más peso en la paridad de riesgo de todo el universo
+    s = covarianza(precios)
+    w = optimizador.pesos_paridad_riesgo(s)
+    mejores = set(precios.columns[np.argsort(-w)[:optimizador.PERFILES["Moderado"]["max_valores"]]])
+    assert set(pesos.index) <= mejores
+
+
+def test_pesos_no_finitos_pasan_al_inverso_de_la_volatilidad(monkeypatch):
+    monkeypatch.setattr(optimizador, "pesos_paridad_riesgo", lambda cov: np.full(len(cov), np.nan))
+    s = np.diag([0.04, 0.09, 0.16])
+    w = optimizador._pesos("paridad_riesgo", s, None, 1.0)
+    assert w == pytest.approx(np.array([1 / 0.2, 1 / 0.3, 1 / 0.4]) / (1 / 0.2 + 1 / 0.3 + 1 / 0.4))
+
+
+def test_salida_a_bolsa_reciente_no_recorta_la_ventana():
+    precios = panel_factores(n=20)
+    precios.iloc[:195, 3] = np.nan # Solo 65 sesiones (> MIN_SESIONES)
+    retornos = optimizador.retornos_de(precios)
+    assert len(retornos) == len(precios) - 1
+    assert "T3" not in retornos.columns
+
+
+def test_min_varianza_cumple_kkt():
+    s = covarianza(panel_factores(n=60))
+    tope = 0.05
+    w = optimizador.pesos_min_varianza(s, tope)
+    assert w.sum() == pytest.approx(1.0) and (w >= 0).all() and (w <= tope + 1e-12).all()
+    gradiente = 2 * s @ w
+    libres = (w > 1e-7) & (w < tope - 1e-7)
+    lam = np.median(gradiente[libres])
+    assert np.ptp(gradiente[libres]) / abs(lam) < 1e-3
+    assert (gradiente[w <= 1e-7] >= lam * (1 - 1e-3)).all()   # Fuera: no conviene meterlos
+    assert (gradiente[w >= tope - 1e-7] <= lam * (1 + 1e-3)).all()
+
+
+@pytest.mark.parametrize("semilla", range(20))
+def test_proyeccion_igual_que_biseccion(semilla):
+    rng = np.random.default_rng(semilla)
+    n = int(rng.integers(2, 40))
+    v, tope = rng.normal(0, rng.uniform(0.01, 3), n), rng.uniform(0.01, 1)
+    bajo, alto = v.min() - 1, v.max()
+    tope_real = max(tope, 1 / n)
+    for _ in range(200):
+        medio = (bajo + alto) / 2
+        if np.clip(v - medio, 0, tope_real).sum() > 1: bajo = medio
+        else: alto = medio
+    assert optimizador.proyectar_simplex(v, tope) == pytest.approx(np.clip(v - bajo, 0, tope_real), abs=1e-9)
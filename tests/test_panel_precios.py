@@ -0,0 +1,63 @@
+import os
+import threading
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import panel_precios
+
+
+def cierres(valor, sesiones=30, tickers=("AAA", "BBB", "CCC")):
+    fechas = pd.bdate_range("2024-01-01", periods=sesiones)
+    return pd.DataFrame(valor, index=fechas, columns=list(tickers), dtype="float64")
+
+
+def test_escribir_y_abrir(tmp_path):
+    panel = panel_precios.escribir_panel(cierres(1.5), str(tmp_path))
+    assert panel.version == 1 and panel.shape == (30, 3)
+    assert panel["BBB"].iloc[-1] == 1.5
+    assert panel_precios.escribir_panel(cierres(2.0), str(tmp_path)).version == 2
+
+
+def test_escritores_a_la_vez_no_se_pisan(tmp_path):
+    directorio = str(tmp_path)
+    errores = []
+
+    def escribir(i):
+        try: panel_precios.escribir_panel(cierres(float(i)), directorio)
+        except Exception as e: errores.append(e)
+
+    hilos = [threading.Thread(target=escribir, args=(i,)) for i in range(8)]
+    for h in hilos: h.start()
+    for h in hilos: h.join()
+    assert errores == []
+    indice = panel_precios._leer_indice(directorio)
+    assert indice["version"] == 8 # Cada escritor cogió una versión distinta
+    # Solo queda la versión publicada: ni temporales ni ficheros de otras versiones
+    assert sorted(n for n in os.listdir(directorio) if n != "panel.lock") == sorted(
+        ["panel.json", indice["valores"], indice["fechas"]])
+    panel = panel_precios.abrir_panel(directorio)
+    assert np.all(panel.valores == panel.valores[0, 0])
+
+
+def test_lector_conserva_su_version_al_reescribir(tmp_path):
+    directorio = str(tmp_path)
+    viejo = panel_precios.escribir_panel(cierres(1.0), directorio)
+    datos_viejos = viejo["AAA"]
+    panel_precios.escribir_panel(cierres(9.0, sesiones=60), directorio)
+    # El memmap antiguo sigue siendo legible y con sus datos (no se truncó ni se sobrescribió)
+    assert datos_viejos.sum() == 30.0
+    assert panel_precios.abrir_panel(directorio).shape == (60, 3)
+
+
+def test_fallo_al_escribir_no_deja_temporales(tmp_path, monkeypatch):
+    directorio = str(tmp_path)
+    panel_precios.escribir_panel(cierres(1.0), directorio)
+    def disco_lleno(*args, **kwargs):
+        raise OSError("disco lleno")
+    monkeypatch.setattr(panel_precios.json, "dump", disco_lleno)
+    with pytest.raises(OSError):
+        panel_precios.escribir_panel(cierres(2.0), directorio)
+    assert not [n for n in os.listdir(directorio) if n.endswith(".tmp")]
+    assert panel_precios.abrir_panel(directorio).version == 1
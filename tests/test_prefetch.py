@@ -0,0 +1,99 @@
+import threading
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+import prefetch
+
+
+def utc(texto):
+    return datetime.fromisoformat(texto).replace(tzinfo=timezone.utc)
+
+
+class RelojFalso:
+    """Reloj que solo avanza cuando el planificador 'duerme'."""
+
+    def __init__(self, inicio):
+        self.ahora = inicio
+        self.esperas = []
+
+    def __call__(self):
+        return self.ahora
+
+    def dormir(self, segundos):
+        self.esperas.append(segundos)
+        self.ahora += timedelta(seconds=segundos)
+
+
+@pytest.mark.parametrize("ahora, esperado", [
+    ("2024-06-12T08:00", "2024-06-12T08:15"), # Miércoles, Madrid abierta: cada 15 min
+    ("2024-06-12T15:40", "2024-06-12T15:55"), # Madrid ya cerró, Nueva York abierta
+    ("2024-06-12T20:05", "2024-06-12T20:20"), # Todo cerrado: cierre de Nueva York + 20 min
+    ("2024-06-13T02:00", "2024-06-13T07:00"), # Madrugada: apertura de Madrid
+    ("2024-06-15T12:00", "2024-06-15T18:00"), # Sábado: como mucho 6 h dormido
+])
+def test_proxima_ejecucion(ahora, esperado):
+    assert prefetch.proxima_ejecucion(utc(ahora)) == utc(esperado)
+
+
+def test_planificador_con_reloj_falso():
+    reloj = RelojFalso(utc("2024-06-12T20:05"))
+    llamadas = []
+
+    def divisa_caida():
+        raise ConnectionError("sin red")
+
+    tareas = {
+        "precios": lambda tickers: llamadas.append(("precios", tuple(tickers))),
+        "divisa": divisa_caida,
+        "extra": lambda: llamadas.append(("extra",)),
+    }
+    planificador = prefetch.Planificador(tickers=["AAA"], tareas=tareas, reloj=reloj, dormir=reloj.dormir)
+    planificador.ejecutar(max_ciclos=3)
+
+    assert [instante for instante, _ in planificador.historial] == [
+        utc("2024-06-12T20:05"), utc("2024-06-12T20:20"), utc("2024-06-13T02:20")]
+    assert reloj.esperas == [15 * 60, 6 * 3600] # Tras el último ciclo no se duerme
+    assert llamadas.count(("precios", ("AAA",))) == 3 and llamadas.count(("extra",)) == 3
+    assert all(r["divisa"].startswith("error") for _, r in planificador.historial) # Un fallo no para el bucle
+
+
+def test_parar_corta_el_bucle():
+    reloj = RelojFalso(utc("2024-06-12T08:00"))
+    planificador = prefetch.Planificador(tickers=["AAA"], tareas={}, reloj=reloj)
+    planificador.dormir = lambda segundos: planificador.parar()
+    planificador.ejecutar()
+    assert len(planificador.historial) == 1
+
+
+def test_segundo_plano_arranca_un_solo_hilo(monkeypatch):
+    monkeypatch.setattr(prefetch, "_hilo", None)
+    arrancados = []
+    salida = threading.Event()
+    monkeypatch.setattr(prefetch.Planificador, "ejecutar", lambda self: (arrancados.append(self), salida.wait(5)))
+
+    barrera = threading.Barrier(16)
+    hilos = []
+
+    def iniciar():
+        barrera.wait()
+        hilos.append(prefetch.iniciar_en_segundo_plano(["AAA"], tareas={}, con_instantanea=False))
+
+    lanzadores = [threading.Thread(target=iniciar) for _ in range(16)]
+    for t in lanzadores: t.start()
+    for t in lanzadores: t.join()
+    salida.set()
+    assert len(set(map(id, hilos))) == 1
+    hilos[0].join(5)
+    assert len(arrancados) == 1
+
+
+def test_instantanea_de_la_precarga_usa_el_cerrojo_de_mercado(monkeypatch):
+    monkeypatch.setattr(prefetch, "_hilo", None)
+    capturadas = []
+    monkeypatch.setattr(prefetch.Planificador, "ejecutar", lambda self: capturadas.append(self.tareas))
+    llamadas = []
+    monkeypatch.setattr(prefetch.mercado, "refrescar_si_libre", lambda tickers=None: llamadas.append(tickers))
+    prefetch.iniciar_en_segundo_plano(["AAA"], tareas={}).join(5)
+    capturadas[0]["instantanea"]()
+    assert llamadas == [["AAA"]]
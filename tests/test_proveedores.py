@@ -0,0 +1,121 @@
+import threading
+import time
+
+import pandas as pd
+import pytest
+
+import proveedores
+
+
+class BaseFalsa(proveedores.ProveedorDatos):
+    """Hace de Yahoo: cierres deterministas hasta 'hoy' y cuenta las llamadas."""
+
+    def __init__(self, hoy="2024-06-28"):
+        self.hoy = pd.Timestamp(hoy)
+        self.llamadas = 0
+
+    def precios(self, tickers, period=None, start=None, end=None, interval="1d"):
+        self.llamadas += 1
+        # Como Yahoo (y la reproducción): 'period' no incluye el día de hace justo un periodo
+        inicio = pd.Timestamp(start) if start else self.hoy - proveedores._periodo(period or "1y") + pd.Timedelta(days=1)
+        fechas = pd.bdate_range(inicio, self.hoy)
+        return pd.DataFrame({t: [float(i) + n for i in range(len(fechas))] for n, t in enumerate(tickers)}, index=fechas)
+
+    def fundamentales(self, ticker):
+        self.llamadas += 1
+        return {"shortName": f"Empresa {ticker}", "trailingPE": 12.5}
+
+    def tipo_cambio(self, par):
+        self.llamadas += 1
+        return 1.08
+
+    def noticias(self, ticker):
+        self.llamadas += 1
+        return [{"title": f"Noticia de {ticker}"}]
+
+
+@pytest.fixture
+def grabado(tmp_path):
+    """(base, grabador, reproductor) sobre la misma carpeta."""
+    base = BaseFalsa()
+    return base, proveedores.ProveedorGrabado(str(tmp_path), base=base), proveedores.ProveedorGrabado(str(tmp_path))
+
+
+def test_reproduce_lo_grabado_sin_red(grabado):
+    base, grabador, reproductor = grabado
+    original = grabador.precios(["AAA", "BBB"], period="1y")
+    grabador.fundamentales("AAA")
+    grabador.tipo_cambio("EURUSD=X")
+    grabador.noticias("AAA")
+    llamadas = base.llamadas
+
+    repetido = reproductor.precios(["AAA", "BBB"], period="1y")
+    pd.testing.assert_frame_equal(repetido, original, check_freq=False)
+    assert reproductor.fundamentales("AAA") == {"shortName": "Empresa AAA", "trailingPE": 12.5}
+    assert reproductor.tipo_cambio("EURUSD=X") == 1.08
+    assert reproductor.noticias("AAA") == [{"title": "Noticia de AAA"}]
+    assert base.llamadas == llamadas # Reproducir no toca la base
+
+
+def test_grabar_fusiona_descargas_incrementales(grabado):
+    base, grabador, reproductor = grabado
+    grabador.precios(["AAA"], period="1mo")
+    base.hoy = pd.Timestamp("2024-07-05")
+    grabador.precios(["AAA"], start="2024-06-27") # Incremental: solo las velas nuevas
+    serie = reproductor.precios(["AAA"], period="max")["AAA"]
+    assert serie.index.is_monotonic_increasing and not serie.index.duplicated().any()
+    assert serie.index[0] == pd.Timestamp("2024-05-29") and serie.index[-1] == pd.Timestamp("2024-07-05")
+
+
+def test_periodo_se_mide_desde_la_ultima_fecha_grabada(grabado):
+    _, grabador, reproductor = grabado
+    grabador.precios(["AAA"], period="1y")
+    # Da igual el día en que se ejecute la prueba: "5d" son los 5 últimos días grabados
+    assert list(reproductor.precios(["AAA"], period="5d").index) == list(pd.bdate_range("2024-06-24", "2024-06-28"))
+    tramo = reproductor.precios(["AAA"], start="2024-06-03", end="2024-06-07")
+    assert list(tramo.index) == list(pd.bdate_range("2024-06-03", "2024-06-06")) # 'end' es exclusivo
+
+
+def test_lo_que_no_se_grabo(grabado):
+    _, grabador, reproductor = grabado
+    grabador.precios(["AAA"], period="1y")
+    assert list(reproductor.precios(["AAA", "ZZZ"], period="1y").columns) == ["AAA"]
+    assert reproductor.fundamentales("ZZZ") is None
+    assert reproductor.noticias("ZZZ") == []
+    with pytest.raises(KeyError):
+        reproductor.tipo_cambio("GBPUSD=X")
+    assert reproductor.precios(["AAA"], period="1y", interval="1h").empty # Otro intervalo, otra carpeta
+
+
+@pytest.mark.parametrize("config, clase, graba", [
+    ("yahoo", proveedores.ProveedorYahoo, None),
+    ("grabado:/tmp/x", proveedores.ProveedorGrabado, False),
+    ("grabar:/tmp/x", proveedores.ProveedorGrabado, True),
+])
+def test_crear_desde_entorno(monkeypatch, config, clase, graba):
+    monkeypatch.setenv("CHIVATO_PROVEEDOR", config)
+    proveedor = proveedores.crear_desde_entorno()
+    assert isinstance(proveedor, clase)
+    if graba is not None:
+        assert proveedor.directorio == "/tmp/x" and (proveedor.base is not None) == graba
+
+
+def test_descargas_de_yahoo_de_una_en_una(monkeypatch):
+    dentro, maximo = [0], [0]
+    cerrojo = threading.Lock()
+
+    def download(tickers, **kwargs):
+        with cerrojo:
+            dentro[0] += 1
+            maximo[0] = max(maximo[0], dentro[0])
+        time.sleep(0.02)
+        with cerrojo:
+            dentro[0] -= 1
+        return pd.DataFrame({t: [1.0] for t in tickers}, index=pd.bdate_range("2024-06-28", periods=1))
+
+    monkeypatch.setattr(proveedores.yf, "download", download, raising=False)
+    yahoo = proveedores.ProveedorYahoo()
+    hilos = [threading.Thread(target=yahoo.precios, args=([f"T{i}", "X"],)) for i in range(8)]
+    for h in hilos: h.start()
+    for h in hilos: h.join()
+    assert maximo[0] == 1
@@ -0,0 +1,80 @@
+import threading
+import time
+
+import pandas as pd
+import pytest
+
+import radar
+
+
+class ProveedorFalso:
+    """Precios de los últimos días: el último cierre es la cotización reciente."""
+
+    def __init__(self, ultimos):
+        self.ultimos = ultimos
+        self.descargas = 0
+
+    def precios(self, tickers, period=None, **kwargs):
+        self.descargas += 1
+        return pd.DataFrame({t: [1.0, self.ultimos[t]] for t in tickers if t in self.ultimos})
+
+
+@pytest.fixture(autouse=True)
+def cache_vacia(monkeypatch):
+    monkeypatch.setattr(radar, "CACHE_COTIZACIONES", radar.CacheTTL(ttl_segundos=60))
+
+
+def test_precio_reciente_manda_sobre_la_ficha(monkeypatch):
+    proveedor = ProveedorFalso({"AAA": 12.0})
+    monkeypatch.setattr(radar.proveedores, "obtener_proveedor", lambda: proveedor)
+    ficha = {"currentPrice": 10.0, "targetMeanPrice": 15.0}  # Ficha de hace horas
+    filas = {t: o for t, o, _ in radar.escanear(["AAA", "BBB"], obtener_info=lambda t: ficha)}
+    assert filas["AAA"]["Precio"] == 12.0 and filas["AAA"]["Potencial %"] == 25.0
+    assert filas["BBB"]["Precio"] == 10.0  # Sin cotización: la de la ficha
+    # La cotización se reutiliza solo dentro del TTL corto
+    assert radar.cotizaciones(["AAA"]) == {"AAA": 12.0} and proveedor.descargas == 1
+
+
+def test_sin_cotizaciones_usa_la_ficha(monkeypatch):
+    def falla(tickers):
+        raise ConnectionError("sin red")
+    ficha = {"currentPrice": 10.0, "targetMeanPrice": 11.0}
+    filas = list(radar.escanear(["AAA"], obtener_info=lambda t: ficha, obtener_cotizaciones=falla))
+    assert filas[0][1]["Precio"] == 10.0 and filas[0][2] is None
+
+
+def test_cerrar_el_generador_cancela_lo_pendiente():
+    suelta = threading.Event()
+    pedidas = []
+
+    def ficha_lenta(ticker):
+        pedidas.append(ticker)
+        if ticker != "T0": suelta.wait(5)
+        return {"currentPrice": 1.0, "targetMeanPrice": 2.0}
+
+    tickers = [f"T{i}" for i in range(50)]
+    escaneo = radar.escanear(tickers, max_concurrencia=2, obtener_info=ficha_lenta,
+                             obtener_cotizaciones=lambda ts: {})
+    assert next(escaneo)[0] == "T0"
+    escaneo.close()
+    suelta.set()
+    # Solo llegaron a empezar las que ya tenían hilo; el resto se canceló
+    assert len(pedidas) < 5
+
+
+def test_cotizaciones_lentas_no_frenan_el_primer_resultado(monkeypatch):
+    monkeypatch.setattr(radar, "ESPERA_COTIZACIONES", 0.1)
+    suelta = threading.Event()
+
+    def cotizaciones_lentas(tickers):
+        suelta.wait(5)
+        return {t: 99.0 for t in tickers}
+
+    ficha = {"currentPrice": 10.0, "targetMeanPrice": 15.0}
+    escaneo = radar.escanear(["AAA", "BBB"], obtener_info=lambda t: ficha, obtener_cotizaciones=cotizaciones_lentas)
+    inicio = time.perf_counter()
+    ticker, oportunidad, error = next(escaneo)
+    assert time.perf_counter() - inicio < 1.0
+    assert oportunidad["Precio"] == 10.0 # Sin cotización todavía: la de la ficha
+    suelta.set()
+    escaneo.close()